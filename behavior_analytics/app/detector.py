@@ -0,0 +1,103 @@
+import math
+from collections import OrderedDict
+from typing import Hashable
+
+# Buckets closed one by one after a gap; longer gaps are decayed in one step.
+MAX_REPLAYED_BUCKETS = 32
+
+
+class _KeyState:
+    __slots__ = ("bucket", "counts", "window", "mean", "var")
+
+    def __init__(self, bucket: int, buckets: int):
+        self.bucket = bucket
+        self.counts = [0.0] * buckets
+        self.window = 0.0
+        self.mean = 0.0
+        self.var = 0.0
+
+
+class RateDetector:
+    """Streaming per-key rate anomaly detector.
+
+    Each key (e.g. service, or service and entity) keeps a ring buffer of
+    ``buckets`` counts of ``bucket_seconds`` each, whose sum is the event
+    count over the sliding window. Whenever a bucket closes, the window
+    count updates an exponentially weighted mean and variance with weight
+    ``alpha``. :meth:`observe` scores the current window against that
+    baseline as a z-score, mapped to a risk in ``[0, 1]`` that is 0.5 at
+    ``z_center`` standard deviations. ``min_std`` keeps a quiet baseline
+    from turning single events into large deviations.
+
+    Updates are O(1) per event. At most ``max_keys`` keys are kept; the
+    least recently seen is evicted first.
+    """
+
+    def __init__(
+        self,
+        bucket_seconds: float = 10.0,
+        buckets: int = 6,
+        alpha: float = 0.05,
+        min_std: float = 1.0,
+        z_center: float = 3.0,
+        max_keys: int = 10000,
+    ):
+        self.bucket_seconds = bucket_seconds
+        self.buckets = buckets
+        self.alpha = alpha
+        self.min_std = min_std
+        self.z_center = z_center
+        self.max_keys = max_keys
+        self.evicted = 0
+        self._states: "OrderedDict[Hashable, _KeyState]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+    def observe(self, key: Hashable, timestamp: float, weight: float = 1.0) -> float:
+        """Count an event for *key* at *timestamp* (seconds) and return its risk."""
+        bucket = int(timestamp // self.bucket_seconds)
+        state = self._states.get(key)
+        if state is None:
+            if len(self._states) >= self.max_keys:
+                self._states.popitem(last=False)
+                self.evicted += 1
+            state = self._states[key] = _KeyState(bucket, self.buckets)
+        else:
+            self._states.move_to_end(key)
+            if bucket > state.bucket:
+                self._advance(state, bucket)
+        # Late events count towards the open bucket.
+        state.counts[state.bucket % self.buckets] += weight
+        state.window += weight
+        return self.risk(self.zscore(state))
+
+    def _advance(self, state: _KeyState, bucket: int) -> None:
+        steps = bucket - state.bucket
+        replayed = min(steps, MAX_REPLAYED_BUCKETS)
+        alpha = self.alpha
+        for _ in range(replayed):
+            # Close the open bucket: fold the window into the baseline
+            # (West's incremental EWMA variance), then slide by one.
+            diff = state.window - state.mean
+            increment = alpha * diff
+            state.mean += increment
+            state.var = (1 - alpha) * (state.var + diff * increment)
+            state.bucket += 1
+            slot = state.bucket % self.buckets
+            state.window -= state.counts[slot]
+            state.counts[slot] = 0.0
+        if steps > replayed:
+            # Every further bucket closed with an empty window.
+            decay = (1 - alpha) ** (steps - replayed)
+            state.mean *= decay
+            state.var *= decay
+            state.counts = [0.0] * self.buckets
+            state.window = 0.0
+            state.bucket = bucket
+
+    def zscore(self, state: _KeyState) -> float:
+        return (state.window - state.mean) / max(math.sqrt(state.var), self.min_std)
+
+    def risk(self, z: float) -> float:
+        return 1.0 / (1.0 + math.exp(min(self.z_center - z, 50.0)))
@@ -1,15 +1,18 @@
 import os
+import asyncio
 import logging
 import json
-from datetime import datetime
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
 from pathlib import Path
 
-import httpx
-from fastapi import FastAPI
+from fastapi import BackgroundTasks, FastAPI, HTTPException, Request
+from pydantic import TypeAdapter, ValidationError
 
-from .models import LogEvent, Alert
-
-app = FastAPI(title="Behavior Analytics", version="0.1.0")
+from .detector import RateDetector
+from .models import LogEvent, Alert, AlertGroup
+from .outbound import Outbound
+from .rules import RuleSet
 
 # Structured JSON logging
 class JsonFormatter(logging.Formatter):
@@ -43,8 +46,51 @@ ORCHESTRATOR_URL = read_env("ORCHESTRATOR_URL")
 LOG_INDEXER_URL = read_env("LOG_INDEXER_URL")
 LOG_INDEXER_TOKEN = read_env("LOG_INDEXER_TOKEN")
 
+# Alerts and indexer logs go out in the background over one keep-alive
+# client, so the verdict does not wait on downstream latency.
+outbound = Outbound(
+    concurrency=int(read_env("OUTBOUND_CONCURRENCY") or "32"),
+    max_pending=int(read_env("OUTBOUND_MAX_PENDING") or "1000"),
+    timeout=float(read_env("OUTBOUND_TIMEOUT") or "5"),
+)
+EVENTS_MAX_BATCH = int(read_env("EVENTS_MAX_BATCH") or "10000")
+
+# Suspicious events feed per (service, entity) rate baselines; an alert's
+# risk is how far the current rate deviates from its baseline.
+detector = RateDetector(
+    bucket_seconds=float(read_env("DETECTOR_BUCKET_SECONDS") or "10"),
+    buckets=int(read_env("DETECTOR_WINDOW_BUCKETS") or "6"),
+    alpha=float(read_env("DETECTOR_ALPHA") or "0.05"),
+    max_keys=int(read_env("DETECTOR_MAX_KEYS") or "10000"),
+)
+ALERT_MIN_RISK = float(read_env("ALERT_MIN_RISK") or "0")
+
+# Detection rules, compiled into one matcher and reloaded when the file
+# changes. Without a file the built-in rules apply.
+RULES_FILE = read_env("RULES_FILE")
+RULES_RELOAD_SECONDS = float(read_env("RULES_RELOAD_SECONDS") or "5")
+rules = RuleSet(Path(RULES_FILE) if RULES_FILE else None)
+
+
+async def watch_rules() -> None:
+    while True:
+        await asyncio.sleep(RULES_RELOAD_SECONDS)
+        await asyncio.to_thread(rules.reload_if_changed)
+
 
-def log_to_indexer(level: str, message: str) -> None:
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    watcher = asyncio.create_task(watch_rules()) if rules.path and RULES_RELOAD_SECONDS > 0 else None
+    yield
+    if watcher is not None:
+        watcher.cancel()
+    await outbound.aclose()
+
+
+app = FastAPI(title="Behavior Analytics", version="0.1.0", lifespan=lifespan)
+
+
+async def log_to_indexer(level: str, message: str) -> None:
     if not LOG_INDEXER_URL:
         return
     payload = {
@@ -57,25 +103,72 @@ def log_to_indexer(level: str, message: str) -> None:
     if LOG_INDEXER_TOKEN:
         headers["Authorization"] = f"Bearer {LOG_INDEXER_TOKEN}"
     try:
-        httpx.post(LOG_INDEXER_URL, json=payload, headers=headers, timeout=5)
+        if await outbound.post(LOG_INDEXER_URL, json=payload, headers=headers) is None:
+            logger.warning("indexer log dropped: too many pending calls")
     except Exception as exc:
         logger.error(f"failed to log to indexer: {exc}")
 
 
-def send_alert(alert: Alert) -> None:
+async def send_alert(alert: Alert | AlertGroup) -> None:
     if not ORCHESTRATOR_URL:
         return
     try:
-        httpx.post(ORCHESTRATOR_URL, json=alert.model_dump(), timeout=5)
-        log_to_indexer("INFO", "alert sent")
+        if await outbound.post(ORCHESTRATOR_URL, json=alert.model_dump(mode="json")) is None:
+            logger.warning("alert dropped: too many pending calls")
+            return
+        await log_to_indexer("INFO", "alert sent")
     except Exception as exc:
         logger.error(f"failed to send alert: {exc}")
-        log_to_indexer("ERROR", f"alert send failure: {exc}")
+        await log_to_indexer("ERROR", f"alert send failure: {exc}")
+
+
+EVENT_LIST = TypeAdapter(list[LogEvent])
 
 
 def is_suspicious(event: LogEvent) -> bool:
-    msg = event.message.lower()
-    return "failed" in msg or event.level.upper() in {"ERROR", "CRITICAL"}
+    return bool(rules.match(event.level, event.service, event.message))
+
+
+def event_time(event: LogEvent) -> float:
+    timestamp = event.timestamp
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return timestamp.timestamp()
+
+
+def assess(event: LogEvent) -> tuple[bool, float]:
+    """Whether *event* is suspicious and, if so, its risk."""
+    verdicts, risks = score_events([event])
+    return verdicts[0], risks[0]
+
+
+def score_events(events: list[LogEvent]) -> tuple[list[bool], list[float]]:
+    """Verdicts and risks for a batch in one pass.
+
+    An event is suspicious when any rule matches it. Its risk combines the
+    highest matching rule score with the rate detector's risk, as the chance
+    that either signal is right.
+    """
+    match = rules.compiled.match
+    observe = detector.observe
+    verdicts, risks = [], []
+    for event in events:
+        matched = match(event.level, event.service, event.message)
+        verdicts.append(bool(matched))
+        if not matched:
+            risks.append(0.0)
+            continue
+        rule_score = max(rule.score for rule in matched)
+        rate_risk = observe((event.service, event.entity), event_time(event))
+        risks.append(round(1 - (1 - rule_score) * (1 - rate_risk), 3))
+    return verdicts, risks
+
+
+def parse_events(body: bytes, content_type: str) -> list[LogEvent]:
+    """Validate a JSON array or NDJSON body of events in one pydantic call."""
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        return EVENT_LIST.validate_python([json.loads(line) for line in body.splitlines() if line.strip()])
+    return EVENT_LIST.validate_json(body)
 
 
 @app.get("/health")
@@ -84,10 +177,46 @@ def health():
 
 
 @app.post("/event")
-def receive_event(event: LogEvent):
-    suspicious = is_suspicious(event)
-    if suspicious:
-        alert = Alert(event=event, risk_score=0.9, summary="Suspicious event detected")
-        send_alert(alert)
-    log_to_indexer("INFO", f"processed event suspicious={suspicious}")
-    return {"anomalous": suspicious}
+async def receive_event(event: LogEvent, background_tasks: BackgroundTasks):
+    suspicious, risk = assess(event)
+    if suspicious and risk >= ALERT_MIN_RISK:
+        alert = Alert(event=event, risk_score=risk, summary="Suspicious event detected")
+        background_tasks.add_task(send_alert, alert)
+    background_tasks.add_task(log_to_indexer, "INFO", f"processed event suspicious={suspicious}")
+    return {"anomalous": suspicious, "risk_score": risk}
+
+
+@app.post("/events")
+async def receive_events(request: Request, background_tasks: BackgroundTasks):
+    """Score a batch of events given as a JSON array or NDJSON.
+
+    Returns ``{"anomalous": [...], "risk": [...]}`` with one verdict and risk
+    per event, in order. Alerts for the batch are sent as one
+    :class:`AlertGroup`.
+    """
+    body = await request.body()
+    try:
+        events = parse_events(body, request.headers.get("content-type", ""))
+    except ValidationError as exc:
+        raise HTTPException(status_code=422, detail=exc.errors(include_url=False, include_context=False))
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=f"Malformed batch: {exc}")
+    if len(events) > EVENTS_MAX_BATCH:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {EVENTS_MAX_BATCH} events")
+    verdicts, risks = score_events(events)
+    alerts = [
+        Alert(event=event, risk_score=risk, summary="Suspicious event detected")
+        for event, suspicious, risk in zip(events, verdicts, risks)
+        if suspicious and risk >= ALERT_MIN_RISK
+    ]
+    if alerts:
+        group = AlertGroup(
+            alerts=alerts,
+            risk_score=max(alert.risk_score for alert in alerts),
+            summary=f"{len(alerts)} suspicious events detected",
+        )
+        background_tasks.add_task(send_alert, group)
+    background_tasks.add_task(
+        log_to_indexer, "INFO", f"processed {len(events)} events suspicious={len(alerts)}"
+    )
+    return {"anomalous": verdicts, "risk": risks}
@@ -1,4 +1,5 @@
 from datetime import datetime
+from typing import List, Optional
 from pydantic import BaseModel, Field
 
 class LogEvent(BaseModel):
@@ -6,8 +7,14 @@ class LogEvent(BaseModel):
     level: str
     service: str
     message: str
+    entity: Optional[str] = None
 
 class Alert(BaseModel):
     event: LogEvent
     risk_score: float
     summary: str
+
+class AlertGroup(BaseModel):
+    alerts: List[Alert]
+    risk_score: float
+    summary: str
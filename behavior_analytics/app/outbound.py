@@ -0,0 +1,53 @@
+import asyncio
+from typing import Any
+
+import httpx
+
+
+class Outbound:
+    """Shared keep-alive HTTP client for calls to other services.
+
+    At most ``concurrency`` requests are in flight at once. Calls beyond
+    ``max_pending`` waiting or running are dropped rather than queued, so a
+    slow downstream cannot pile up unbounded work.
+    """
+
+    def __init__(self, concurrency: int = 32, max_pending: int = 1000, timeout: float = 5.0, transport: Any = None):
+        self.concurrency = concurrency
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.transport = transport
+        self.pending = 0
+        self.dropped = 0
+        self._client: httpx.AsyncClient | None = None
+        self._semaphore: asyncio.Semaphore | None = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency),
+                transport=self.transport,
+            )
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._client
+
+    async def post(self, url: str, **kwargs: Any) -> httpx.Response | None:
+        """POST *url*; ``None`` if the call was dropped for lack of capacity."""
+        if self.pending >= self.max_pending:
+            self.dropped += 1
+            return None
+        client = self.client
+        self.pending += 1
+        try:
+            async with self._semaphore:
+                return await client.post(url, **kwargs)
+        finally:
+            self.pending -= 1
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            self._semaphore = None
@@ -0,0 +1,302 @@
+import json
+import logging
+import os
+import re
+from collections import deque
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+from pydantic import BaseModel, Field, model_validator
+
+logger = logging.getLogger("behavior_analytics")
+
+# Shortest literal worth using to prefilter a regex.
+MIN_ANCHOR = 3
+REPEAT = re.compile(r"\{\d*(?:,\d*)?\}")
+# Escapes followed by operands: hex, unicode, named, octal and backreferences.
+ESCAPE = re.compile(r"\\(?:x[0-9a-fA-F]{2}|u[0-9a-fA-F]{4}|U[0-9a-fA-F]{8}|N\{[^}]*\}|0[0-7]{0,2}|[1-7][0-7]{2}|[1-9][0-9]?)")
+
+
+class Rule(BaseModel):
+    """One detection rule.
+
+    A rule matches an event when its ``literal`` occurs in the message
+    (case-insensitively) or its ``pattern`` regex matches it, and the
+    event's level and service are among ``levels`` / ``services`` when
+    those are given. A rule with neither literal nor pattern matches on the
+    predicates alone.
+    """
+
+    id: str
+    literal: Optional[str] = None
+    pattern: Optional[str] = None
+    score: float = Field(0.5, ge=0.0, le=1.0)
+    levels: Optional[List[str]] = None
+    services: Optional[List[str]] = None
+
+    @model_validator(mode="after")
+    def _one_matcher(self) -> "Rule":
+        if self.literal is not None and self.pattern is not None:
+            raise ValueError("a rule has either a literal or a pattern, not both")
+        if self.literal == "":
+            raise ValueError("literal must not be empty")
+        if self.pattern is not None:
+            try:
+                re.compile(self.pattern)
+            except re.error as exc:
+                raise ValueError(f"invalid pattern: {exc}")
+        return self
+
+
+# The checks is_suspicious used to hard-code. Their score is 0 so an
+# event's risk comes from the rate detector alone, as before.
+DEFAULT_RULES = [
+    Rule(id="message-failed", literal="failed", score=0.0),
+    Rule(id="error-level", levels=["ERROR", "CRITICAL"], score=0.0),
+]
+
+
+class AhoCorasick:
+    """Find which of many keywords occur in a text in one pass."""
+
+    def __init__(self, keywords: Iterable[str]):
+        self.keywords = list(keywords)
+        goto: List[dict] = [{}]
+        out: List[list] = [[]]
+        for index, keyword in enumerate(self.keywords):
+            state = 0
+            for char in keyword:
+                following = goto[state].get(char)
+                if following is None:
+                    following = goto[state][char] = len(goto)
+                    goto.append({})
+                    out.append([])
+                state = following
+            out[state].append(index)
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, following in goto[state].items():
+                queue.append(following)
+                fallback = fail[state]
+                while fallback and char not in goto[fallback]:
+                    fallback = fail[fallback]
+                target = goto[fallback].get(char, 0)
+                fail[following] = target if target != following else 0
+                out[following] = out[following] + out[fail[following]]
+        self._goto = goto
+        self._fail = fail
+        self._out = [tuple(indexes) for indexes in out]
+
+    def search(self, text: str) -> set:
+        """Indexes of the keywords found in *text*."""
+        goto, fail, out = self._goto, self._fail, self._out
+        found: set = set()
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if out[state]:
+                found.update(out[state])
+        return found
+
+
+def literal_anchor(pattern: str) -> Optional[str]:
+    """Return a lowercase literal every match of *pattern* must contain.
+
+    Only top-level characters outside groups, classes and optional
+    quantifiers are considered, so the result is conservative: ``None``
+    when no run of at least ``MIN_ANCHOR`` characters is certain.
+    """
+    if re.compile(pattern).flags & re.VERBOSE:
+        return None
+    runs: List[str] = []
+    run: List[str] = []
+    i, size = 0, len(pattern)
+    while i < size:
+        char = pattern[i]
+        literal = None
+        if char == "\\":
+            escaped = pattern[i + 1:i + 2]
+            operand = ESCAPE.match(pattern, i)
+            i = operand.end() if operand is not None else i + 2
+            if escaped and not escaped.isalnum():
+                literal = escaped
+        elif char == "|":
+            # Top-level alternation: no literal is required.
+            return None
+        elif char in "([":
+            i = _skip_group(pattern, i)
+        elif char in ".^$":
+            i += 1
+        else:
+            literal = char
+            i += 1
+        quantifier = pattern[i:i + 1]
+        repeat = REPEAT.match(pattern, i) if quantifier == "{" else None
+        if quantifier and quantifier in "*?+" or repeat is not None:
+            if quantifier == "+" and literal is not None:
+                run.append(literal)
+            literal = None
+            i = repeat.end() if repeat is not None else i + 1
+            if pattern[i:i + 1] in ("?", "+"):
+                i += 1
+        if literal is None:
+            runs.append("".join(run))
+            run = []
+        else:
+            run.append(literal)
+    runs.append("".join(run))
+    anchor = max(runs, key=len).lower()
+    return anchor if len(anchor) >= MIN_ANCHOR else None
+
+
+def _skip_group(pattern: str, start: int) -> int:
+    """Index just past the group or class opening at *start*."""
+    depth = 0
+    in_class = False
+    i = start
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "\\":
+            i += 2
+            continue
+        if in_class:
+            if char == "]" and i > class_start:
+                in_class = False
+                if depth == 0:
+                    return i + 1
+        elif char == "[":
+            in_class = True
+            # A "]" right after "[" or "[^" is a literal.
+            class_start = i + (2 if pattern[i + 1:i + 2] == "^" else 1)
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+    return i
+
+
+class CompiledRules:
+    """A rule set compiled for matching many rules at once.
+
+    Literals, and a required literal taken from each regex where one
+    exists, go into one Aho-Corasick automaton, so the cost of a message
+    depends on its length rather than on the number of rules. Regexes are
+    only run when their literal was seen; those without one are tried as a
+    single combined regex first, unless they have groups, which are run on
+    every message.
+    """
+
+    def __init__(self, rules: Iterable[Rule]):
+        self.rules = list(rules)
+        keywords: dict = {}
+        self._regexes: dict = {}
+        self._unanchored: List[int] = []
+        self._always: List[int] = []
+        for index, rule in enumerate(self.rules):
+            if rule.pattern is not None:
+                self._regexes[index] = re.compile(rule.pattern, re.IGNORECASE)
+                anchor = literal_anchor(rule.pattern)
+                if anchor is None and self._regexes[index].groups:
+                    # Joining would renumber its groups and break backreferences.
+                    self._always.append(index)
+                elif anchor is None:
+                    self._unanchored.append(index)
+                else:
+                    keywords.setdefault(anchor, []).append(index)
+            elif rule.literal is not None:
+                keywords.setdefault(rule.literal.lower(), []).append(index)
+            else:
+                self._always.append(index)
+        self._keyword_rules = list(keywords.values())
+        self._automaton = AhoCorasick(keywords)
+        self._combined = None
+        if self._unanchored:
+            try:
+                self._combined = re.compile(
+                    "|".join(f"(?:{self.rules[i].pattern})" for i in self._unanchored), re.IGNORECASE
+                )
+            except re.error:
+                # Inline flags or clashing group names cannot be combined;
+                # run those regexes one by one instead.
+                self._always.extend(self._unanchored)
+        self._levels = [
+            frozenset(level.upper() for level in rule.levels) if rule.levels else None for rule in self.rules
+        ]
+        self._services = [frozenset(rule.services) if rule.services else None for rule in self.rules]
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def match(self, level: str, service: str, message: str) -> List[Rule]:
+        """Rules matching an event, in rule-file order."""
+        candidates = list(self._always)
+        for keyword in self._automaton.search(message.lower()):
+            candidates.extend(self._keyword_rules[keyword])
+        if self._combined is not None and self._combined.search(message):
+            candidates.extend(self._unanchored)
+        if not candidates:
+            return []
+        level = level.upper()
+        matched = []
+        for index in sorted(set(candidates)):
+            levels, services = self._levels[index], self._services[index]
+            if levels is not None and level not in levels:
+                continue
+            if services is not None and service not in services:
+                continue
+            regex = self._regexes.get(index)
+            if regex is not None and not regex.search(message):
+                continue
+            matched.append(self.rules[index])
+        return matched
+
+
+def load_rules(path: Path) -> List[Rule]:
+    """Read a JSON list of rules (or ``{"rules": [...]}``) from *path*."""
+    data = json.loads(path.read_text())
+    if isinstance(data, dict):
+        data = data.get("rules", [])
+    return [Rule.model_validate(item) for item in data]
+
+
+class RuleSet:
+    """The active rules, reloaded from *path* when the file changes.
+
+    A reload compiles the new rules completely before swapping them in with
+    a single assignment, so a request sees either the old or the new set.
+    An invalid file is logged and the current rules stay in force.
+    """
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = path
+        self._mtime: Optional[int] = None
+        self.compiled = CompiledRules(DEFAULT_RULES)
+        if path is not None:
+            self._mtime = os.stat(path).st_mtime_ns
+            self.compiled = CompiledRules(load_rules(path))
+
+    def match(self, level: str, service: str, message: str) -> List[Rule]:
+        return self.compiled.match(level, service, message)
+
+    def reload_if_changed(self) -> bool:
+        if self.path is None:
+            return False
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+            if mtime == self._mtime:
+                return False
+            self._mtime = mtime
+            compiled = CompiledRules(load_rules(self.path))
+        except (OSError, ValueError) as exc:
+            logger.error(f"rules not reloaded from {self.path}: {exc}")
+            return False
+        self.compiled = compiled
+        logger.info(f"reloaded {len(compiled)} rules from {self.path}")
+        return True
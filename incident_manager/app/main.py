@@ -1,8 +1,8 @@
 from fastapi import FastAPI, Request
-from incident_manager.logging_config import setup_logging
+from incident_manager.logging_config import log_shipping, setup_logging
 
-logger = setup_logging()
-app = FastAPI()
+logger = setup_logging(transport="asyncio")
+app = FastAPI(lifespan=log_shipping)
 
 
 @app.middleware("http")
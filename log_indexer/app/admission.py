@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+from typing import Any, Awaitable, Callable, Dict, Iterable
+import json
+import threading
+
+Scope = Dict[str, Any]
+ASGIApp = Callable[[Scope, Callable, Callable], Awaitable[None]]
+
+
+class Budget:
+    """Bounded count of requests in flight for one class of endpoints.
+
+    Once ``limit`` requests are in progress, further ones are rejected
+    immediately rather than queued, and counted in ``rejected``.
+    """
+
+    def __init__(self, name: str, limit: int):
+        if limit < 1:
+            raise ValueError(f"{name} budget must be at least 1")
+        self.name = name
+        self.limit = limit
+        self.in_flight = 0
+        self.peak = 0
+        self.admitted = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if self.in_flight >= self.limit:
+                self.rejected += 1
+                return False
+            self.in_flight += 1
+            self.admitted += 1
+            self.peak = max(self.peak, self.in_flight)
+            return True
+
+    def release(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+
+
+class AdmissionMiddleware:
+    """ASGI middleware applying a :class:`Budget` per matching path.
+
+    A request over budget is answered with ``429 Too Many Requests`` and a
+    ``Retry-After`` header before its body is read, so shedding load costs
+    almost nothing. Paths not listed in *budgets* are not limited.
+    """
+
+    def __init__(self, app: ASGIApp, budgets: Iterable[tuple], retry_after: int = 1):
+        self.app = app
+        self.budgets: Dict[str, Budget] = {path: budget for path, budget in budgets}
+        self.retry_after = retry_after
+
+    async def __call__(self, scope: Scope, receive: Callable, send: Callable) -> None:
+        budget = self.budgets.get(scope.get("path", "")) if scope["type"] == "http" else None
+        if budget is None:
+            await self.app(scope, receive, send)
+            return
+        if not budget.try_acquire():
+            await self._reject(send, budget)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            budget.release()
+
+    async def _reject(self, send: Callable, budget: Budget) -> None:
+        body = json.dumps({"detail": f"{budget.name} capacity exceeded, retry later"}).encode()
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 429,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"retry-after", str(self.retry_after).encode()),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,376 @@
+"""Immutable, compressed, column-oriented segments for cold log rows.
+
+A segment holds rows sorted by ``(timestamp, id)``, one compressed block per
+column, followed by a JSON footer with the codec, row count and each column's
+byte range and min/max. Readers map the file with ``mmap``, use the footers
+to skip segments outside a query, and decompress only what they need.
+
+Layout::
+
+    MAGIC | column blocks ... | footer JSON | footer length (u32 LE) | MAGIC
+"""
+from __future__ import annotations
+
+from array import array
+from itertools import accumulate
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+import bisect
+import heapq
+import json
+import lzma
+import mmap
+import os
+import struct
+import sys
+import threading
+import zlib
+
+try:  # zstd is optional; zlib and lzma ship with Python
+    import zstandard
+except ImportError:  # pragma: no cover - depends on the environment
+    zstandard = None
+
+MAGIC = b"LOGSEG1\n"
+SEGMENT_SUFFIX = ".logseg"
+ROW_FIELDS = ("id", "timestamp", "level", "service", "message", "hash")
+EXPORT_FIELDS = ROW_FIELDS[1:]
+INT_COLUMNS = {"id"}
+
+
+def _codec(name: str) -> Tuple[Any, Any]:
+    """``(compress, decompress)`` for codec *name*."""
+    if name == "zlib":
+        return (lambda data: zlib.compress(data, 6)), zlib.decompress
+    if name == "lzma":
+        return lzma.compress, lzma.decompress
+    if name == "zstd":
+        if zstandard is None:
+            raise RuntimeError("the zstd codec requires the zstandard package")
+        return zstandard.ZstdCompressor(level=9).compress, zstandard.ZstdDecompressor().decompress
+    raise ValueError(f"unsupported archive codec: {name}")
+
+
+class Record(tuple):
+    """Tuple row that can also be indexed by column name, like ``sqlite3.Row``."""
+
+    FIELDS: Tuple[str, ...] = ()
+    _INDEX: Dict[str, int] = {}
+
+    def __getitem__(self, key):  # type: ignore[override]
+        if isinstance(key, str):
+            key = self._INDEX[key]
+        return tuple.__getitem__(self, key)
+
+    def keys(self) -> List[str]:
+        return list(self.FIELDS)
+
+
+class ArchivedRow(Record):
+    FIELDS = ROW_FIELDS
+    _INDEX = {name: i for i, name in enumerate(ROW_FIELDS)}
+
+
+class ArchivedExportRow(Record):
+    FIELDS = EXPORT_FIELDS
+    _INDEX = {name: i for i, name in enumerate(EXPORT_FIELDS)}
+
+
+def _encode_column(name: str, values: Sequence[Any]) -> bytes:
+    if name in INT_COLUMNS:
+        ints = array("q", values)
+        if sys.byteorder == "big":
+            ints.byteswap()
+        return ints.tobytes()
+    encoded = [value.encode() for value in values]
+    lengths = array("I", (len(value) for value in encoded))
+    if sys.byteorder == "big":
+        lengths.byteswap()
+    return lengths.tobytes() + b"".join(encoded)
+
+
+class StringColumn:
+    """A decompressed string column that decodes values only when indexed.
+
+    Queries usually touch a small slice of a segment, so decoding every
+    message up front would dominate the read.
+    """
+
+    def __init__(self, data: bytes, rows: int):
+        lengths = array("I")
+        lengths.frombytes(data[: 4 * rows])
+        if sys.byteorder == "big":
+            lengths.byteswap()
+        self._data = data
+        self._offsets = array("Q", accumulate(lengths, initial=4 * rows))
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index: int) -> str:
+        return self._data[self._offsets[index]:self._offsets[index + 1]].decode()
+
+
+def _decode_column(name: str, data: bytes, rows: int) -> Any:
+    if name in INT_COLUMNS:
+        ints = array("q")
+        ints.frombytes(data)
+        if sys.byteorder == "big":
+            ints.byteswap()
+        return ints
+    return StringColumn(data, rows)
+
+
+def write_segment(path: Path, rows: Sequence[Sequence[Any]], codec: str = "zlib") -> Dict[str, Any]:
+    """Write *rows* (``ROW_FIELDS`` order, already sorted) as a segment.
+
+    The file is written under a temporary name, fsynced and then renamed, so
+    a segment is either complete or absent. Returns the footer.
+    """
+    compress, _ = _codec(codec)
+    columns: Dict[str, Dict[str, Any]] = {}
+    tmp = path.with_name(path.name + ".partial")
+    with open(tmp, "wb") as fh:
+        fh.write(MAGIC)
+        offset = len(MAGIC)
+        for index, name in enumerate(ROW_FIELDS):
+            values = [row[index] for row in rows]
+            block = compress(_encode_column(name, values))
+            fh.write(block)
+            columns[name] = {"offset": offset, "length": len(block), "min": min(values), "max": max(values)}
+            offset += len(block)
+        footer = {"version": 1, "codec": codec, "rows": len(rows), "columns": columns}
+        encoded = json.dumps(footer, separators=(",", ":")).encode()
+        fh.write(encoded + struct.pack("<I", len(encoded)) + MAGIC)
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp, path)
+    dir_fd = os.open(path.parent, os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+    return footer
+
+
+class Segment:
+    """One segment file and its footer."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        with open(path, "rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            tail = len(MAGIC) + 4
+            if mm[: len(MAGIC)] != MAGIC or mm[-len(MAGIC):] != MAGIC:
+                raise ValueError(f"not a log segment: {path}")
+            (length,) = struct.unpack("<I", mm[-tail:-len(MAGIC)])
+            self.footer = json.loads(mm[-tail - length:-tail])
+        self.rows: int = self.footer["rows"]
+        self.columns: Dict[str, Dict[str, Any]] = self.footer["columns"]
+        self.min_ts: str = self.columns["timestamp"]["min"]
+        self.max_ts: str = self.columns["timestamp"]["max"]
+
+    def may_contain(
+        self,
+        level: Optional[str],
+        service: Optional[str],
+        since: Optional[str],
+        until: Optional[str],
+        after: Optional[Tuple[str, int]] = None,
+    ) -> bool:
+        """Whether the footer's min/max allow any row to match."""
+        if since is not None and self.max_ts < since:
+            return False
+        if until is not None and self.min_ts >= until:
+            return False
+        if after is not None and self.max_ts < after[0]:
+            return False
+        for name, value in (("level", level), ("service", service)):
+            if value and not self.columns[name]["min"] <= value <= self.columns[name]["max"]:
+                return False
+        return True
+
+    def read(self, names: Sequence[str]) -> Dict[str, Sequence[Any]]:
+        """Decompress the columns *names*; strings are decoded on access."""
+        _, decompress = _codec(self.footer["codec"])
+        out: Dict[str, Sequence[Any]] = {}
+        with open(self.path, "rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            view = memoryview(mm)
+            try:
+                for name in names:
+                    column = self.columns[name]
+                    block = view[column["offset"]:column["offset"] + column["length"]]
+                    try:
+                        out[name] = _decode_column(name, decompress(block), self.rows)
+                    finally:
+                        block.release()
+            finally:
+                view.release()
+        return out
+
+
+class SegmentArchive:
+    """The segment files under *directory*, oldest first.
+
+    Segments are only ever added or deleted whole; :attr:`generation` changes
+    whenever the set does, so cached query results can key on it. The list is
+    rescanned when the directory changes, so segments written by another
+    process (``manage.py archive``, or the writer in IPC mode) are picked up.
+    A ``read_only`` archive never writes or cleans up the directory.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        codec: str = "zlib",
+        segment_rows: int = 100_000,
+        read_only: bool = False,
+    ):
+        _codec(codec)  # fail fast on an unavailable codec
+        self.directory = directory
+        self.codec = codec
+        self.segment_rows = segment_rows
+        self.read_only = read_only
+        self.generation = 0
+        self._lock = threading.Lock()
+        self._segments: List[Segment] = []
+        self._stamp: Optional[int] = None
+        if not read_only and directory.exists():
+            for leftover in directory.glob(f"*{SEGMENT_SUFFIX}.partial"):
+                leftover.unlink()
+        self._refresh()
+
+    def _refresh(self) -> None:
+        try:
+            stamp: Optional[int] = self.directory.stat().st_mtime_ns
+        except FileNotFoundError:
+            stamp = None
+        if stamp == self._stamp:
+            return
+        with self._lock:
+            known = {s.path: s for s in self._segments}
+            paths = sorted(self.directory.glob(f"*{SEGMENT_SUFFIX}")) if stamp is not None else []
+            self._segments = [known.get(path) or Segment(path) for path in paths]
+            if self._segments != list(known.values()):
+                self.generation += 1
+            self._stamp = stamp
+
+    @property
+    def segments(self) -> List[Segment]:
+        self._refresh()
+        return list(self._segments)
+
+    def append(self, rows: Sequence[Sequence[Any]]) -> List[Segment]:
+        """Store *rows* (``ROW_FIELDS`` order) in new segments of bounded size."""
+        if self.read_only:
+            raise RuntimeError("archive is read-only")
+        ordered = sorted(rows, key=lambda r: (r[1], r[0]))
+        created = []
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._refresh()
+        with self._lock:
+            number = int(self._segments[-1].path.stem.split("-")[1]) + 1 if self._segments else 1
+            for start in range(0, len(ordered), self.segment_rows):
+                path = self.directory / f"segment-{number:08d}{SEGMENT_SUFFIX}"
+                write_segment(path, ordered[start:start + self.segment_rows], self.codec)
+                segment = Segment(path)
+                self._segments.append(segment)
+                created.append(segment)
+                number += 1
+            if created:
+                self.generation += 1
+        return created
+
+    def drop_before(self, cutoff: str) -> List[Path]:
+        """Delete segments whose newest row is older than *cutoff*."""
+        if self.read_only:
+            return []
+        self._refresh()
+        with self._lock:
+            dropped = [s for s in self._segments if s.max_ts < cutoff]
+            for segment in dropped:
+                segment.path.unlink(missing_ok=True)
+            self._segments = [s for s in self._segments if s not in dropped]
+            if dropped:
+                self.generation += 1
+        return [s.path for s in dropped]
+
+    def fetch_rows(
+        self,
+        level: Optional[str] = None,
+        service: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        limit: Optional[int] = None,
+        after: Optional[Tuple[str, int]] = None,
+    ) -> List[ArchivedRow]:
+        """Archived rows matching the filters, ordered by ``(timestamp, id)``.
+
+        Bounds are ISO timestamp strings compared the same way as stored
+        text timestamps. Segments are visited in order of their oldest row
+        and skipped once ``limit`` rows precede everything they hold.
+        """
+        merged: List[ArchivedRow] = []
+        for segment in sorted(self.segments, key=lambda s: s.min_ts):
+            if not segment.may_contain(level, service, since, until, after):
+                continue
+            if limit is not None and len(merged) >= limit and segment.min_ts > merged[-1][1]:
+                break
+            rows = self._scan(segment, level, service, since, until, after, limit)
+            merged = list(heapq.merge(merged, rows, key=lambda r: (r[1], r[0])))
+            if limit is not None:
+                merged = merged[:limit]
+        return merged
+
+    @staticmethod
+    def _scan(
+        segment: Segment,
+        level: Optional[str],
+        service: Optional[str],
+        since: Optional[str],
+        until: Optional[str],
+        after: Optional[Tuple[str, int]],
+        limit: Optional[int],
+    ) -> List[ArchivedRow]:
+        timestamps = segment.read(["timestamp"])["timestamp"]
+        # Rows are sorted by timestamp, so the range is a slice.
+        lo = bisect.bisect_left(timestamps, max(since or "", after[0] if after else ""))
+        hi = bisect.bisect_left(timestamps, until) if until is not None else len(timestamps)
+        if lo >= hi:
+            return []
+        columns = segment.read([name for name in ROW_FIELDS if name != "timestamp"])
+        columns["timestamp"] = timestamps
+        rows = []
+        for i in range(lo, hi):
+            if level and columns["level"][i] != level:
+                continue
+            if service and columns["service"][i] != service:
+                continue
+            if after is not None and (timestamps[i], columns["id"][i]) <= after:
+                continue
+            rows.append(ArchivedRow(columns[name][i] for name in ROW_FIELDS))
+            if limit is not None and len(rows) >= limit:
+                break
+        return rows
+
+    def iter_rows(self, batch_size: int = 1000) -> Iterator[List[ArchivedExportRow]]:
+        """Every archived row in export column order, segment by segment."""
+        for segment in self.segments:
+            columns = segment.read(EXPORT_FIELDS)
+            for start in range(0, segment.rows, batch_size):
+                stop = min(start + batch_size, segment.rows)
+                yield [
+                    ArchivedExportRow(columns[name][i] for name in EXPORT_FIELDS)
+                    for i in range(start, stop)
+                ]
+
+    def last_keys(self) -> List[Tuple[int, str]]:
+        """``(id, hash)`` of each row in the newest segment.
+
+        Used to reconcile an interrupted archive run. Ids alone are not enough
+        because every partition numbers its rows independently.
+        """
+        segments = self.segments
+        if not segments:
+            return []
+        columns = segments[-1].read(["id", "hash"])
+        return [(columns["id"][i], columns["hash"][i]) for i in range(segments[-1].rows)]
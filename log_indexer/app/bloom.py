@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+from typing import Iterable
+import hashlib
+import math
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings.
+
+    ``might_contain`` never returns a false negative, so a ``False`` answer
+    proves a value was never added. Positions come from double hashing over
+    one 128-bit BLAKE2b digest. Once more than ``capacity`` values have been
+    added the false-positive rate climbs above ``error_rate``; callers check
+    :attr:`saturated` and rebuild with a larger capacity.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        self.capacity = max(capacity, 1)
+        self.error_rate = error_rate
+        self.size = max(8, int(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    @classmethod
+    def from_values(cls, values: Iterable[str], capacity: int, error_rate: float = 0.01) -> "BloomFilter":
+        bloom = cls(capacity, error_rate)
+        for value in values:
+            bloom.add(value)
+        return bloom
+
+    @property
+    def saturated(self) -> bool:
+        return self.count > self.capacity
+
+    def _positions(self, value: str) -> Iterable[int]:
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, value: str) -> None:
+        for pos in self._positions(value):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def might_contain(self, value: str) -> bool:
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(value))
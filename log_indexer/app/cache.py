@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Hashable, List, Optional, Tuple
+import sqlite3
+import threading
+
+from .models import LogEntry
+
+# Rough per-entry cost of a cached ``LogEntry`` beyond its string fields.
+ENTRY_OVERHEAD = 400
+
+
+def query_key(
+    level: Optional[str],
+    service: Optional[str],
+    since: Optional[datetime],
+    until: Optional[datetime],
+    limit: Optional[int],
+    cursor: Optional[str],
+) -> Tuple[Any, ...]:
+    """Normalize read parameters so equivalent requests share an entry."""
+    return (
+        level or None,
+        service or None,
+        since.isoformat() if since else None,
+        until.isoformat() if until else None,
+        limit,
+        cursor or None,
+    )
+
+
+def page_size(entries: List[LogEntry]) -> int:
+    """Approximate memory held by a cached page."""
+    return sum(
+        ENTRY_OVERHEAD + len(e.message) + len(e.service) + len(e.level) + len(e.hash or "")
+        for e in entries
+    )
+
+
+def rows_size(rows: List[sqlite3.Row]) -> int:
+    """Approximate memory held by cached raw rows."""
+    return sum(
+        ENTRY_OVERHEAD + len(r["message"]) + len(r["service"]) + len(r["level"]) + len(r["hash"] or "")
+        for r in rows
+    )
+
+
+class QueryCache:
+    """LRU cache of query results capped at ``max_bytes``.
+
+    Each entry is stored with the write generation it was computed at;
+    :meth:`get` only returns it while the caller's current generation still
+    matches, so a write invalidates results without touching the cache. Stale
+    entries are replaced on the next miss or evicted as the least recently
+    used. A ``max_bytes`` of 0 disables caching.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, Tuple[Hashable, Any, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, generation: Hashable) -> Optional[Any]:
+        with self._lock:
+            found = self._entries.get(key)
+            if found is None or found[0] != generation:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return found[1]
+
+    def put(self, key: Hashable, generation: Hashable, value: Any, size: int) -> None:
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[2]
+            self._entries[key] = (generation, value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, _, evicted) = self._entries.popitem(last=False)
+                self.bytes -= evicted
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
@@ -1,72 +1,705 @@
 from __future__ import annotations
 
 from pathlib import Path
-from typing import List, Optional
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from collections import Counter
+import base64
+import heapq
+import json
 import sqlite3
+import threading
 from datetime import datetime
 
+from .archive import SegmentArchive
+from .bloom import BloomFilter
+from .cache import QueryCache, page_size, query_key, rows_size
 from .models import LogEntry
+from .pool import ReadPool
+from .schema import TextLayout, detect_layout
+from .writer import GroupCommitWriter
+
+# Lower bound for the duplicate-check Bloom filter; it is sized at twice the
+# stored row count and rebuilt larger once it fills up.
+BLOOM_MIN_CAPACITY = 100_000
+# Hashes probed per ``IN (...)`` lookup when the Bloom filter reports a hit.
+PROBE_CHUNK = 500
+
+SYNCHRONOUS_MODES = {"OFF", "NORMAL", "FULL", "EXTRA"}
+
+
+# External-content FTS5 index over ``logs.message``; the triggers keep it in
+# step with every insert, delete and update on ``logs``.
+FTS_SCHEMA = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS logs_fts USING fts5(message, content='logs', content_rowid='id')",
+    """
+    CREATE TRIGGER IF NOT EXISTS logs_fts_ai AFTER INSERT ON logs BEGIN
+        INSERT INTO logs_fts (rowid, message) VALUES (new.id, new.message);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS logs_fts_ad AFTER DELETE ON logs BEGIN
+        INSERT INTO logs_fts (logs_fts, rowid, message) VALUES ('delete', old.id, old.message);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS logs_fts_au AFTER UPDATE OF message ON logs BEGIN
+        INSERT INTO logs_fts (logs_fts, rowid, message) VALUES ('delete', old.id, old.message);
+        INSERT INTO logs_fts (rowid, message) VALUES (new.id, new.message);
+    END
+    """,
+]
+
+
+# Rollup granularity -> (table, length of the ISO timestamp prefix it keys on).
+ROLLUPS = {
+    "minute": ("log_rollup_minute", len("YYYY-MM-DDTHH:MM")),
+    "hour": ("log_rollup_hour", len("YYYY-MM-DDTHH")),
+}
+STATS_INTERVALS = ("minute", "hour", "total")
+STATS_DIMENSIONS = ("service", "level")
+
+
+def encode_cursor(timestamp: str, row_id: int) -> str:
+    """Return an opaque pagination cursor pointing after ``(timestamp, row_id)``."""
+    raw = json.dumps([timestamp, row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """Inverse of :func:`encode_cursor`; raises ``ValueError`` on bad input."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        timestamp, row_id = json.loads(raw)
+    except Exception as exc:
+        raise ValueError("invalid cursor") from exc
+    if not isinstance(timestamp, str) or not isinstance(row_id, int):
+        raise ValueError("invalid cursor")
+    return timestamp, row_id
+
+
+def row_to_entry(row: sqlite3.Row) -> LogEntry:
+    return LogEntry(
+        timestamp=datetime.fromisoformat(row["timestamp"]),
+        level=row["level"],
+        service=row["service"],
+        message=row["message"],
+        hash=row["hash"],
+    )
+
+
+def page_rows(
+    rows: List[sqlite3.Row], limit: Optional[int]
+) -> Tuple[List[sqlite3.Row], Optional[str]]:
+    """Trim up to ``limit + 1`` ordered rows to a page and its next cursor."""
+    next_cursor = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["timestamp"], rows[-1]["id"])
+    return rows, next_cursor
+
+
+def build_page(
+    rows: List[sqlite3.Row], limit: Optional[int]
+) -> Tuple[List[LogEntry], Optional[str]]:
+    """Turn up to ``limit + 1`` ordered rows into a page and its next cursor."""
+    rows, next_cursor = page_rows(rows, limit)
+    return [row_to_entry(row) for row in rows], next_cursor
+
 
 class LogDAO:
-    """Data access object for log entries backed by SQLite."""
+    """Data access object for log entries backed by SQLite.
+
+    The database runs in WAL mode with one writer connection and a bounded
+    :class:`ReadPool` of read-only connections (``read_pool_size``). Queries
+    and exports never share a connection with ingest, each sees a consistent
+    snapshot, and a long export does not stall writers.
+
+    By default every write is committed on the calling thread. With
+    ``group_commit=True`` writes are handed to a :class:`GroupCommitWriter`
+    thread that commits in groups of up to ``batch_size`` rows or every
+    ``flush_interval`` seconds. Pass ``wait=True`` to the write methods to
+    block until the rows are durable.
 
-    def __init__(self, db_path: Path):
-        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+    Ingest is idempotent: ``hash`` is unique and entries whose hash is already
+    stored are dropped. An in-memory Bloom filter of stored hashes means only
+    probable duplicates cost an index lookup.
+
+    With ``full_text=True`` (the default) messages are also indexed in an
+    FTS5 table for :meth:`search`.
+
+    With ``cache_bytes`` set, :meth:`query_page` results are kept in an LRU
+    :class:`QueryCache` of that size. Every committed write that stores rows
+    bumps :attr:`generation`, which invalidates all cached results.
+
+    With an ``archive``, :meth:`archive_before` moves aged rows into its
+    compressed segments and the query and export paths read them back
+    alongside the live table.
+
+    A ``read_only`` DAO serves reads from a database that another process
+    writes (see ``ipc``). It never changes the schema, and its
+    :attr:`generation` follows SQLite's ``data_version`` so cached results
+    are dropped when the other process commits.
+
+    ``compact=True`` creates new databases in the dictionary-encoded
+    :class:`~.schema.CompactLayout`; existing databases keep the layout they
+    were created with (see ``manage.py compact``). Timestamps are stored and
+    read back in UTC in either layout; naive timestamps are taken as UTC.
+    """
+
+    def __init__(
+        self,
+        db_path: Path,
+        *,
+        group_commit: bool = False,
+        full_text: bool = True,
+        batch_size: int = 500,
+        flush_interval: float = 0.05,
+        queue_size: int = 10000,
+        synchronous: str = "NORMAL",
+        read_pool_size: int = 4,
+        compact: bool = False,
+        cache_bytes: int = 0,
+        archive: Optional[SegmentArchive] = None,
+        read_only: bool = False,
+    ):
+        if synchronous.upper() not in SYNCHRONOUS_MODES:
+            raise ValueError(f"unsupported synchronous mode: {synchronous}")
+        self.read_only = read_only
+        if read_only:
+            # Detects the layout and watches ``data_version``; never writes.
+            uri = f"{Path(db_path).resolve().as_uri()}?mode=ro"
+            self._conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            if not self._conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'logs'").fetchone():
+                self._conn.close()
+                raise FileNotFoundError(f"{db_path} has not been initialized by its writer")
+        else:
+            # The single writer connection; also used for schema maintenance.
+            self._conn = sqlite3.connect(db_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
         self._conn.row_factory = sqlite3.Row
-        self._setup()
+        self.layout: TextLayout = detect_layout(self._conn, compact)
+        self._writer: Optional[GroupCommitWriter] = None
+        self.full_text = full_text
+        self.duplicates_dropped = 0
+        # Only partitioned stores drop entries for retention on ingest.
+        self.expired_dropped = 0
+        # Bumped after each commit that stored rows; keys the query cache.
+        self._generation = 0
+        self._dirty = False
+        self.query_cache = QueryCache(cache_bytes)
+        self.archive = archive
+        # Serializes everything that uses the writer connection.
+        self._write_lock = threading.Lock()
+        if not read_only:
+            self._setup()
+            self._bloom = self._load_bloom()
+        self._readers = ReadPool(db_path, size=read_pool_size)
+        if group_commit and not read_only:
+            self._conn.execute(f"PRAGMA synchronous={synchronous}")
+            self._writer = GroupCommitWriter(
+                self._conn,
+                self._write_rows,
+                lock=self._write_lock,
+                batch_size=batch_size,
+                flush_interval=flush_interval,
+                queue_size=queue_size,
+                on_commit=self._committed,
+                on_rollback=self._rolled_back,
+            )
 
     def _setup(self) -> None:
+        removed = 0
         with self._conn:
-            self._conn.execute(
-                """
-                CREATE TABLE IF NOT EXISTS logs (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    timestamp TEXT NOT NULL,
-                    level TEXT NOT NULL,
-                    service TEXT NOT NULL,
-                    message TEXT NOT NULL,
-                    hash TEXT NOT NULL
+            for statement in self.layout.create:
+                self._conn.execute(statement)
+            for name, target in self.layout.indexes.items():
+                self._conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {target}")
+            has_unique_hash = self._conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_logs_hash'"
+            ).fetchone()
+            if not has_unique_hash:
+                # Older databases may already hold retried duplicates; keep the
+                # first copy of each so the unique index can be built.
+                removed = self._conn.execute(
+                    "DELETE FROM logs WHERE id NOT IN (SELECT MIN(id) FROM logs GROUP BY hash)"
+                ).rowcount
+                self._conn.execute("CREATE UNIQUE INDEX idx_logs_hash ON logs (hash)")
+            if self.full_text:
+                for statement in FTS_SCHEMA:
+                    self._conn.execute(statement)
+            existing = {
+                row[0] for row in self._conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+            }
+            for table, _ in ROLLUPS.values():
+                self._conn.execute(
+                    f"""
+                    CREATE TABLE IF NOT EXISTS {table} (
+                        bucket TEXT NOT NULL,
+                        service TEXT NOT NULL,
+                        level TEXT NOT NULL,
+                        count INTEGER NOT NULL,
+                        PRIMARY KEY (bucket, service, level)
+                    ) WITHOUT ROWID
+                    """
                 )
-                """
-            )
+        if removed or any(table not in existing for table, _ in ROLLUPS.values()):
+            # Databases created before rollups existed get a one-off backfill.
+            self.rebuild_rollups()
 
-    def add_log(self, entry: LogEntry) -> None:
-        with self._conn:
-            self._conn.execute(
-                "INSERT INTO logs (timestamp, level, service, message, hash) VALUES (?, ?, ?, ?, ?)",
-                (
-                    entry.timestamp.isoformat(),
-                    entry.level,
-                    entry.service,
-                    entry.message,
-                    entry.hash,
-                ),
+    def _load_bloom(self) -> BloomFilter:
+        count = self._conn.execute("SELECT COUNT(*) FROM logs").fetchone()[0]
+        hashes = (row[0] for row in self._conn.execute(f"SELECT {self.layout.hash} FROM logs"))
+        return BloomFilter.from_values(hashes, capacity=max(BLOOM_MIN_CAPACITY, 2 * count))
+
+    def _to_row(self, entry: LogEntry) -> tuple:
+        return (
+            self.layout.logical_timestamp(entry.timestamp),
+            entry.level,
+            entry.service,
+            entry.message,
+            entry.hash,
+        )
+
+    def _write_rows(self, conn: sqlite3.Connection, rows: List[Any]) -> List[str]:
+        """Insert the new rows of *rows* inside the caller's transaction.
+
+        Returns the hashes of the rows stored; the rest were duplicates,
+        either within the batch or of rows already in the table.
+        """
+        fresh: Dict[str, Any] = {}
+        for row in rows:
+            fresh.setdefault(row[4], row)
+        maybe_stored = [h for h in fresh if self._bloom.might_contain(h)]
+        for start in range(0, len(maybe_stored), PROBE_CHUNK):
+            chunk = maybe_stored[start:start + PROBE_CHUNK]
+            placeholders = ", ".join("?" * len(chunk))
+            probe = f"SELECT {self.layout.hash} FROM logs WHERE logs.hash IN ({placeholders})"
+            for (stored,) in conn.execute(probe, [self.layout.hash_param(h) for h in chunk]):
+                del fresh[stored]
+        new_rows = list(fresh.values())
+        self.layout.insert(conn, new_rows)
+        # Fold the batch into the rollups inside the same transaction; a batch
+        # of N rows costs one upsert per distinct (bucket, service, level).
+        for table, width in ROLLUPS.values():
+            counts = Counter((row[0][:width], row[2], row[1]) for row in new_rows)
+            conn.executemany(
+                f"INSERT INTO {table} (bucket, service, level, count) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT (bucket, service, level) DO UPDATE SET count = count + excluded.count",
+                [(*key, count) for key, count in counts.items()],
             )
+        for row in new_rows:
+            self._bloom.add(row[4])
+        if self._bloom.saturated:
+            self._bloom = BloomFilter.from_values(
+                (row[0] for row in conn.execute(f"SELECT {self.layout.hash} FROM logs")),
+                capacity=2 * self._bloom.count,
+            )
+        self.duplicates_dropped += len(rows) - len(new_rows)
+        self._dirty = self._dirty or bool(new_rows)
+        return list(fresh)
+
+    @property
+    def generation(self) -> int:
+        """Changes whenever committed rows change; keys the query cache."""
+        if self.read_only:
+            with self._write_lock:
+                return self._conn.execute("PRAGMA data_version").fetchone()[0]
+        return self._generation
+
+    def _committed(self) -> None:
+        if self._dirty:
+            self._dirty = False
+            self._generation += 1
+
+    def _rolled_back(self) -> None:
+        self._dirty = False
+        self.layout.forget()
+
+    def split_expired(self, entries: Iterable[LogEntry]) -> Tuple[List[LogEntry], List[LogEntry]]:
+        """Entries kept and entries past retention; a single database keeps all."""
+        return list(entries), []
+
+    def add_log(self, entry: LogEntry, wait: bool = False) -> Optional[int]:
+        return self.add_logs([entry], wait=wait)
 
-    def query_logs(self, level: Optional[str] = None, service: Optional[str] = None) -> List[LogEntry]:
-        query = "SELECT timestamp, level, service, message, hash FROM logs"
-        conditions = []
-        params: List[str] = []
+    def add_logs(self, entries: Iterable[LogEntry], wait: bool = False) -> Optional[int]:
+        """Insert *entries* with a single ``executemany`` in one transaction.
+
+        Returns the number of entries stored, which excludes duplicates. In
+        group-commit mode the rows are queued for the writer thread and
+        ``wait`` controls whether to block until they are committed; without
+        waiting the outcome is unknown and ``None`` is returned.
+        """
+        stored = self.store_logs(entries, wait=wait)
+        return None if stored is None else len(stored)
+
+    def store_logs(self, entries: Iterable[LogEntry], wait: bool = False) -> Optional[List[str]]:
+        """Like :meth:`add_logs`, but return the hashes of the entries stored."""
+        if self.read_only:
+            raise RuntimeError("this log store is read-only")
+        rows = [self._to_row(entry) for entry in entries]
+        if not rows:
+            return []
+        if self._writer is not None:
+            future = self._writer.submit(rows)
+            return future.result() if wait else None
+        with self._write_lock:
+            try:
+                with self._conn:
+                    stored = self._write_rows(self._conn, rows)
+            except Exception:
+                self._rolled_back()
+                raise
+            self._committed()
+            return stored
+
+    def flush(self) -> None:
+        """Block until every queued write has been committed."""
+        if self._writer is not None:
+            self._writer.flush()
+
+    @property
+    def pending_writes(self) -> int:
+        """Number of write submissions queued for the writer thread."""
+        return self._writer.depth if self._writer is not None else 0
+
+    def close(self) -> None:
+        """Flush pending writes and close all connections."""
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        self._readers.close()
+        self._conn.close()
+
+    def query_logs(
+        self,
+        level: Optional[str] = None,
+        service: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+    ) -> List[LogEntry]:
+        return self.query_page(level, service, since, until, limit, cursor)[0]
+
+    def query_page(
+        self,
+        level: Optional[str] = None,
+        service: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[LogEntry], Optional[str]]:
+        """Return up to *limit* matching entries and the cursor for the next page.
+
+        Results are ordered by ``(timestamp, id)``. Pages are addressed by
+        keyset rather than OFFSET, so fetching a page costs the same no matter
+        how deep into the result set it is. ``since`` is inclusive and
+        ``until`` exclusive. The returned cursor is ``None`` on the last page.
+        """
+        after = decode_cursor(cursor) if cursor else None
+        key = query_key(level, service, since, until, limit, cursor)
+        # Read the generation first: a write committing mid-query then makes
+        # this result stale rather than caching it under the newer generation.
+        generation = self.generation
+        cached = self.query_cache.get(key, generation) if self.query_cache.max_bytes else None
+        if cached is not None:
+            return list(cached[0]), cached[1]
+        # Fetch one extra row to learn whether another page exists.
+        fetch = limit + 1 if limit is not None else None
+        rows = self._collect(level, service, since, until, fetch, after)
+        entries, next_cursor = build_page(rows, limit)
+        if self.query_cache.max_bytes:
+            self.query_cache.put(key, generation, (entries, next_cursor), page_size(entries))
+        return list(entries), next_cursor
+
+    def query_rows(
+        self,
+        level: Optional[str] = None,
+        service: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[sqlite3.Row], Optional[str]]:
+        """Like :meth:`query_page` but returns raw rows, skipping the models.
+
+        For callers that encode rows straight to bytes; see ``encoders``.
+        """
+        after = decode_cursor(cursor) if cursor else None
+        key = ("rows", *query_key(level, service, since, until, limit, cursor))
+        generation = self.generation
+        cached = self.query_cache.get(key, generation) if self.query_cache.max_bytes else None
+        if cached is not None:
+            return cached
+        fetch = limit + 1 if limit is not None else None
+        page = page_rows(self._collect(level, service, since, until, fetch, after), limit)
+        if self.query_cache.max_bytes:
+            self.query_cache.put(key, generation, page, rows_size(page[0]))
+        return page
+
+    def _collect(
+        self,
+        level: Optional[str],
+        service: Optional[str],
+        since: Optional[datetime],
+        until: Optional[datetime],
+        limit: Optional[int],
+        after: Optional[Tuple[str, int]],
+    ) -> List[Any]:
+        """Live rows from :meth:`fetch_rows` merged with any archived ones."""
+        rows = self.fetch_rows(level, service, since, until, limit, after)
+        if self.archive is None or not self.archive.segments:
+            return rows
+        bounds = [self.layout.logical_timestamp(b) if b else None for b in (since, until)]
+        archived = self.archive.fetch_rows(level, service, *bounds, limit, after)
+        merged = list(heapq.merge(archived, rows, key=lambda r: (r["timestamp"], r["id"])))
+        return merged[:limit] if limit is not None else merged
+
+    def fetch_rows(
+        self,
+        level: Optional[str] = None,
+        service: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        limit: Optional[int] = None,
+        after: Optional[Tuple[str, int]] = None,
+    ) -> List[sqlite3.Row]:
+        """Return raw matching rows ordered by ``(timestamp, id)``.
+
+        *after* is a decoded cursor; only rows sorting after it are returned.
+        """
+        order = self.layout.order_column
+        query = f"SELECT {self.layout.columns} FROM logs"
+        conditions, params = self._filters(level, service, since, until)
+        if after:
+            conditions.append(f"({order}, logs.id) > (?, ?)")
+            params.extend([self.layout.cursor_param(after[0]), after[1]])
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += f" ORDER BY {order}, logs.id"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        with self._readers.connection() as conn:
+            return conn.execute(query, params).fetchall()
+
+    def _filters(
+        self,
+        level: Optional[str],
+        service: Optional[str],
+        since: Optional[datetime],
+        until: Optional[datetime],
+    ) -> Tuple[List[str], List[Any]]:
+        """Build the WHERE conditions on ``logs`` shared by the read paths."""
+        layout = self.layout
+        conditions: List[str] = []
+        params: List[Any] = []
+        if level:
+            conditions.append(layout.level_condition())
+            params.append(level)
+        if service:
+            conditions.append(layout.service_condition())
+            params.append(service)
+        if since:
+            conditions.append(f"{layout.order_column} >= ?")
+            params.append(layout.time_param(since))
+        if until:
+            conditions.append(f"{layout.order_column} < ?")
+            params.append(layout.time_param(until))
+        return conditions, params
+
+    def search(
+        self,
+        q: str,
+        level: Optional[str] = None,
+        service: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        limit: int = 100,
+    ) -> List[LogEntry]:
+        """Return entries whose message matches the FTS5 query *q*, best first.
+
+        *q* uses FTS5 syntax, e.g. ``"login failed"`` for a phrase or
+        ``auth*`` for a prefix. Ranking is by BM25. Raises ``ValueError`` for
+        malformed queries and ``RuntimeError`` if full-text search is off.
+        """
+        rows = self.search_rows(q, level, service, since, until, limit)
+        return [row_to_entry(row) for row in rows]
+
+    def search_rows(
+        self,
+        q: str,
+        level: Optional[str] = None,
+        service: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        limit: int = 100,
+    ) -> List[sqlite3.Row]:
+        """Raw form of :meth:`search`; each row also carries its ``rank``."""
+        if not self.full_text:
+            raise RuntimeError("full-text search is disabled")
+        conditions, params = self._filters(level, service, since, until)
+        query = (
+            f"SELECT {self.layout.columns}, logs_fts.rank AS rank"
+            " FROM logs_fts JOIN logs ON logs.id = logs_fts.rowid"
+            " WHERE logs_fts MATCH ?"
+        )
+        for condition in conditions:
+            query += " AND " + condition
+        query += " ORDER BY logs_fts.rank LIMIT ?"
+        try:
+            with self._readers.connection() as conn:
+                return conn.execute(query, [q, *params, limit]).fetchall()
+        except sqlite3.OperationalError as exc:
+            # Malformed MATCH expressions surface as a generic SQLITE_ERROR;
+            # anything else (busy, I/O) is a real failure.
+            if exc.sqlite_errorcode != sqlite3.SQLITE_ERROR:
+                raise
+            raise ValueError(f"invalid search query: {exc}") from exc
+
+    def rebuild_search_index(self) -> int:
+        """Rebuild the FTS5 index from ``logs`` and return the row count.
+
+        Use this to backfill databases created before full-text search existed
+        or to repair the index.
+        """
+        with self._write_lock, self._conn:
+            for statement in FTS_SCHEMA:
+                self._conn.execute(statement)
+            self._conn.execute("INSERT INTO logs_fts (logs_fts) VALUES ('rebuild')")
+            return self._conn.execute("SELECT COUNT(*) FROM logs").fetchone()[0]
+
+    def rebuild_rollups(self) -> None:
+        """Recompute the rollup tables from ``logs``."""
+        layout = self.layout
+        with self._write_lock, self._conn:
+            for table, width in ROLLUPS.values():
+                self._conn.execute(f"DELETE FROM {table}")
+                self._conn.execute(
+                    f"INSERT INTO {table} (bucket, service, level, count)"
+                    f" SELECT substr({layout.timestamp}, 1, {width}), {layout.service}, {layout.level}, COUNT(*)"
+                    " FROM logs GROUP BY 1, 2, 3"
+                )
+
+    def stats(
+        self,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        interval: str = "hour",
+        group_by: Iterable[str] = STATS_DIMENSIONS,
+        level: Optional[str] = None,
+        service: Optional[str] = None,
+    ) -> List[dict]:
+        """Count entries per time bucket and ``group_by`` dimensions.
+
+        Answered from the rollup tables, never from raw rows. ``interval`` is
+        ``minute``, ``hour`` or ``total``. Time bounds are applied at minute
+        resolution: ``since`` and ``until`` are rounded down to the minute.
+        """
+        if interval not in STATS_INTERVALS:
+            raise ValueError(f"unsupported interval: {interval}")
+        unknown = set(group_by) - set(STATS_DIMENSIONS)
+        if unknown:
+            raise ValueError(f"cannot group by: {', '.join(sorted(unknown))}")
+        dimensions = [d for d in STATS_DIMENSIONS if d in set(group_by)]
+        # Hour rollups are only exact when both bounds fall on the hour.
+        aligned = all(b is None or (b.minute, b.second, b.microsecond) == (0, 0, 0) for b in (since, until))
+        table, width = ROLLUPS["hour" if interval != "minute" and aligned else "minute"]
+        # Rollup tables always hold plain text, whatever the ``logs`` layout.
+        conditions: List[str] = []
+        params: List[Any] = []
         if level:
             conditions.append("level = ?")
             params.append(level)
         if service:
             conditions.append("service = ?")
             params.append(service)
+        if since:
+            conditions.append("bucket >= ?")
+            params.append(self.layout.logical_timestamp(since)[:width])
+        if until:
+            conditions.append("bucket < ?")
+            params.append(self.layout.logical_timestamp(until)[:width])
+
+        columns = list(dimensions)
+        if interval == "minute":
+            columns.insert(0, "bucket")
+        elif interval == "hour":
+            columns.insert(0, f"substr(bucket, 1, {ROLLUPS['hour'][1]}) || ':00' AS bucket")
+        select = ", ".join(columns + ["SUM(count) AS count"])
+        query = f"SELECT {select} FROM {table}"
         if conditions:
             query += " WHERE " + " AND ".join(conditions)
-        cursor = self._conn.execute(query, params)
-        rows = cursor.fetchall()
-        return [
-            LogEntry(
-                timestamp=datetime.fromisoformat(row["timestamp"]),
-                level=row["level"],
-                service=row["service"],
-                message=row["message"],
-                hash=row["hash"],
-            )
-            for row in rows
-        ]
+        keys = (["bucket"] if interval != "total" else []) + dimensions
+        if keys:
+            query += " GROUP BY " + ", ".join(keys) + " ORDER BY " + ", ".join(keys)
+        with self._readers.connection() as conn:
+            return [dict(row) for row in conn.execute(query, params)]
+
+    def archive_before(self, cutoff: datetime, archive: Optional[SegmentArchive] = None) -> int:
+        """Move rows older than *cutoff* into *archive* (default :attr:`archive`).
+
+        Rows are copied one segment at a time: each segment is written and
+        fsynced before its rows are deleted from ``logs`` in a transaction.
+        If a run is interrupted between the two steps, the next run first
+        deletes rows the newest segment already holds. Archived rows leave
+        the full-text index and the unique hash index, so they are no longer
+        searchable or protected against re-ingestion; rollups and thus
+        ``/stats`` still count them. Returns the number of rows moved.
+        """
+        archive = archive or self.archive
+        if archive is None:
+            raise RuntimeError("no archive configured")
+        layout = self.layout
+        moved = 0
+        with self._write_lock:
+            with self._conn:
+                self._conn.executemany(
+                    "DELETE FROM logs WHERE id = ? AND hash = ?",
+                    [(i, layout.hash_param(h)) for i, h in archive.last_keys()],
+                )
+            while True:
+                rows = self._conn.execute(
+                    f"SELECT {layout.columns} FROM logs WHERE {layout.order_column} < ?"
+                    f" ORDER BY {layout.order_column}, logs.id LIMIT ?",
+                    (layout.time_param(cutoff), archive.segment_rows),
+                ).fetchall()
+                if not rows:
+                    break
+                archive.append([tuple(row) for row in rows])
+                with self._conn:
+                    self._conn.executemany("DELETE FROM logs WHERE id = ?", [(row["id"],) for row in rows])
+                self._generation += 1
+                moved += len(rows)
+        return moved
 
     def all_logs(self) -> List[LogEntry]:
         return self.query_logs()
+
+    def iter_rows(self, batch_size: int = 1000) -> Iterator[List[sqlite3.Row]]:
+        """Yield every stored row in insertion order, ``batch_size`` at a time.
+
+        Archived rows come first, segment by segment. For the live table a
+        single statement on a pooled read connection is stepped with
+        ``fetchmany``, so only one batch is held in memory and the caller sees
+        the table as of the first batch while ingest carries on.
+        """
+        if self.archive is not None:
+            yield from self.archive.iter_rows(batch_size)
+        with self._readers.connection() as conn:
+            layout = self.layout
+            cursor = conn.execute(
+                f"SELECT {layout.timestamp} AS timestamp, {layout.level} AS level,"
+                f" {layout.service} AS service, logs.message AS message, {layout.hash} AS hash"
+                " FROM logs ORDER BY logs.id"
+            )
+            try:
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    yield rows
+            finally:
+                cursor.close()
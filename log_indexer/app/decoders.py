@@ -0,0 +1,73 @@
+"""Decode ingest request bodies.
+
+Besides JSON (and NDJSON for batches), bodies may be MessagePack
+(``Content-Type: application/msgpack``) and any of them may be sent with
+``Content-Encoding: gzip``. Decompression is capped so a small compressed
+body cannot expand without bound.
+"""
+from __future__ import annotations
+
+from typing import Any, List
+import json
+import zlib
+
+try:  # MessagePack input is optional
+    import msgpack
+except ImportError:  # pragma: no cover - depends on the environment
+    msgpack = None
+
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+
+
+class UnsupportedBody(ValueError):
+    """The body's media type or content encoding is not accepted."""
+
+
+class BodyTooLarge(ValueError):
+    """The decompressed body exceeds the configured limit."""
+
+
+def decompress(body: bytes, content_encoding: str, max_bytes: int) -> bytes:
+    encoding = content_encoding.strip().lower()
+    if encoding in ("", "identity"):
+        return body
+    if encoding not in ("gzip", "x-gzip"):
+        raise UnsupportedBody(f"unsupported content encoding: {content_encoding}")
+    inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    try:
+        data = inflater.decompress(body, max_bytes + 1)
+    except zlib.error as exc:
+        raise ValueError(f"invalid gzip body: {exc}") from None
+    if len(data) > max_bytes:
+        raise BodyTooLarge(f"decompressed body exceeds {max_bytes} bytes")
+    if not inflater.eof:
+        raise ValueError("truncated gzip body")
+    return data
+
+
+def is_msgpack(content_type: str) -> bool:
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    return media_type in MSGPACK_MEDIA_TYPES
+
+
+def decode_payload(body: bytes, content_type: str) -> Any:
+    """Decode a single JSON or MessagePack document."""
+    if is_msgpack(content_type):
+        if msgpack is None:
+            raise UnsupportedBody("MessagePack bodies require the msgpack package")
+        try:
+            # timestamp=3 turns MessagePack timestamps into aware datetimes.
+            return msgpack.unpackb(body, timestamp=3)
+        except ValueError as exc:
+            raise ValueError(f"invalid MessagePack: {exc}") from None
+    return json.loads(body)
+
+
+def parse_batch(body: bytes, content_type: str) -> List[Any]:
+    """Decode a batch body given as a JSON array, NDJSON or a MessagePack array."""
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        return [json.loads(line) for line in body.splitlines() if line.strip()]
+    items = decode_payload(body, content_type)
+    if not isinstance(items, list):
+        raise ValueError("batch body must be an array")
+    return items
@@ -0,0 +1,83 @@
+"""Encode stored rows for ``/query`` without building ``LogEntry`` models.
+
+Stored timestamps are already ``datetime.isoformat`` text, so the only
+difference from the pydantic serialization of a ``LogEntry`` is that UTC is
+written as ``Z``. Rows can therefore go straight from the cursor to bytes.
+"""
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Sequence
+import io
+import json
+import sqlite3
+
+try:  # orjson is optional; it encodes several times faster than json
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+try:  # Arrow output is optional
+    import pyarrow
+    import pyarrow.ipc
+except ImportError:  # pragma: no cover - depends on the environment
+    pyarrow = None
+
+JSON_FIELDS = ("timestamp", "level", "service", "message", "hash")
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+if orjson is not None:
+    _dumps = orjson.dumps
+else:
+    # Compact separators and raw UTF-8, as pydantic writes them.
+    _encode = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
+    def _dumps(value: Any) -> bytes:
+        return _encode(value).encode()
+
+
+def wire_timestamp(value: str) -> str:
+    return value[:-6] + "Z" if value.endswith("+00:00") else value
+
+
+def row_dicts(rows: Sequence[sqlite3.Row]) -> List[Dict[str, Any]]:
+    # Positional access: the read paths select id first, then JSON_FIELDS.
+    return [
+        {"timestamp": wire_timestamp(r[1]), "level": r[2], "service": r[3], "message": r[4], "hash": r[5]}
+        for r in rows
+    ]
+
+
+def encode_json(rows: Sequence[sqlite3.Row]) -> bytes:
+    """A JSON array identical to the default ``List[LogEntry]`` response."""
+    return _dumps(row_dicts(rows))
+
+
+def iter_ndjson(rows: Sequence[sqlite3.Row], chunk_rows: int = 1000) -> Iterator[bytes]:
+    """One JSON object per line, yielded ``chunk_rows`` lines at a time."""
+    for start in range(0, len(rows), chunk_rows):
+        yield b"".join(_dumps(item) + b"\n" for item in row_dicts(rows[start:start + chunk_rows]))
+
+
+def encode_arrow(rows: Sequence[sqlite3.Row]) -> bytes:
+    """An Arrow IPC stream with one record batch.
+
+    ``timestamp`` is a UTC microsecond timestamp column; naive stored values
+    are taken as UTC. Raises ``RuntimeError`` if pyarrow is not installed.
+    """
+    if pyarrow is None:
+        raise RuntimeError("Arrow output requires the pyarrow package")
+    timestamps = []
+    for row in rows:
+        value = datetime.fromisoformat(row["timestamp"])
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        timestamps.append(value)
+    columns = {"timestamp": pyarrow.array(timestamps, pyarrow.timestamp("us", tz="UTC"))}
+    for field in JSON_FIELDS[1:]:
+        columns[field] = pyarrow.array([row[field] for row in rows], pyarrow.string())
+    batch = pyarrow.RecordBatch.from_pydict(columns)
+    sink = io.BytesIO()
+    with pyarrow.ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue()
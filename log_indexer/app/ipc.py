@@ -0,0 +1,274 @@
+"""Single-writer deployment over a Unix socket.
+
+With several uvicorn workers, each opening its own writable ``LogDAO`` on
+the same files, workers contend for SQLite's write lock and bursts fail with
+"database is locked". In this mode one writer process owns every write
+connection (:class:`WriterServer`). Workers parse and validate requests
+themselves, forward the resulting rows over a local Unix socket
+(:class:`WriterClient`) and answer reads from their own read-only
+connections (:class:`RemoteLogStore`).
+
+Frames are a 4-byte big-endian length followed by a JSON object.
+"""
+from __future__ import annotations
+
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import json
+import os
+import socket
+import socketserver
+import struct
+import threading
+import time
+
+from .models import LogEntry
+
+HEADER = struct.Struct(">I")
+# Bound on a single frame, well above the largest allowed batch.
+MAX_FRAME = 256 * 1024 * 1024
+
+
+def send_frame(sock: socket.socket, message: Dict[str, Any]) -> None:
+    payload = json.dumps(message, separators=(",", ":")).encode()
+    sock.sendall(HEADER.pack(len(payload)) + payload)
+
+
+def recv_frame(sock: socket.socket) -> Optional[Dict[str, Any]]:
+    """Read one frame; ``None`` if the peer closed the connection."""
+    header = _recv_exact(sock, HEADER.size)
+    if header is None:
+        return None
+    (length,) = HEADER.unpack(header)
+    if length > MAX_FRAME:
+        raise ValueError(f"frame of {length} bytes exceeds the limit")
+    payload = _recv_exact(sock, length)
+    if payload is None:
+        raise ConnectionError("connection closed mid-frame")
+    return json.loads(payload)
+
+
+def _recv_exact(sock: socket.socket, size: int) -> Optional[bytes]:
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            if chunks:
+                raise ConnectionError("connection closed mid-frame")
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def entry_to_wire(entry: LogEntry) -> List[Any]:
+    return [entry.timestamp.isoformat(), entry.level, entry.service, entry.message, entry.hash]
+
+
+def entry_from_wire(row: List[Any]) -> LogEntry:
+    # Already validated by the worker that sent it.
+    timestamp, level, service, message, digest = row
+    return LogEntry.model_construct(
+        timestamp=datetime.fromisoformat(timestamp), level=level, service=service, message=message, hash=digest
+    )
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    server: "WriterServer"
+
+    def handle(self) -> None:
+        while True:
+            try:
+                request = recv_frame(self.connection)
+            except (ConnectionError, ValueError):
+                return
+            if request is None:
+                return
+            try:
+                response = self.server.dispatch(request)
+            except Exception as exc:  # reported to the worker, which raises it
+                response = {"error": f"{type(exc).__name__}: {exc}"}
+            send_frame(self.connection, response)
+
+
+class WriterServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Serve write requests for *store* on the Unix socket *socket_path*.
+
+    Each worker connection gets a thread; their writes meet in the store,
+    where group-commit mode (``LOG_INDEXER_WRITE_MODE=group``) folds them
+    into shared transactions.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, store: Any, socket_path: Path):
+        self.store = store
+        self.socket_path = Path(socket_path)
+        self.socket_path.unlink(missing_ok=True)
+        super().__init__(str(self.socket_path), _Handler)
+        os.chmod(self.socket_path, 0o660)
+
+    def dispatch(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        op = request.get("op")
+        if op == "add":
+            entries = [entry_from_wire(row) for row in request["entries"]]
+            return {"stored": self.store.store_logs(entries, wait=bool(request.get("wait")))}
+        if op == "flush":
+            self.store.flush()
+            return {}
+        if op == "metrics":
+            return {
+                "duplicates_dropped": self.store.duplicates_dropped,
+                "expired_dropped": self.store.expired_dropped,
+                "pending_writes": self.store.pending_writes,
+            }
+        raise ValueError(f"unknown operation: {op}")
+
+    def server_close(self) -> None:
+        super().server_close()
+        self.socket_path.unlink(missing_ok=True)
+
+
+class WriterClient:
+    """Worker-side connection to a :class:`WriterServer`.
+
+    Each thread keeps its own socket, so concurrent requests from the
+    worker's thread pool do not queue behind each other. On startup the
+    client waits up to ``connect_timeout`` seconds for the writer to listen.
+    """
+
+    def __init__(self, socket_path: Path, connect_timeout: float = 30.0):
+        self.socket_path = str(socket_path)
+        self.connect_timeout = connect_timeout
+        self._local = threading.local()
+        self._sockets: List[socket.socket] = []
+        self._lock = threading.Lock()
+        self.call({"op": "metrics"})
+
+    def _connect(self) -> socket.socket:
+        deadline = time.monotonic() + self.connect_timeout
+        while True:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.connect(self.socket_path)
+            except (FileNotFoundError, ConnectionRefusedError):
+                sock.close()
+                if time.monotonic() >= deadline:
+                    raise ConnectionError(f"no log writer listening on {self.socket_path}") from None
+                time.sleep(0.1)
+                continue
+            with self._lock:
+                self._sockets.append(sock)
+            return sock
+
+    def call(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = self._local.sock = self._connect()
+        try:
+            send_frame(sock, request)
+            response = recv_frame(sock)
+        except OSError:
+            response = None
+        if response is None:
+            # The writer restarted or dropped us; reconnect once. Only
+            # idempotent operations are sent, so a retry cannot double-write.
+            self._discard(sock)
+            sock = self._local.sock = self._connect()
+            send_frame(sock, request)
+            response = recv_frame(sock)
+            if response is None:
+                raise ConnectionError("log writer closed the connection")
+        if "error" in response:
+            raise RuntimeError(f"log writer: {response['error']}")
+        return response
+
+    def _discard(self, sock: socket.socket) -> None:
+        sock.close()
+        with self._lock:
+            if sock in self._sockets:
+                self._sockets.remove(sock)
+
+    def close(self) -> None:
+        with self._lock:
+            for sock in self._sockets:
+                sock.close()
+            self._sockets.clear()
+
+
+class RemoteLogStore:
+    """A worker's view of the store: local reads, remote writes.
+
+    *reader* is a read-only ``LogDAO`` or ``PartitionedLogDAO`` over the
+    files the writer process owns. Ingest is idempotent, so the client's
+    reconnect-and-retry cannot duplicate entries.
+    """
+
+    def __init__(self, reader: Any, client: WriterClient):
+        self.reader = reader
+        self.client = client
+
+    @property
+    def full_text(self) -> bool:
+        return self.reader.full_text
+
+    @property
+    def query_cache(self):
+        return self.reader.query_cache
+
+    def split_expired(self, entries: Iterable[LogEntry]) -> Tuple[List[LogEntry], List[LogEntry]]:
+        return self.reader.split_expired(entries)
+
+    def add_log(self, entry: LogEntry, wait: bool = False) -> Optional[int]:
+        return self.add_logs([entry], wait=wait)
+
+    def add_logs(self, entries: Iterable[LogEntry], wait: bool = False) -> Optional[int]:
+        stored = self.store_logs(entries, wait=wait)
+        return None if stored is None else len(stored)
+
+    def store_logs(self, entries: Iterable[LogEntry], wait: bool = False) -> Optional[List[str]]:
+        rows = [entry_to_wire(entry) for entry in entries]
+        if not rows:
+            return []
+        return self.client.call({"op": "add", "entries": rows, "wait": wait})["stored"]
+
+    def flush(self) -> None:
+        self.client.call({"op": "flush"})
+
+    @property
+    def duplicates_dropped(self) -> int:
+        return self.client.call({"op": "metrics"})["duplicates_dropped"]
+
+    @property
+    def expired_dropped(self) -> int:
+        return self.client.call({"op": "metrics"})["expired_dropped"]
+
+    @property
+    def pending_writes(self) -> int:
+        return self.client.call({"op": "metrics"})["pending_writes"]
+
+    def query_logs(self, *args: Any, **kwargs: Any) -> List[LogEntry]:
+        return self.reader.query_logs(*args, **kwargs)
+
+    def query_page(self, *args: Any, **kwargs: Any) -> Tuple[List[LogEntry], Optional[str]]:
+        return self.reader.query_page(*args, **kwargs)
+
+    def query_rows(self, *args: Any, **kwargs: Any) -> Tuple[List[Any], Optional[str]]:
+        return self.reader.query_rows(*args, **kwargs)
+
+    def search(self, *args: Any, **kwargs: Any) -> List[LogEntry]:
+        return self.reader.search(*args, **kwargs)
+
+    def stats(self, *args: Any, **kwargs: Any) -> List[dict]:
+        return self.reader.stats(*args, **kwargs)
+
+    def all_logs(self) -> List[LogEntry]:
+        return self.reader.all_logs()
+
+    def iter_rows(self, batch_size: int = 1000) -> Iterator[List[Any]]:
+        return self.reader.iter_rows(batch_size)
+
+    def close(self) -> None:
+        self.client.close()
+        self.reader.close()
@@ -1,18 +1,39 @@
 import os
-from fastapi import FastAPI, Response, Header, HTTPException
-from typing import List, Optional
+from fastapi import FastAPI, Request, Response, Header, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from typing import Any, Dict, Iterator, List, Optional
 from datetime import datetime
 import logging
 import json
+import re
 from io import StringIO
 import csv
 import hashlib
+import secrets
+import tempfile
 from pathlib import Path
+from contextlib import asynccontextmanager
 
+from .admission import AdmissionMiddleware, Budget
+from .decoders import BodyTooLarge, UnsupportedBody, decode_payload, decompress, parse_batch
+from .encoders import ARROW_MEDIA_TYPE, encode_arrow, encode_json, iter_ndjson
 from .models import LogEntry
-from .dao import LogDAO
+from .partitions import PartitionedLogDAO
+from .store import open_service_store
+from .tail import TailHub, sse_events
 
-app = FastAPI(title="Log Indexer", version="0.1.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if isinstance(dao, PartitionedLogDAO):
+        dao.drop_expired()
+    yield
+    # Commit anything still queued for the group-commit writer.
+    dao.close()
+
+
+app = FastAPI(title="Log Indexer", version="0.1.0", lifespan=lifespan)
 
 # Structured console logging for this service
 class JsonFormatter(logging.Formatter):
@@ -34,68 +55,390 @@ logger.propagate = False
 
 data_dir = Path(os.getenv("LOG_INDEXER_DATA_DIR", "/var/lib/log_indexer"))
 data_dir.mkdir(parents=True, exist_ok=True)
-dao = LogDAO(data_dir / "logs.db")
+dao = open_service_store(data_dir)
+tail_hub = TailHub(
+    buffer_size=int(os.getenv("LOG_INDEXER_TAIL_BUFFER", "1000")),
+    max_subscribers=int(os.getenv("LOG_INDEXER_TAIL_MAX_SUBSCRIBERS", "100")),
+)
 API_TOKEN = os.getenv("LOG_INDEXER_TOKEN")
+MAX_BATCH_SIZE = int(os.getenv("LOG_INDEXER_MAX_BATCH", "5000"))
+# Bound on a request body after gzip decompression.
+MAX_BODY_BYTES = int(float(os.getenv("LOG_INDEXER_MAX_BODY_MB", "64")) * 1024 * 1024)
+QUERY_LIMIT_DEFAULT = int(os.getenv("LOG_INDEXER_QUERY_LIMIT", "1000"))
+QUERY_LIMIT_MAX = int(os.getenv("LOG_INDEXER_QUERY_LIMIT_MAX", "10000"))
+
+# Ingest past this many concurrent requests is shed with 429 instead of
+# queueing until clients time out and retry; /health has its own budget so
+# probes keep answering while ingest is saturated.
+ingest_budget = Budget("ingest", int(os.getenv("LOG_INDEXER_INGEST_MAX_IN_FLIGHT", "64")))
+health_budget = Budget("health", int(os.getenv("LOG_INDEXER_HEALTH_MAX_IN_FLIGHT", "256")))
+app.add_middleware(
+    AdmissionMiddleware,
+    budgets=[("/log", ingest_budget), ("/log/batch", ingest_budget), ("/health", health_budget)],
+    retry_after=int(os.getenv("LOG_INDEXER_RETRY_AFTER", "1")),
+)
+
+
+def check_token(authorization: str | None) -> None:
+    """Reject the request unless it carries the configured bearer token."""
+    if API_TOKEN:
+        if authorization != f"Bearer {API_TOKEN}":
+            raise HTTPException(status_code=401, detail="Unauthorized")
+
+
+def hash_entry(entry: LogEntry) -> str:
+    """Return the SHA-256 integrity hash for *entry*."""
+    payload = f"{entry.timestamp.isoformat()}|{entry.level}|{entry.service}|{entry.message}"
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+async def read_body(request: Request, decode) -> Any:
+    """Read, decompress and decode an ingest body, mapping errors to HTTP."""
+    body = await request.body()
+    try:
+        body = decompress(body, request.headers.get("content-encoding", ""), MAX_BODY_BYTES)
+        return decode(body, request.headers.get("content-type", ""))
+    except BodyTooLarge as exc:
+        raise HTTPException(status_code=413, detail=str(exc))
+    except UnsupportedBody as exc:
+        raise HTTPException(status_code=415, detail=str(exc))
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=f"Malformed body: {exc}")
 
 @app.get("/health")
 def health():
     """Basic health check endpoint."""
     return {"status": "ok", "service": "log_indexer", "time": datetime.utcnow().isoformat()}
 
+@app.get("/metrics")
+def metrics():
+    """Ingest counters for monitoring."""
+    return {
+        "duplicates_dropped": dao.duplicates_dropped,
+        "expired_dropped": dao.expired_dropped,
+        "pending_writes": dao.pending_writes,
+        "ingest_in_flight": ingest_budget.in_flight,
+        "ingest_in_flight_peak": ingest_budget.peak,
+        "ingest_rejected": ingest_budget.rejected,
+        "health_rejected": health_budget.rejected,
+        "tail_subscribers": tail_hub.subscribers,
+        "query_cache_hits": dao.query_cache.hits,
+        "query_cache_misses": dao.query_cache.misses,
+        "query_cache_bytes": dao.query_cache.bytes,
+    }
+
 @app.post("/log", status_code=201)
-def ingest_log(entry: LogEntry, authorization: str | None = Header(default=None)):
+async def ingest_log(request: Request, wait: bool = False, authorization: str | None = Header(default=None)):
     """Receive a log entry and store it.
 
     If ``LOG_INDEXER_TOKEN`` is set, the request must include an
-    ``Authorization`` header with ``Bearer <token>``.
+    ``Authorization`` header with ``Bearer <token>``. In group-commit mode
+    ``wait=true`` delays the response until the entry is committed. The
+    body is JSON or MessagePack, optionally gzip-encoded.
+
+    Ingest is idempotent: re-sending an entry (for example on a client retry)
+    stores it once and reports ``"duplicate": true``. An entry older than the
+    partition retention window is dropped and reported as ``"expired": true``.
     """
-    if API_TOKEN:
-        if authorization != f"Bearer {API_TOKEN}":
-            raise HTTPException(status_code=401, detail="Unauthorized")
-    payload = f"{entry.timestamp.isoformat()}|{entry.level}|{entry.service}|{entry.message}"
-    entry.hash = hashlib.sha256(payload.encode()).hexdigest()
-    dao.add_log(entry)
+    check_token(authorization)
+    item = await read_body(request, decode_payload)
+    try:
+        entry = LogEntry.model_validate(item)
+    except ValidationError as exc:
+        raise HTTPException(status_code=422, detail=exc.errors(include_url=False, include_context=False))
+    entry.hash = hash_entry(entry)
+    expired = bool(dao.split_expired([entry])[1])
+    stored = await run_in_threadpool(dao.add_log, entry, wait)
+    if stored != 0 and not expired:
+        tail_hub.publish([entry])
     logger.info("log received", extra={"source": entry.service})
-    return {"status": "ok"}
+    if expired:
+        return {"status": "ok", "expired": True}
+    if stored is None:
+        return {"status": "ok"}
+    return {"status": "ok", "duplicate": stored == 0}
+
+
+def newly_stored(entries: List[LogEntry], stored: Optional[List[str]]) -> List[LogEntry]:
+    """The first entry for each hash in *stored*, in batch order.
+
+    Without a result (group commit, not waiting) every distinct entry of the
+    batch is kept.
+    """
+    fresh = set(stored) if stored is not None else {entry.hash for entry in entries}
+    kept = []
+    for entry in entries:
+        if entry.hash in fresh:
+            fresh.discard(entry.hash)
+            kept.append(entry)
+    return kept
+
+
+@app.post("/log/batch", status_code=201)
+async def ingest_batch(request: Request, wait: bool = False, authorization: str | None = Header(default=None)):
+    """Receive many log entries and store them in a single transaction.
+
+    The body is a JSON array of entries, NDJSON (one entry per line,
+    ``Content-Type: application/x-ndjson``) or a MessagePack array
+    (``Content-Type: application/msgpack``), optionally gzip-encoded. Entries
+    that fail validation are reported individually and do not prevent the
+    rest from being stored. Entries older than the partition retention window
+    are reported with status ``"expired"`` and counted in ``expired``, not
+    in ``duplicates``.
+    """
+    check_token(authorization)
+    items = await read_body(request, parse_batch)
+    if len(items) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {MAX_BATCH_SIZE} entries")
+
+    results: List[Dict[str, Any]] = []
+    accepted: List[LogEntry] = []
+    statuses: List[Dict[str, Any]] = []
+    for index, item in enumerate(items):
+        try:
+            entry = LogEntry.model_validate(item)
+        except ValidationError as exc:
+            results.append({"index": index, "status": "error", "detail": exc.errors(include_url=False, include_context=False)})
+            continue
+        entry.hash = hash_entry(entry)
+        accepted.append(entry)
+        results.append({"index": index, "status": "ok", "hash": entry.hash})
+        statuses.append(results[-1])
+
+    live, expired = dao.split_expired(accepted)
+    stale = {id(entry) for entry in expired}
+    for entry, status in zip(accepted, statuses):
+        if id(entry) in stale:
+            status["status"] = "expired"
+    stored = await run_in_threadpool(dao.store_logs, accepted, wait)
+    tail_hub.publish(newly_stored(live, stored))
+    logger.info("log batch received", extra={"count": len(accepted)})
+    return {
+        "status": "ok",
+        "accepted": len(accepted),
+        "rejected": len(items) - len(accepted),
+        "expired": len(expired),
+        "duplicates": None if stored is None else len(live) - len(stored),
+        "results": results,
+    }
 
 @app.get("/query", response_model=List[LogEntry])
-def query_logs(level: Optional[str] = None, service: Optional[str] = None):
-    """Query stored logs with optional filters."""
-    return dao.query_logs(level=level, service=service)
+def query_logs(
+    response: Response,
+    level: Optional[str] = None,
+    service: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = Query(default=QUERY_LIMIT_DEFAULT, ge=1, le=QUERY_LIMIT_MAX),
+    cursor: Optional[str] = None,
+    format: Optional[str] = Query(default=None, pattern="^(json|ndjson|arrow)$"),
+):
+    """Query stored logs with optional filters, oldest first.
 
-@app.get("/export")
-def export_logs(format: str = "json"):
-    """Export logs as JSON or CSV."""
-    logs = dao.all_logs()
-    timestamp = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
-    export_dir = Path(__file__).resolve().parent / "export"
-    export_dir.mkdir(exist_ok=True)
+    At most ``limit`` entries are returned. When more are available the
+    ``X-Next-Cursor`` response header carries an opaque cursor; pass it back
+    as ``cursor`` with the same filters to fetch the next page.
+
+    With ``format`` set, rows are encoded straight from the database without
+    building models: ``json`` gives the same body as the default, ``ndjson``
+    one entry per line and ``arrow`` an Arrow IPC stream.
+    """
+    if format is not None:
+        return query_raw(format, level, service, since, until, limit, cursor)
+    try:
+        logs, next_cursor = dao.query_page(
+            level=level, service=service, since=since, until=until, limit=limit, cursor=cursor
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return logs
+
+def query_raw(
+    format: str,
+    level: Optional[str],
+    service: Optional[str],
+    since: Optional[datetime],
+    until: Optional[datetime],
+    limit: int,
+    cursor: Optional[str],
+) -> Response:
+    """The model-free path behind ``/query?format=...``."""
+    try:
+        rows, next_cursor = dao.query_rows(
+            level=level, service=service, since=since, until=until, limit=limit, cursor=cursor
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    if format == "ndjson":
+        return StreamingResponse(iter_ndjson(rows), media_type="application/x-ndjson", headers=headers)
+    if format == "arrow":
+        try:
+            body = encode_arrow(rows)
+        except RuntimeError as exc:
+            raise HTTPException(status_code=501, detail=str(exc))
+        return Response(content=body, media_type=ARROW_MEDIA_TYPE, headers=headers)
+    return Response(content=encode_json(rows), media_type="application/json", headers=headers)
+
+@app.get("/search", response_model=List[LogEntry])
+def search_logs(
+    q: str = Query(min_length=1),
+    level: Optional[str] = None,
+    service: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = Query(default=100, ge=1, le=QUERY_LIMIT_MAX),
+):
+    """Full-text search over log messages, best matches first.
+
+    ``q`` uses SQLite FTS5 syntax: bare words must all match, ``"a b"``
+    matches a phrase and ``auth*`` a prefix.
+    """
+    try:
+        return dao.search(q, level=level, service=service, since=since, until=until, limit=limit)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    except RuntimeError as exc:
+        raise HTTPException(status_code=501, detail=str(exc))
+
+@app.get("/tail")
+async def tail_logs(
+    service: Optional[str] = None,
+    level: Optional[str] = None,
+    contains: Optional[str] = None,
+):
+    """Stream newly ingested entries as server-sent events.
+
+    Each event's ``data`` is one JSON log entry matching the ``service``,
+    ``level`` and ``contains`` (message substring) filters. Every subscriber
+    has a bounded buffer; if it falls behind, the oldest entries are discarded
+    and a ``dropped`` event reports how many, so a slow consumer never holds
+    up ingest.
+    """
+    try:
+        sub = tail_hub.subscribe(service=service, level=level, contains=contains)
+    except RuntimeError as exc:
+        raise HTTPException(status_code=503, detail=str(exc))
+    return StreamingResponse(
+        sse_events(tail_hub, sub),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/stats")
+def stats(
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    interval: str = "hour",
+    group_by: List[str] = Query(default=["service", "level"]),
+    level: Optional[str] = None,
+    service: Optional[str] = None,
+):
+    """Entry counts per ``minute``/``hour`` bucket (or ``total``).
+
+    Counts are grouped by the ``group_by`` dimensions (``service``, ``level``)
+    and come from incrementally maintained rollups, so the cost depends on
+    the number of buckets rather than the number of log entries.
+    """
+    try:
+        return dao.stats(since, until, interval, group_by, level=level, service=service)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+EXPORT_DIR = Path(__file__).resolve().parent / "export"
+EXPORT_COLUMNS = ["timestamp", "level", "service", "message", "hash"]
+EXPORT_VERSION_RE = re.compile(r"^\d{8}T\d{6}Z(?:-[0-9a-f]{8})?$")
 
+
+def export_chunks(format: str) -> Iterator[bytes]:
+    """Yield the export body for *format* one batch of rows at a time."""
     if format == "csv":
         output = StringIO()
         writer = csv.writer(output)
-        writer.writerow(["timestamp", "level", "service", "message", "hash"])
-        for log in logs:
-            writer.writerow([
-                log.timestamp.isoformat(),
-                log.level,
-                log.service,
-                log.message,
-                log.hash,
-            ])
-        data = output.getvalue()
-        file_path = export_dir / f"logs_{timestamp}.csv"
-        file_path.write_text(data)
-        hash_value = hashlib.sha256(data.encode()).hexdigest()
-        meta = {"version": timestamp, "algorithm": "SHA256", "hash": hash_value}
-        (export_dir / f"logs_{timestamp}.metadata.json").write_text(json.dumps(meta))
-        return Response(content=data, media_type="text/csv", headers={"X-Export-Version": timestamp, "X-Integrity-Hash": hash_value})
-
-    logs_data = [log.dict() for log in logs]
-    data = json.dumps(logs_data)
-    file_path = export_dir / f"logs_{timestamp}.json"
-    file_path.write_text(data)
-    hash_value = hashlib.sha256(data.encode()).hexdigest()
-    meta = {"version": timestamp, "algorithm": "SHA256", "hash": hash_value}
-    (export_dir / f"logs_{timestamp}.metadata.json").write_text(json.dumps(meta))
-    return {"version": timestamp, "integrity": meta, "logs": logs_data}
+        writer.writerow(EXPORT_COLUMNS)
+        for rows in dao.iter_rows():
+            writer.writerows(tuple(row) for row in rows)
+            yield output.getvalue().encode()
+            output.seek(0)
+            output.truncate()
+        if output.tell():
+            yield output.getvalue().encode()
+        return
+
+    yield b"["
+    first = True
+    for rows in dao.iter_rows():
+        parts = [json.dumps(dict(zip(EXPORT_COLUMNS, row))) for row in rows]
+        chunk = ", ".join(parts)
+        yield (chunk if first else ", " + chunk).encode()
+        first = False
+    yield b"]"
+
+
+def stream_export(format: str, version: str) -> Iterator[bytes]:
+    """Stream an export while hashing it and saving a copy under ``EXPORT_DIR``.
+
+    The SHA-256 digest covers exactly the bytes of ``logs_<version>.<ext>``
+    (for JSON, the ``logs`` array). The integrity metadata is written once the
+    last chunk has gone out; JSON exports also carry it as a trailing
+    ``integrity`` member. An interrupted export leaves neither file behind.
+    """
+    ext = "csv" if format == "csv" else "json"
+    EXPORT_DIR.mkdir(exist_ok=True)
+    file_path = EXPORT_DIR / f"logs_{version}.{ext}"
+    # Versions have one-second resolution; a unique partial file keeps
+    # concurrent exports from writing into each other.
+    fd, partial_name = tempfile.mkstemp(dir=EXPORT_DIR, prefix=f"logs_{version}.", suffix=f".{ext}.partial")
+    partial_path = Path(partial_name)
+    digest = hashlib.sha256()
+    completed = False
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            if ext == "json":
+                yield f'{{"version": "{version}", "logs": '.encode()
+            for chunk in export_chunks(format):
+                digest.update(chunk)
+                fh.write(chunk)
+                yield chunk
+        partial_path.replace(file_path)
+        completed = True
+        meta = {"version": version, "algorithm": "SHA256", "hash": digest.hexdigest()}
+        (EXPORT_DIR / f"logs_{version}.metadata.json").write_text(json.dumps(meta))
+        if ext == "json":
+            yield f', "integrity": {json.dumps(meta)}}}'.encode()
+    finally:
+        if not completed:
+            partial_path.unlink(missing_ok=True)
+
+
+@app.get("/export")
+def export_logs(format: str = "json"):
+    """Stream all logs as JSON or CSV.
+
+    Memory use does not depend on the table size. The integrity hash is only
+    known after the last row, so it is recorded in
+    ``GET /export/{version}/metadata`` (and, for JSON, as a trailing
+    ``integrity`` member) instead of a response header.
+    """
+    # The random suffix keeps exports started in the same second from
+    # replacing each other's file and metadata.
+    version = f"{datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')}-{secrets.token_hex(4)}"
+    media_type = "text/csv" if format == "csv" else "application/json"
+    return StreamingResponse(
+        stream_export(format, version),
+        media_type=media_type,
+        headers={"X-Export-Version": version},
+    )
+
+
+@app.get("/export/{version}/metadata")
+def export_metadata(version: str):
+    """Return the integrity metadata recorded for a finished export."""
+    if not EXPORT_VERSION_RE.match(version):
+        raise HTTPException(status_code=400, detail="Invalid export version")
+    meta_path = EXPORT_DIR / f"logs_{version}.metadata.json"
+    if not meta_path.exists():
+        raise HTTPException(status_code=404, detail="Export not found")
+    return json.loads(meta_path.read_text())
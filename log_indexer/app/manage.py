@@ -0,0 +1,159 @@
+"""Maintenance commands for the log indexer database.
+
+Run from the service directory, e.g. ``python -m app.manage rebuild-fts``.
+Commands use the same ``LOG_INDEXER_*`` settings as the service.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import signal
+import threading
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import List, Optional
+
+from .dao import LogDAO, row_to_entry
+from .ipc import WriterServer
+from .partitions import PartitionedLogDAO
+from .schema import migrate_to_compact
+from .store import dao_options, open_store
+
+
+def rebuild_fts(args: argparse.Namespace) -> None:
+    store = open_store(args.data_dir)
+    try:
+        count = store.rebuild_search_index()
+    finally:
+        store.close()
+    print(f"indexed {count} log entries in {args.data_dir}")
+
+
+def rebuild_rollups(args: argparse.Namespace) -> None:
+    store = open_store(args.data_dir)
+    try:
+        store.rebuild_rollups()
+    finally:
+        store.close()
+    print(f"rebuilt rollups in {args.data_dir}")
+
+
+def prune(args: argparse.Namespace) -> None:
+    store = open_store(args.data_dir)
+    try:
+        if not isinstance(store, PartitionedLogDAO):
+            raise SystemExit("retention requires LOG_INDEXER_PARTITION to be set")
+        dropped = store.drop_expired()
+    finally:
+        store.close()
+    for path in dropped:
+        print(f"dropped {path}")
+
+
+def split(args: argparse.Namespace) -> None:
+    """Copy a single-file ``logs.db`` into time partitions."""
+    source = LogDAO(args.data_dir / "logs.db", full_text=False)
+    target = PartitionedLogDAO(args.data_dir, period=args.period, **dao_options())
+    count = 0
+    try:
+        for rows in source.iter_rows():
+            count += target.add_logs([row_to_entry(row) for row in rows], wait=True)
+    finally:
+        source.close()
+        target.close()
+    print(f"copied {count} log entries into {args.period} partitions")
+
+
+def compact(args: argparse.Namespace) -> None:
+    """Rewrite every database in the data directory in the compact layout."""
+    paths = sorted(args.data_dir.glob("logs-*.db")) or [args.data_dir / "logs.db"]
+    count = sum(migrate_to_compact(path) for path in paths if path.exists())
+    store = open_store(args.data_dir)
+    try:
+        if store.full_text:
+            store.rebuild_search_index()
+    finally:
+        store.close()
+    print(f"migrated {count} log entries in {args.data_dir} to the compact layout")
+
+
+def archive(args: argparse.Namespace) -> None:
+    """Move rows older than ``--older-than-days`` into compressed segments."""
+    if args.older_than_days is None:
+        raise SystemExit("set --older-than-days or LOG_INDEXER_ARCHIVE_AFTER_DAYS")
+    cutoff = datetime.now(timezone.utc) - timedelta(days=args.older_than_days)
+    store = open_store(args.data_dir)
+    try:
+        count = store.archive_before(cutoff)
+    finally:
+        store.close()
+    print(f"archived {count} log entries older than {cutoff.isoformat()}")
+
+
+def serve_writer(args: argparse.Namespace) -> None:
+    """Own all writes for API workers started with ``LOG_INDEXER_WRITER_SOCKET``."""
+    store = open_store(args.data_dir)
+    if isinstance(store, PartitionedLogDAO):
+        store.drop_expired()
+    server = WriterServer(store, args.socket)
+
+    def stop(*_: object) -> None:
+        # ``shutdown`` must not run on the thread inside ``serve_forever``.
+        threading.Thread(target=server.shutdown).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    print(f"log writer listening on {args.socket}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        store.close()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--data-dir",
+        type=Path,
+        default=Path(os.getenv("LOG_INDEXER_DATA_DIR", "/var/lib/log_indexer")),
+        help="directory holding the log databases",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    rebuild = commands.add_parser("rebuild-fts", help="backfill or rebuild the full-text index")
+    rebuild.set_defaults(func=rebuild_fts)
+
+    rollups = commands.add_parser("rebuild-rollups", help="recompute the /stats rollup tables")
+    rollups.set_defaults(func=rebuild_rollups)
+
+    retention = commands.add_parser("prune", help="drop partitions past LOG_INDEXER_RETENTION_DAYS")
+    retention.set_defaults(func=prune)
+
+    partition = commands.add_parser("partition", help="split logs.db into time partitions")
+    partition.add_argument("--period", default=os.getenv("LOG_INDEXER_PARTITION") or "day")
+    partition.set_defaults(func=split)
+
+    migrate = commands.add_parser("compact", help="convert databases to the compact schema (service stopped)")
+    migrate.set_defaults(func=compact)
+
+    cold = commands.add_parser("archive", help="move aged rows into compressed archive segments")
+    cold.add_argument(
+        "--older-than-days",
+        type=float,
+        default=float(os.environ["LOG_INDEXER_ARCHIVE_AFTER_DAYS"]) if os.getenv("LOG_INDEXER_ARCHIVE_AFTER_DAYS") else None,
+    )
+    cold.set_defaults(func=archive)
+
+    writer = commands.add_parser("serve-writer", help="run the single writer process for multi-worker mode")
+    socket_path = os.getenv("LOG_INDEXER_WRITER_SOCKET")
+    writer.add_argument("--socket", type=Path, default=socket_path, required=not socket_path)
+    writer.set_defaults(func=serve_writer)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
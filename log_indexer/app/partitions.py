@@ -0,0 +1,433 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import heapq
+import itertools
+import sqlite3
+import threading
+
+from .archive import SegmentArchive
+from .cache import QueryCache, page_size, query_key, rows_size
+from .dao import STATS_DIMENSIONS, LogDAO, build_page, decode_cursor, page_rows, row_to_entry
+from .models import LogEntry
+
+# Partition period -> (length in seconds, file name format of its start).
+PERIODS = {
+    "hour": (3600, "%Y%m%dT%H"),
+    "day": (86400, "%Y%m%d"),
+}
+
+
+def to_utc(value: datetime) -> datetime:
+    """Interpret naive timestamps as UTC, as the services emit them."""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+@dataclass
+class Partition:
+    start: datetime
+    end: datetime
+    path: Path
+    dao: Optional[LogDAO] = None
+
+    @property
+    def lower_bound(self) -> str:
+        # Stored timestamps are ISO strings, so compare on the common
+        # ``YYYY-MM-DDTHH:MM:SS`` prefix rather than on datetimes.
+        return self.start.strftime("%Y-%m-%dT%H:%M:%S")
+
+    def overlaps(self, since: Optional[datetime], until: Optional[datetime]) -> bool:
+        if since is not None and to_utc(since) >= self.end:
+            return False
+        if until is not None and to_utc(until) <= self.start:
+            return False
+        return True
+
+
+class PartitionedLogDAO:
+    """Log storage split into one SQLite database per time period.
+
+    Entries are routed by timestamp to ``logs-<start>.db`` files under
+    *data_dir*; a new file is created the first time an entry for a period
+    arrives, so storage rolls over automatically. Reads only open partitions
+    that overlap the requested time range and merge their results in
+    timestamp order. With *retention* set, partitions that ended longer ago
+    than the retention window are deleted as whole files.
+
+    The public interface mirrors :class:`LogDAO`; *dao_options* are passed to
+    each partition's ``LogDAO``. Query results are cached here, keyed on the
+    write generations of the partitions a query reads, so a write only
+    invalidates results that cover its partition.
+
+    With an ``archive``, :meth:`archive_before` moves whole aged partitions
+    into compressed segments, which queries and exports keep reading.
+
+    A ``read_only`` store follows partitions that another process creates
+    and drops, rescanning *data_dir* on every read.
+    """
+
+    def __init__(
+        self,
+        data_dir: Path,
+        *,
+        period: str = "day",
+        retention: Optional[timedelta] = None,
+        cache_bytes: int = 0,
+        archive: Optional[SegmentArchive] = None,
+        read_only: bool = False,
+        **dao_options: Any,
+    ):
+        if period not in PERIODS:
+            raise ValueError(f"unsupported partition period: {period}")
+        self.data_dir = data_dir
+        self.period = period
+        self.retention = retention
+        self.expired_dropped = 0
+        self.full_text = dao_options.get("full_text", True)
+        self.read_only = read_only
+        self._dao_options = {**dao_options, "read_only": read_only}
+        self.query_cache = QueryCache(cache_bytes)
+        self.archive = archive
+        self._lock = threading.Lock()
+        self._partitions: Dict[datetime, Partition] = {}
+        self._scan()
+
+    def _scan(self) -> None:
+        """Sync the partition list with the ``logs-*.db`` files on disk."""
+        found = {}
+        for path in self.data_dir.glob("logs-*.db"):
+            partition = self._parse(path)
+            if partition is not None:
+                found[partition.start] = partition
+        with self._lock:
+            for start, partition in list(self._partitions.items()):
+                if start not in found:
+                    if partition.dao is not None:
+                        partition.dao.close()
+                    del self._partitions[start]
+            for start, partition in found.items():
+                if start in self._partitions:
+                    continue
+                if self.read_only:
+                    # The writer may still be creating the schema; retry later.
+                    try:
+                        self._open(partition)
+                    except (FileNotFoundError, sqlite3.Error):
+                        continue
+                self._partitions[start] = partition
+
+    @staticmethod
+    def _parse(path: Path) -> Optional[Partition]:
+        label = path.stem[len("logs-"):]
+        # Files from an earlier period setting stay readable.
+        for seconds, fmt in PERIODS.values():
+            try:
+                start = datetime.strptime(label, fmt).replace(tzinfo=timezone.utc)
+            except ValueError:
+                continue
+            return Partition(start, start + timedelta(seconds=seconds), path)
+        return None
+
+    def _period_start(self, timestamp: datetime) -> datetime:
+        seconds = PERIODS[self.period][0]
+        epoch = int(to_utc(timestamp).timestamp())
+        return datetime.fromtimestamp(epoch - epoch % seconds, tz=timezone.utc)
+
+    def _open(self, partition: Partition) -> LogDAO:
+        if partition.dao is None:
+            partition.dao = LogDAO(partition.path, **self._dao_options)
+        return partition.dao
+
+    def _partition_for(self, start: datetime) -> Tuple[LogDAO, bool]:
+        """Open the partition starting at *start*, creating it if needed.
+
+        Also reports whether the partition is new, i.e. storage rolled over.
+        """
+        if self.read_only:
+            raise RuntimeError("this log store is read-only")
+        with self._lock:
+            partition = self._partitions.get(start)
+            created = partition is None
+            if partition is None:
+                seconds, fmt = PERIODS[self.period]
+                path = self.data_dir / f"logs-{start.strftime(fmt)}.db"
+                partition = Partition(start, start + timedelta(seconds=seconds), path)
+                self._partitions[start] = partition
+            return self._open(partition), created
+
+    def split_expired(self, entries: Iterable[LogEntry]) -> Tuple[List[LogEntry], List[LogEntry]]:
+        """Split *entries* into those kept and those already past retention."""
+        entries = list(entries)
+        cutoff = self._cutoff()
+        if cutoff is None:
+            return entries, []
+        seconds = PERIODS[self.period][0]
+        live: List[LogEntry] = []
+        expired: List[LogEntry] = []
+        for entry in entries:
+            ended = self._period_start(entry.timestamp) + timedelta(seconds=seconds) <= cutoff
+            (expired if ended else live).append(entry)
+        return live, expired
+
+    def _cutoff(self, now: Optional[datetime] = None) -> Optional[datetime]:
+        if self.retention is None:
+            return None
+        return to_utc(now or datetime.now(timezone.utc)) - self.retention
+
+    def partitions(
+        self, since: Optional[datetime] = None, until: Optional[datetime] = None
+    ) -> List[Partition]:
+        """Partitions overlapping ``[since, until)``, oldest first."""
+        if self.read_only:
+            self._scan()
+        with self._lock:
+            return sorted(
+                (p for p in self._partitions.values() if p.overlaps(since, until)),
+                key=lambda p: p.start,
+            )
+
+    def drop_expired(self, now: Optional[datetime] = None) -> List[Path]:
+        """Delete partitions that ended before the retention window."""
+        cutoff = self._cutoff(now)
+        if cutoff is None:
+            return []
+        dropped: List[Path] = []
+        with self._lock:
+            for start, partition in list(self._partitions.items()):
+                if partition.end > cutoff:
+                    continue
+                if partition.dao is not None:
+                    partition.dao.close()
+                for suffix in ("", "-wal", "-shm"):
+                    Path(f"{partition.path}{suffix}").unlink(missing_ok=True)
+                del self._partitions[start]
+                dropped.append(partition.path)
+        if self.archive is not None:
+            dropped.extend(self.archive.drop_before(cutoff.isoformat()))
+        return dropped
+
+    def archive_before(self, cutoff: datetime) -> int:
+        """Move partitions that ended by *cutoff* into the archive, then delete them."""
+        if self.archive is None:
+            raise RuntimeError("no archive configured")
+        moved = 0
+        for partition in self.partitions(until=to_utc(cutoff)):
+            if partition.end > to_utc(cutoff):
+                continue
+            moved += self._open(partition).archive_before(partition.end, self.archive)
+            with self._lock:
+                partition.dao.close()
+                for suffix in ("", "-wal", "-shm"):
+                    Path(f"{partition.path}{suffix}").unlink(missing_ok=True)
+                del self._partitions[partition.start]
+        return moved
+
+    def add_log(self, entry: LogEntry, wait: bool = False) -> Optional[int]:
+        return self.add_logs([entry], wait=wait)
+
+    def add_logs(self, entries: Iterable[LogEntry], wait: bool = False) -> Optional[int]:
+        stored = self.store_logs(entries, wait=wait)
+        return None if stored is None else len(stored)
+
+    def store_logs(self, entries: Iterable[LogEntry], wait: bool = False) -> Optional[List[str]]:
+        """Insert *entries*, one transaction per partition touched.
+
+        Returns the hashes of the entries stored, or ``None`` if not waiting
+        for group commits.
+
+        Entries that would land in a partition already past retention are
+        discarded and counted in :attr:`expired_dropped`. Creating a
+        partition triggers a retention pass once the entries are written.
+        """
+        live, expired = self.split_expired(entries)
+        self.expired_dropped += len(expired)
+        groups: Dict[datetime, List[LogEntry]] = {}
+        for entry in live:
+            groups.setdefault(self._period_start(entry.timestamp), []).append(entry)
+        written: Optional[List[str]] = []
+        rolled_over = False
+        for start, group in groups.items():
+            dao, created = self._partition_for(start)
+            stored = dao.store_logs(group, wait=wait)
+            written = None if stored is None or written is None else written + stored
+            rolled_over = rolled_over or created
+        if rolled_over:
+            self.drop_expired()
+        return written
+
+    def query_logs(
+        self,
+        level: Optional[str] = None,
+        service: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+    ) -> List[LogEntry]:
+        return self.query_page(level, service, since, until, limit, cursor)[0]
+
+    def query_page(
+        self,
+        level: Optional[str] = None,
+        service: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[LogEntry], Optional[str]]:
+        """Same contract as :meth:`LogDAO.query_page`, across partitions.
+
+        Partitions are visited oldest first and their rows merged on
+        ``(timestamp, id)``. Once a full page is collected, partitions that
+        start after the last collected row cannot contribute and are skipped.
+        """
+        partitions = self.partitions(since, until)
+        key = query_key(level, service, since, until, limit, cursor)
+        generation = self._generation(partitions)
+        cached = self.query_cache.get(key, generation) if self.query_cache.max_bytes else None
+        if cached is not None:
+            return list(cached[0]), cached[1]
+        merged = self._merge_rows(partitions, level, service, since, until, limit, cursor)
+        entries, next_cursor = build_page(merged, limit)
+        if self.query_cache.max_bytes:
+            self.query_cache.put(key, generation, (entries, next_cursor), page_size(entries))
+        return list(entries), next_cursor
+
+    def query_rows(
+        self,
+        level: Optional[str] = None,
+        service: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[sqlite3.Row], Optional[str]]:
+        """Same contract as :meth:`LogDAO.query_rows`, across partitions."""
+        partitions = self.partitions(since, until)
+        key = ("rows", *query_key(level, service, since, until, limit, cursor))
+        generation = self._generation(partitions)
+        cached = self.query_cache.get(key, generation) if self.query_cache.max_bytes else None
+        if cached is not None:
+            return cached
+        merged = self._merge_rows(partitions, level, service, since, until, limit, cursor)
+        page = page_rows(merged, limit)
+        if self.query_cache.max_bytes:
+            self.query_cache.put(key, generation, page, rows_size(page[0]))
+        return page
+
+    def _generation(self, partitions: List[Partition]) -> Tuple[Any, ...]:
+        """Cache validity key: the write generations of what a query reads."""
+        archived = self.archive.generation if self.archive is not None else None
+        return (archived, *((p.start, self._open(p).generation) for p in partitions))
+
+    def _merge_rows(
+        self,
+        partitions: List[Partition],
+        level: Optional[str],
+        service: Optional[str],
+        since: Optional[datetime],
+        until: Optional[datetime],
+        limit: Optional[int],
+        cursor: Optional[str],
+    ) -> List[sqlite3.Row]:
+        """Up to ``limit + 1`` rows from *partitions* in ``(timestamp, id)`` order."""
+        after = decode_cursor(cursor) if cursor else None
+        fetch = limit + 1 if limit is not None else None
+        merged: List[sqlite3.Row] = []
+        for partition in partitions:
+            if after is not None and partition.end.strftime("%Y-%m-%dT%H:%M:%S") <= after[0]:
+                continue
+            if fetch is not None and len(merged) >= fetch:
+                if partition.lower_bound > merged[-1]["timestamp"]:
+                    break
+            rows = self._open(partition).fetch_rows(level, service, since, until, fetch, after)
+            merged = list(heapq.merge(merged, rows, key=lambda r: (r["timestamp"], r["id"])))
+            if fetch is not None:
+                merged = merged[:fetch]
+        if self.archive is not None and self.archive.segments:
+            bounds = [to_utc(b).isoformat() if b else None for b in (since, until)]
+            archived = self.archive.fetch_rows(level, service, *bounds, fetch, after)
+            merged = list(heapq.merge(archived, merged, key=lambda r: (r["timestamp"], r["id"])))
+            if fetch is not None:
+                merged = merged[:fetch]
+        return merged
+
+    def search(
+        self,
+        q: str,
+        level: Optional[str] = None,
+        service: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        limit: int = 100,
+    ) -> List[LogEntry]:
+        """Full-text search across partitions, merged by rank."""
+        per_partition = [
+            self._open(p).search_rows(q, level, service, since, until, limit)
+            for p in self.partitions(since, until)
+        ]
+        merged = heapq.merge(*per_partition, key=lambda r: r["rank"])
+        return [row_to_entry(row) for row in itertools.islice(merged, limit)]
+
+    def stats(
+        self,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        interval: str = "hour",
+        group_by: Iterable[str] = STATS_DIMENSIONS,
+        level: Optional[str] = None,
+        service: Optional[str] = None,
+    ) -> List[dict]:
+        """Rollup counts summed across the partitions in range."""
+        group_by = list(group_by)
+        totals: Dict[Tuple[Tuple[str, str], ...], int] = {}
+        for partition in self.partitions(since, until):
+            for row in self._open(partition).stats(since, until, interval, group_by, level, service):
+                count = row.pop("count")
+                key = tuple(row.items())
+                totals[key] = totals.get(key, 0) + count
+        return [{**dict(key), "count": count} for key, count in sorted(totals.items())]
+
+    def rebuild_rollups(self) -> None:
+        for partition in self.partitions():
+            self._open(partition).rebuild_rollups()
+
+    def rebuild_search_index(self) -> int:
+        return sum(self._open(p).rebuild_search_index() for p in self.partitions())
+
+    def all_logs(self) -> List[LogEntry]:
+        return self.query_logs()
+
+    def iter_rows(self, batch_size: int = 1000) -> Iterator[List[sqlite3.Row]]:
+        """Yield every stored row, archive first, then partition by partition."""
+        if self.archive is not None:
+            yield from self.archive.iter_rows(batch_size)
+        for partition in self.partitions():
+            yield from self._open(partition).iter_rows(batch_size)
+
+    def flush(self) -> None:
+        for partition in self.partitions():
+            if partition.dao is not None:
+                partition.dao.flush()
+
+    @property
+    def duplicates_dropped(self) -> int:
+        return sum(p.dao.duplicates_dropped for p in self.partitions() if p.dao is not None)
+
+    @property
+    def pending_writes(self) -> int:
+        return sum(p.dao.pending_writes for p in self.partitions() if p.dao is not None)
+
+    def close(self) -> None:
+        # Reopened partitions restart their generation at 0.
+        self.query_cache.clear()
+        with self._lock:
+            for partition in self._partitions.values():
+                if partition.dao is not None:
+                    partition.dao.close()
+                    partition.dao = None
@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, List
+import queue
+import sqlite3
+import threading
+
+
+class ReadPool:
+    """Bounded pool of read-only SQLite connections.
+
+    Connections are opened lazily up to ``size`` and handed out one per
+    caller, so readers never share a connection (or its transaction) with
+    the writer. Under WAL journaling each reader sees a consistent snapshot
+    and neither blocks nor is blocked by the writer. When every connection
+    is busy, callers wait up to ``timeout`` seconds, then get ``TimeoutError``.
+    """
+
+    def __init__(self, db_path: Path, size: int = 4, timeout: float = 30.0):
+        if size < 1:
+            raise ValueError("read pool size must be at least 1")
+        self._uri = f"{Path(db_path).resolve().as_uri()}?mode=ro"
+        self.size = size
+        self.timeout = timeout
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._all: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self._uri, uri=True, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @property
+    def in_use(self) -> int:
+        return len(self._all) - self._idle.qsize()
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                conn = self._connect() if len(self._all) < self.size else None
+                if conn is not None:
+                    self._all.append(conn)
+            if conn is None:
+                try:
+                    conn = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    raise TimeoutError("no read connection available") from None
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    def close(self) -> None:
+        with self._lock:
+            for conn in self._all:
+                conn.close()
+            self._all.clear()
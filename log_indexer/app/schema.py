@@ -0,0 +1,241 @@
+"""Physical layouts of the ``logs`` table.
+
+Both layouts present the same logical row to the rest of the DAO:
+``(id, timestamp, level, service, message, hash)`` with UTC ISO-8601
+timestamp text and hex hash text. :class:`TextLayout` stores exactly that.
+:class:`CompactLayout` stores integer epoch microseconds, interned service
+and level ids and a 32-byte BLOB hash, and decodes back to the logical form
+in SQL, so pagination, partitions, search and rollups work unchanged.
+"""
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Sequence
+import re
+import sqlite3
+
+_HEX_DIGEST = re.compile(r"^[0-9a-f]{64}$")
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def to_micros(value: datetime) -> int:
+    """Epoch microseconds for *value*; naive timestamps are taken as UTC."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    delta = value - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def pack_hash(value: str) -> Any:
+    """SHA-256 hex digests become 32 raw bytes; anything else is kept as text."""
+    return bytes.fromhex(value) if _HEX_DIGEST.match(value) else value
+
+
+class TextLayout:
+    """The original layout: every column stored as text."""
+
+    name = "text"
+    timestamp = "logs.timestamp"
+    level = "logs.level"
+    service = "logs.service"
+    hash = "logs.hash"
+    create = [
+        """
+        CREATE TABLE IF NOT EXISTS logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT NOT NULL,
+            level TEXT NOT NULL,
+            service TEXT NOT NULL,
+            message TEXT NOT NULL,
+            hash TEXT NOT NULL
+        )
+        """
+    ]
+    # Every index ends in the timestamp (plus the implicit rowid), so filtered
+    # queries come back in ``(timestamp, id)`` order without a sort step.
+    indexes = {
+        "idx_logs_service_level_ts": "logs (service, level, timestamp)",
+        "idx_logs_service_ts": "logs (service, timestamp)",
+        "idx_logs_level_ts": "logs (level, timestamp)",
+        "idx_logs_ts": "logs (timestamp)",
+    }
+
+    @property
+    def columns(self) -> str:
+        """SELECT list producing the logical row."""
+        return (
+            f"logs.id AS id, {self.timestamp} AS timestamp, {self.level} AS level,"
+            f" {self.service} AS service, logs.message AS message, {self.hash} AS hash"
+        )
+
+    # Raw column expressions for WHERE / ORDER BY, so indexes apply.
+    order_column = "logs.timestamp"
+
+    def level_condition(self) -> str:
+        return "logs.level = ?"
+
+    def service_condition(self) -> str:
+        return "logs.service = ?"
+
+    def time_param(self, value: datetime) -> Any:
+        return self.logical_timestamp(value)
+
+    def cursor_param(self, timestamp: str) -> Any:
+        return timestamp
+
+    def hash_param(self, value: str) -> Any:
+        return value
+
+    def logical_timestamp(self, value: datetime) -> str:
+        """UTC ISO text, so stored timestamps and bounds compare as strings."""
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.astimezone(timezone.utc).isoformat()
+
+    def insert(self, conn: sqlite3.Connection, rows: Sequence[tuple]) -> None:
+        conn.executemany(
+            "INSERT OR IGNORE INTO logs (timestamp, level, service, message, hash) VALUES (?, ?, ?, ?, ?)",
+            rows,
+        )
+
+    def forget(self) -> None:
+        """Drop any cached state after a rolled-back write."""
+
+
+class CompactLayout(TextLayout):
+    """Integer timestamps, interned service/level ids and binary hashes."""
+
+    name = "compact"
+    # Decode epoch microseconds to the same text ``datetime.isoformat`` gives
+    # for a UTC timestamp, entirely in SQL.
+    timestamp = (
+        "(strftime('%Y-%m-%dT%H:%M:%S', logs.ts / 1000000, 'unixepoch')"
+        " || CASE WHEN logs.ts % 1000000 THEN printf('.%06d', logs.ts % 1000000) ELSE '' END"
+        " || '+00:00')"
+    )
+    level = "(SELECT name FROM log_levels WHERE id = logs.level_id)"
+    service = "(SELECT name FROM log_services WHERE id = logs.service_id)"
+    hash = "(CASE WHEN typeof(logs.hash) = 'blob' THEN lower(hex(logs.hash)) ELSE logs.hash END)"
+    create = [
+        "CREATE TABLE IF NOT EXISTS log_levels (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE)",
+        "CREATE TABLE IF NOT EXISTS log_services (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE)",
+        """
+        CREATE TABLE IF NOT EXISTS logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ts INTEGER NOT NULL,
+            level_id INTEGER NOT NULL,
+            service_id INTEGER NOT NULL,
+            message TEXT NOT NULL,
+            hash BLOB NOT NULL
+        )
+        """,
+    ]
+    indexes = {
+        "idx_logs_service_level_ts": "logs (service_id, level_id, ts)",
+        "idx_logs_service_ts": "logs (service_id, ts)",
+        "idx_logs_level_ts": "logs (level_id, ts)",
+        "idx_logs_ts": "logs (ts)",
+    }
+    order_column = "logs.ts"
+
+    def __init__(self) -> None:
+        self._ids: Dict[str, Dict[str, int]] = {"log_levels": {}, "log_services": {}}
+
+    def level_condition(self) -> str:
+        return "logs.level_id = (SELECT id FROM log_levels WHERE name = ?)"
+
+    def service_condition(self) -> str:
+        return "logs.service_id = (SELECT id FROM log_services WHERE name = ?)"
+
+    def time_param(self, value: datetime) -> Any:
+        return to_micros(value)
+
+    def cursor_param(self, timestamp: str) -> Any:
+        return to_micros(datetime.fromisoformat(timestamp))
+
+    def hash_param(self, value: str) -> Any:
+        return pack_hash(value)
+
+    def _intern(self, conn: sqlite3.Connection, table: str, name: str) -> int:
+        ids = self._ids[table]
+        found = ids.get(name)
+        if found is None:
+            conn.execute(f"INSERT OR IGNORE INTO {table} (name) VALUES (?)", (name,))
+            found = conn.execute(f"SELECT id FROM {table} WHERE name = ?", (name,)).fetchone()[0]
+            ids[name] = found
+        return found
+
+    def insert(self, conn: sqlite3.Connection, rows: Sequence[tuple]) -> None:
+        conn.executemany(
+            "INSERT OR IGNORE INTO logs (ts, level_id, service_id, message, hash) VALUES (?, ?, ?, ?, ?)",
+            [
+                (
+                    to_micros(datetime.fromisoformat(timestamp)),
+                    self._intern(conn, "log_levels", level),
+                    self._intern(conn, "log_services", service),
+                    message,
+                    pack_hash(digest),
+                )
+                for timestamp, level, service, message, digest in rows
+            ],
+        )
+
+    def forget(self) -> None:
+        # Ids handed out inside a rolled-back transaction may be reused for
+        # other names, so the cache must be rebuilt from the table.
+        for ids in self._ids.values():
+            ids.clear()
+
+
+def detect_layout(conn: sqlite3.Connection, compact: bool) -> TextLayout:
+    """Layout of the existing ``logs`` table, or the requested one if new."""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(logs)")}
+    if not columns:
+        return CompactLayout() if compact else TextLayout()
+    return CompactLayout() if "ts" in columns else TextLayout()
+
+
+def migrate_to_compact(db_path: Path) -> int:
+    """Rewrite a text-layout database in the compact layout.
+
+    Runs in a single transaction and then VACUUMs to return the freed pages.
+    The full-text index is dropped and rebuilt by the next ``LogDAO`` open;
+    ids, and therefore pagination cursors, are preserved. Returns the number
+    of rows migrated (0 if the database is already compact).
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        if isinstance(detect_layout(conn, compact=True), CompactLayout):
+            return 0
+        conn.create_function("to_micros", 1, lambda s: to_micros(datetime.fromisoformat(s)), deterministic=True)
+        conn.create_function("pack_hash", 1, pack_hash, deterministic=True)
+        compact = CompactLayout()
+        with conn:
+            for statement in compact.create[:2]:
+                conn.execute(statement)
+            conn.execute("INSERT OR IGNORE INTO log_levels (name) SELECT DISTINCT level FROM logs")
+            conn.execute("INSERT OR IGNORE INTO log_services (name) SELECT DISTINCT service FROM logs")
+            conn.execute(compact.create[2].replace("TABLE IF NOT EXISTS logs", "TABLE logs_compact"))
+            conn.execute(
+                "INSERT INTO logs_compact (id, ts, level_id, service_id, message, hash)"
+                " SELECT logs.id, to_micros(logs.timestamp), l.id, s.id, logs.message, pack_hash(logs.hash)"
+                " FROM logs JOIN log_levels l ON l.name = logs.level"
+                " JOIN log_services s ON s.name = logs.service"
+            )
+            count = conn.execute("SELECT COUNT(*) FROM logs_compact").fetchone()[0]
+            stale: List[str] = [
+                row[0]
+                for row in conn.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'logs'"
+                )
+            ]
+            for trigger in stale:
+                conn.execute(f"DROP TRIGGER {trigger}")
+            conn.execute("DROP TABLE IF EXISTS logs_fts")
+            conn.execute("DROP TABLE logs")
+            conn.execute("ALTER TABLE logs_compact RENAME TO logs")
+        conn.execute("VACUUM")
+        return count
+    finally:
+        conn.close()
@@ -0,0 +1,68 @@
+"""Build the configured log store from ``LOG_INDEXER_*`` environment variables."""
+from __future__ import annotations
+
+import os
+from datetime import timedelta
+from pathlib import Path
+from typing import Any, Dict, Union
+
+from .archive import SegmentArchive
+from .dao import LogDAO
+from .ipc import RemoteLogStore, WriterClient
+from .partitions import PartitionedLogDAO
+
+LogStore = Union[LogDAO, PartitionedLogDAO]
+
+
+def dao_options() -> Dict[str, Any]:
+    """Per-database ``LogDAO`` keyword arguments."""
+    return {
+        "group_commit": os.getenv("LOG_INDEXER_WRITE_MODE", "direct") == "group",
+        "full_text": os.getenv("LOG_INDEXER_FULL_TEXT", "1") == "1",
+        "batch_size": int(os.getenv("LOG_INDEXER_GROUP_SIZE", "500")),
+        "flush_interval": int(os.getenv("LOG_INDEXER_GROUP_MS", "50")) / 1000,
+        "queue_size": int(os.getenv("LOG_INDEXER_QUEUE_SIZE", "10000")),
+        "synchronous": os.getenv("LOG_INDEXER_SYNCHRONOUS", "NORMAL"),
+        "read_pool_size": int(os.getenv("LOG_INDEXER_READ_POOL", "4")),
+        "compact": os.getenv("LOG_INDEXER_COMPACT", "0") == "1",
+        "cache_bytes": int(float(os.getenv("LOG_INDEXER_QUERY_CACHE_MB", "16")) * 1024 * 1024),
+    }
+
+
+def open_archive(data_dir: Path, read_only: bool = False) -> SegmentArchive:
+    """The cold-archive segments under ``<data_dir>/archive``."""
+    return SegmentArchive(
+        data_dir / "archive",
+        codec=os.getenv("LOG_INDEXER_ARCHIVE_CODEC", "zlib"),
+        segment_rows=int(os.getenv("LOG_INDEXER_ARCHIVE_SEGMENT_ROWS", "100000")),
+        read_only=read_only,
+    )
+
+
+def open_store(data_dir: Path, read_only: bool = False) -> LogStore:
+    """Open ``logs.db``, or time partitions if ``LOG_INDEXER_PARTITION`` is set."""
+    period = os.getenv("LOG_INDEXER_PARTITION")
+    archive = open_archive(data_dir, read_only)
+    if not period:
+        return LogDAO(data_dir / "logs.db", archive=archive, read_only=read_only, **dao_options())
+    retention_days = os.getenv("LOG_INDEXER_RETENTION_DAYS")
+    retention = timedelta(days=float(retention_days)) if retention_days else None
+    return PartitionedLogDAO(
+        data_dir, period=period, retention=retention, archive=archive, read_only=read_only, **dao_options()
+    )
+
+
+def open_service_store(data_dir: Path) -> Union[LogStore, RemoteLogStore]:
+    """The store an API process uses.
+
+    With ``LOG_INDEXER_WRITER_SOCKET`` set, writes go to the writer process
+    listening there (``manage.py serve-writer``) and reads use read-only
+    connections; otherwise the process opens the store itself.
+    """
+    socket_path = os.getenv("LOG_INDEXER_WRITER_SOCKET")
+    if not socket_path:
+        return open_store(data_dir)
+    timeout = float(os.getenv("LOG_INDEXER_WRITER_CONNECT_TIMEOUT", "30"))
+    # Connect first: the writer creates the database before it listens.
+    client = WriterClient(Path(socket_path), connect_timeout=timeout)
+    return RemoteLogStore(open_store(data_dir, read_only=True), client)
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+from collections import deque
+from typing import AsyncIterator, Iterable, List, Optional, Tuple
+import asyncio
+import json
+import threading
+
+from .models import LogEntry
+
+
+class Subscription:
+    """One live-tail subscriber: its filters and a bounded buffer.
+
+    The buffer is a ``deque`` with ``maxlen``, so when the consumer falls
+    behind the oldest entries are discarded and counted in ``dropped``.
+    """
+
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        buffer_size: int,
+        service: Optional[str] = None,
+        level: Optional[str] = None,
+        contains: Optional[str] = None,
+    ):
+        self.service = service
+        self.level = level
+        self.contains = contains
+        self.dropped = 0
+        self._buffer: "deque[str]" = deque(maxlen=buffer_size)
+        self._loop = loop
+        self._ready = asyncio.Event()
+        self._wakeup_pending = False
+
+    def matches(self, entry: LogEntry) -> bool:
+        if self.service and entry.service != self.service:
+            return False
+        if self.level and entry.level != self.level:
+            return False
+        if self.contains and self.contains not in entry.message:
+            return False
+        return True
+
+    def push(self, payload: str) -> None:
+        """Buffer *payload*; called from ingest threads and never blocks."""
+        if len(self._buffer) == self._buffer.maxlen:
+            self.dropped += 1
+        self._buffer.append(payload)
+        # Wake the consumer at most once per drain rather than per entry.
+        if not self._wakeup_pending:
+            self._wakeup_pending = True
+            try:
+                self._loop.call_soon_threadsafe(self._ready.set)
+            except RuntimeError:
+                pass  # event loop already closed; the subscriber is gone
+
+    async def wait(self) -> None:
+        await self._ready.wait()
+
+    def drain(self) -> Tuple[List[str], int]:
+        """Take everything buffered plus the number of entries dropped."""
+        self._ready.clear()
+        self._wakeup_pending = False
+        payloads = []
+        while self._buffer:
+            payloads.append(self._buffer.popleft())
+        dropped, self.dropped = self.dropped, 0
+        return payloads, dropped
+
+
+class TailHub:
+    """In-process fan-out of newly ingested entries to live-tail subscribers.
+
+    ``publish`` is called on the ingest path. It does no I/O and takes no
+    lock shared with consumers: the subscriber list is replaced rather than
+    mutated, so publishing costs one filter check and one buffer append per
+    subscriber. When nobody is subscribed it returns immediately.
+    """
+
+    def __init__(self, buffer_size: int = 1000, max_subscribers: int = 100):
+        self.buffer_size = buffer_size
+        self.max_subscribers = max_subscribers
+        self._subscribers: Tuple[Subscription, ...] = ()
+        self._lock = threading.Lock()
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self, **filters: Optional[str]) -> Subscription:
+        sub = Subscription(asyncio.get_running_loop(), self.buffer_size, **filters)
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                raise RuntimeError("too many tail subscribers")
+            self._subscribers = self._subscribers + (sub,)
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        with self._lock:
+            self._subscribers = tuple(s for s in self._subscribers if s is not sub)
+
+    def publish(self, entries: Iterable[LogEntry]) -> None:
+        subscribers = self._subscribers
+        if not subscribers:
+            return
+        for entry in entries:
+            payload = None
+            for sub in subscribers:
+                if sub.matches(entry):
+                    if payload is None:
+                        payload = entry.model_dump_json()
+                    sub.push(payload)
+
+
+async def sse_events(hub: TailHub, sub: Subscription, keepalive: float = 15.0) -> AsyncIterator[str]:
+    """Render *sub* as a server-sent event stream until the client leaves."""
+    try:
+        while True:
+            try:
+                await asyncio.wait_for(sub.wait(), timeout=keepalive)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            payloads, dropped = sub.drain()
+            if dropped:
+                yield f"event: dropped\ndata: {json.dumps({'dropped': dropped})}\n\n"
+            for payload in payloads:
+                yield f"data: {payload}\n\n"
+    finally:
+        hub.unsubscribe(sub)
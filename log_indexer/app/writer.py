@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+import queue
+import sqlite3
+import threading
+import time
+
+Batch = Tuple[List[Any], "Future[Any]"]
+
+
+class GroupCommitWriter:
+    """Background thread that commits queued rows in groups.
+
+    Rows are taken from a bounded queue and written with one transaction per
+    group. A group is flushed once ``batch_size`` rows are pending or
+    ``flush_interval`` seconds have passed since its first row arrived,
+    whichever comes first. Every submission returns a ``Future`` that resolves
+    once its rows are committed, so callers that need durability can wait.
+    Its result is whatever ``write_rows`` returned for that submission.
+    """
+
+    def __init__(
+        self,
+        conn: sqlite3.Connection,
+        write_rows: Callable[[sqlite3.Connection, List[Any]], Any],
+        *,
+        lock: Optional[threading.Lock] = None,
+        batch_size: int = 500,
+        flush_interval: float = 0.05,
+        queue_size: int = 10000,
+        on_commit: Optional[Callable[[], None]] = None,
+        on_rollback: Optional[Callable[[], None]] = None,
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        # ``None`` is the shutdown sentinel.
+        self._queue: "queue.Queue[Optional[Batch]]" = queue.Queue(maxsize=queue_size)
+        self._conn = conn
+        self._write_rows = write_rows
+        # Held around each commit so others can share the connection safely.
+        self._lock = lock or threading.Lock()
+        # Let the owner react to a group committing, or discard state tied
+        # to a transaction that failed; both run under ``lock``.
+        self._on_commit = on_commit
+        self._on_rollback = on_rollback
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    @property
+    def depth(self) -> int:
+        """Number of submissions waiting to be committed."""
+        return self._queue.qsize()
+
+    def submit(self, rows: Sequence[Any]) -> "Future[Any]":
+        """Queue *rows* for the next group commit.
+
+        Blocks while the queue is full, which pushes back on producers instead
+        of buffering without bound.
+        """
+        future: "Future[int]" = Future()
+        self._queue.put((list(rows), future))
+        return future
+
+    def flush(self, timeout: float | None = None) -> None:
+        """Wait until everything submitted so far has been committed."""
+        self.submit([]).result(timeout=timeout)
+
+    def close(self) -> None:
+        """Commit outstanding rows and stop the thread."""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is None:
+                break
+            pending: List[Batch] = [item]
+            count = len(item[0])
+            deadline = time.monotonic() + self.flush_interval
+            while count < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                pending.append(item)
+                count += len(item[0])
+            self._commit(pending)
+
+    def _commit(self, pending: List[Batch]) -> None:
+        with self._lock:
+            try:
+                with self._conn:
+                    results = [self._write_rows(self._conn, batch) if batch else [] for batch, _ in pending]
+            except Exception as exc:
+                if self._on_rollback is not None:
+                    self._on_rollback()
+                for _, future in pending:
+                    future.set_exception(exc)
+                return
+            if self._on_commit is not None:
+                self._on_commit()
+        for (_, future), result in zip(pending, results):
+            future.set_result(result)
@@ -0,0 +1,58 @@
+"""Compare the text and compact log_indexer layouts on file size and insert rate.
+
+Usage: python scripts/bench_compact_schema.py [rows]
+"""
+import hashlib
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from log_indexer.app.dao import LogDAO  # noqa: E402
+from log_indexer.app.models import LogEntry  # noqa: E402
+
+SERVICES = ["backend", "incident_manager", "report_exporter", "sentinelcore-ai", "behavior_analytics"]
+LEVELS = ["DEBUG", "INFO", "INFO", "INFO", "WARNING", "ERROR"]
+BATCH = 1000
+
+
+def dataset(rows: int):
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    for i in range(rows):
+        message = f"request {i} handled in {i % 977} ms for user {i % 313}"
+        yield LogEntry(
+            timestamp=start + timedelta(milliseconds=250 * i),
+            level=LEVELS[i % len(LEVELS)],
+            service=SERVICES[i % len(SERVICES)],
+            message=message,
+            hash=hashlib.sha256(f"{i}|{message}".encode()).hexdigest(),
+        )
+
+
+def run(path: Path, rows: int, compact: bool) -> None:
+    entries = list(dataset(rows))
+    dao = LogDAO(path, compact=compact, full_text=False)
+    began = time.perf_counter()
+    for start in range(0, rows, BATCH):
+        dao.add_logs(entries[start:start + BATCH])
+    elapsed = time.perf_counter() - began
+    dao._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    dao.close()
+    size = path.stat().st_size
+    name = "compact" if compact else "text"
+    print(f"{name:8} {size / 1e6:8.1f} MB {size / rows:7.1f} B/row {rows / elapsed:10.0f} rows/s")
+
+
+def main() -> None:
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    with tempfile.TemporaryDirectory() as tmp:
+        for compact in (False, True):
+            run(Path(tmp) / f"{compact}.db", rows, compact)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Compare the compiled behavior_analytics rule matcher with a per-rule loop.
+
+Usage: python scripts/bench_rule_engine.py [events]
+"""
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from behavior_analytics.app.rules import CompiledRules, Rule  # noqa: E402
+
+SIZES = [10, 100, 1000, 5000]
+LEVELS = ["INFO", "INFO", "INFO", "WARNING", "ERROR"]
+SERVICES = ["auth", "billing", "gateway", "backend", "worker"]
+NAIVE_LIMIT = 1000
+
+
+def make_rules(count: int, rng: random.Random) -> list:
+    """Mostly literals, a quarter regexes with a literal, a few without."""
+    rules = []
+    for i in range(count):
+        word = f"sig{i:05d}"
+        if i % 4 == 0:
+            rules.append(Rule(id=f"re-{i}", pattern=rf"{word}\s+user=\w+ from \d+\.\d+"))
+        elif i % 50 == 1:
+            rules.append(Rule(id=f"bare-{i}", pattern=rf"\b\d{{3}}-{i}\b"))
+        else:
+            rules.append(Rule(id=f"lit-{i}", literal=word, services=[rng.choice(SERVICES)]))
+    return rules
+
+
+def make_events(count: int, rules: int, rng: random.Random) -> list:
+    events = []
+    for i in range(count):
+        message = f"request {i} handled in {i % 977} ms for user {i % 313}"
+        if i % 20 == 0:
+            message += f" sig{rng.randrange(rules):05d} user=alice from 10.0"
+        events.append((LEVELS[i % len(LEVELS)], SERVICES[i % len(SERVICES)], message))
+    return events
+
+
+def naive(rules: list):
+    compiled = [
+        (rule, re.compile(rule.pattern, re.IGNORECASE) if rule.pattern else None, (rule.literal or "").lower())
+        for rule in rules
+    ]
+
+    def match(level: str, service: str, message: str) -> list:
+        lowered = message.lower()
+        found = []
+        for rule, regex, literal in compiled:
+            if rule.services and service not in rule.services:
+                continue
+            if regex is not None and not regex.search(message):
+                continue
+            if literal and literal not in lowered:
+                continue
+            found.append(rule)
+        return found
+
+    return match
+
+
+def timed(match, events: list) -> tuple:
+    began = time.perf_counter()
+    hits = sum(len(match(*event)) for event in events)
+    return (time.perf_counter() - began) / len(events) * 1e6, hits
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    rng = random.Random(7)
+    print(f"{'rules':>6} {'compile ms':>11} {'compiled us/event':>18} {'per-rule us/event':>18}")
+    for size in SIZES:
+        rules = make_rules(size, rng)
+        events = make_events(count, size, rng)
+        began = time.perf_counter()
+        compiled = CompiledRules(rules)
+        build = (time.perf_counter() - began) * 1e3
+        fast, hits = timed(compiled.match, events)
+        slow = "-"
+        if size <= NAIVE_LIMIT:
+            cost, expected = timed(naive(rules), events)
+            assert hits == expected, (hits, expected)
+            slow = f"{cost:.1f}"
+        print(f"{size:>6} {build:>11.1f} {fast:>18.1f} {slow:>18}")
+
+
+if __name__ == "__main__":
+    main()
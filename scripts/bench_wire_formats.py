@@ -0,0 +1,79 @@
+"""Compare log shipping wire formats on size and indexer decode cost.
+
+For JSON, JSON+gzip, MessagePack and MessagePack+gzip batches built by the
+shared logging config, prints bytes on the wire per record and the CPU the
+indexer spends per record to decompress, decode and validate a batch (the
+work done before storage, which is the same for every format).
+
+Usage: python scripts/bench_wire_formats.py [records] [batch]
+"""
+import importlib.util
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from log_indexer.app.decoders import decompress, parse_batch  # noqa: E402
+from log_indexer.app.models import LogEntry  # noqa: E402
+
+SERVICES = ["backend", "incident_manager", "report_exporter", "sentinelcore-ai", "behavior_analytics"]
+LEVELS = ["DEBUG", "INFO", "INFO", "INFO", "WARNING", "ERROR"]
+FORMATS = ["json", "json+gzip", "msgpack", "msgpack+gzip"]
+
+
+def load_shipper():
+    spec = importlib.util.spec_from_file_location("shipper", ROOT / "scripts" / "logging_config_template.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def dataset(records: int):
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    return [
+        {
+            "timestamp": (start + timedelta(milliseconds=250 * i)).isoformat(),
+            "level": LEVELS[i % len(LEVELS)],
+            "service": SERVICES[i % len(SERVICES)],
+            "message": f"Request: GET /api/v1/items/{i % 977} -> 200 in {i % 89} ms",
+        }
+        for i in range(records)
+    ]
+
+
+def run(shipper, entries, batch: int, wire: str) -> None:
+    batches = [entries[i:i + batch] for i in range(0, len(entries), batch)]
+    began = time.process_time()
+    bodies = [shipper.encode_batch(chunk, wire) for chunk in batches]
+    encode = time.process_time() - began
+    size = sum(len(body) for body, _ in bodies)
+    began = time.process_time()
+    for body, headers in bodies:
+        data = decompress(body, headers.get("Content-Encoding", ""), 1 << 30)
+        for item in parse_batch(data, headers["Content-Type"]):
+            LogEntry.model_validate(item)
+    decode = time.process_time() - began
+    records = len(entries)
+    print(
+        f"{wire:13} {size / records:7.1f} B/record"
+        f" {encode / records * 1e6:7.2f} us/record encode"
+        f" {decode / records * 1e6:7.2f} us/record indexer"
+    )
+
+
+def main() -> None:
+    records = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    batch = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    shipper = load_shipper()
+    if shipper.msgpack is None:
+        sys.exit("msgpack is not installed")
+    entries = dataset(records)
+    for wire in FORMATS:
+        run(shipper, entries, batch, wire)
+
+
+if __name__ == "__main__":
+    main()
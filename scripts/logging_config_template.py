@@ -1,11 +1,26 @@
+import asyncio
+import atexit
+import collections
+import contextlib
+import gzip
+import json
 import logging
-from datetime import datetime
+from datetime import datetime, timezone
 import os
 from pathlib import Path
+import random
+import threading
+import time
+import weakref
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util import Retry
 
+try:  # MessagePack shipping is optional
+    import msgpack
+except ImportError:  # pragma: no cover - depends on the environment
+    msgpack = None
+
 
 def load_env(name: str, required: bool = True) -> str | None:
     """Fetch *name* from the environment or an associated secret file."""
@@ -21,6 +36,28 @@ def load_env(name: str, required: bool = True) -> str | None:
 LOG_INDEXER_URL = load_env("LOG_INDEXER_URL", required=False)
 LOG_INDEXER_TOKEN = load_env("LOG_INDEXER_TOKEN", required=False)
 
+# Records waiting to be shipped; once full, DROP_POLICY decides whether the
+# new record ("drop_new") or the oldest queued one ("drop_oldest") is lost.
+QUEUE_SIZE = int(os.getenv("LOG_SHIPPER_QUEUE_SIZE", "10000"))
+BATCH_SIZE = int(os.getenv("LOG_SHIPPER_BATCH_SIZE", "500"))
+FLUSH_INTERVAL = float(os.getenv("LOG_SHIPPER_FLUSH_SECONDS", "1.0"))
+DROP_POLICY = os.getenv("LOG_SHIPPER_DROP_POLICY", "drop_new")
+SHUTDOWN_TIMEOUT = float(os.getenv("LOG_SHIPPER_SHUTDOWN_SECONDS", "5.0"))
+# Optional on-disk spool for records the indexer did not accept.
+SPOOL_DIR = load_env("LOG_SHIPPER_SPOOL_DIR", required=False)
+SPOOL_SEGMENT_BYTES = int(float(os.getenv("LOG_SHIPPER_SPOOL_SEGMENT_MB", "4")) * 1024 * 1024)
+SPOOL_MAX_BYTES = int(float(os.getenv("LOG_SHIPPER_SPOOL_MAX_MB", "256")) * 1024 * 1024)
+REPLAY_RATE = float(os.getenv("LOG_SHIPPER_REPLAY_RATE", "500"))
+# Repeats of one message template within COALESCE_SECONDS, beyond the first
+# COALESCE_BURST, are shipped as a single record with a repeat count.
+# SAMPLE maps message templates to the fraction of records kept, e.g.
+# '{"health_check": 0.1}'; it never applies to WARNING and above.
+COALESCE_SECONDS = float(os.getenv("LOG_SHIPPER_COALESCE_SECONDS", "0"))
+COALESCE_BURST = int(os.getenv("LOG_SHIPPER_COALESCE_BURST", "1"))
+SAMPLE_RATES = json.loads(os.getenv("LOG_SHIPPER_SAMPLE", "{}"))
+# Body format for shipped batches: "json" or "msgpack", optionally "+gzip".
+WIRE_FORMAT = os.getenv("LOG_SHIPPER_WIRE", "json")
+
 _session = requests.Session()
 _adapter = HTTPAdapter(max_retries=Retry(total=3, backoff_factor=0.5))
 _session.mount("http://", _adapter)
@@ -29,32 +66,641 @@ _session.mount("https://", _adapter)
 SERVICE_NAME = "__SERVICE_NAME__"
 
 
+class Spool:
+    """Append-only segment files holding entries that failed to ship.
+
+    Each process appends NDJSON to its own active segment, with an fsync
+    per batch, and starts a new segment after ``segment_bytes``. Segments
+    are locked with ``flock`` while written or replayed, so several workers
+    of one service can share the directory; one of them holds
+    ``replay.lock`` and replays. Once the directory exceeds ``max_bytes``
+    the oldest unlocked segments are deleted. A line cut short by a crash
+    is skipped on replay.
+    """
+
+    def __init__(self, directory: Path, segment_bytes: int = SPOOL_SEGMENT_BYTES, max_bytes: int = SPOOL_MAX_BYTES):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self.spooled = 0
+        self.dropped = 0
+        self._active: int | None = None
+        self._active_path: Path | None = None
+        self._active_size = 0
+        self._replay_lock: int | None = None
+
+    def append(self, entries: list) -> None:
+        data = "".join(json.dumps(entry, separators=(",", ":")) + "\n" for entry in entries).encode()
+        if self._active is None or self._active_size >= self.segment_bytes:
+            self._open_segment()
+        os.write(self._active, data)
+        os.fsync(self._active)
+        self._active_size += len(data)
+        self.spooled += len(entries)
+        self._enforce_cap()
+
+    def _open_segment(self) -> None:
+        self._close_active()
+        path = self.directory / f"{time.time_ns():020d}-{os.getpid()}.spool"
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | os.O_APPEND, 0o600)
+        _flock(fd)
+        self._active, self._active_path, self._active_size = fd, path, 0
+
+    def _close_active(self) -> None:
+        if self._active is not None:
+            os.close(self._active)
+            self._active = self._active_path = None
+
+    def segments(self) -> list:
+        return sorted(self.directory.glob("*.spool"))
+
+    def _enforce_cap(self) -> None:
+        sizes = []
+        for path in self.segments():
+            try:
+                sizes.append((path, path.stat().st_size))
+            except FileNotFoundError:
+                continue
+        total = sum(size for _, size in sizes)
+        for path, size in sizes:
+            if total <= self.max_bytes:
+                return
+            if path == self._active_path:
+                continue
+            fd = self._lock(path)
+            if fd is None:
+                continue
+            try:
+                self.dropped += len(_read_lines(fd))
+                path.unlink()
+            finally:
+                os.close(fd)
+            total -= size
+
+    @staticmethod
+    def _lock(path: Path) -> int | None:
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except FileNotFoundError:
+            return None
+        if not _flock(fd, blocking=False):
+            os.close(fd)
+            return None
+        if not os.path.exists(path):
+            # Replayed and deleted between our open and lock.
+            os.close(fd)
+            return None
+        return fd
+
+    def claim(self) -> tuple | None:
+        """Lock the oldest idle segment and return ``(path, fd, entries)``."""
+        if self._replay_lock is None:
+            fd = os.open(self.directory / "replay.lock", os.O_WRONLY | os.O_CREAT, 0o600)
+            if not _flock(fd, blocking=False):
+                os.close(fd)
+                return None
+            self._replay_lock = fd
+        if self._active is not None and self._active_size:
+            self._close_active()
+        for path in self.segments():
+            if path == self._active_path:
+                continue
+            fd = self._lock(path)
+            if fd is not None:
+                return path, fd, _parse_lines(_read_lines(fd))
+        return None
+
+    def release(self, path: Path, fd: int) -> None:
+        """Delete a claimed segment once all of its entries were shipped."""
+        path.unlink(missing_ok=True)
+        os.close(fd)
+
+    def close(self) -> None:
+        self._close_active()
+        if self._replay_lock is not None:
+            os.close(self._replay_lock)
+            self._replay_lock = None
+
+
+def _flock(fd: int, blocking: bool = True) -> bool:
+    """Lock *fd* exclusively; ``False`` if not *blocking* and it is held."""
+    # Unix only, so imported here: services without a spool run anywhere.
+    import fcntl
+
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return False
+    return True
+
+
+def _read_lines(fd: int) -> list:
+    with os.fdopen(os.dup(fd), "rb") as handle:
+        handle.seek(0)
+        return handle.read().splitlines()
+
+
+def _parse_lines(lines: list) -> list:
+    entries = []
+    for line in lines:
+        try:
+            entries.append(json.loads(line))
+        except ValueError:
+            continue
+    return entries
+
+
+class Coalescer:
+    """Sample and rate-limit records per message template.
+
+    Records are keyed by level and their unformatted ``msg``, so
+    ``"Request: %s %s"`` is one key whatever the arguments. Within each
+    ``window`` the first ``burst`` records of a key pass; the rest are
+    counted and later reported by :meth:`collect` as one record, e.g.
+    ``"health_check (repeated 119 times in 60s)"``, or for a template with
+    arguments ``"Request: %s %s (119 similar messages in 60s)"``, since the
+    dropped records may differ. At most ``max_keys`` keys are tracked;
+    records of further keys pass unchanged.
+    """
+
+    def __init__(
+        self,
+        window: float = COALESCE_SECONDS,
+        burst: int = COALESCE_BURST,
+        sample_rates: dict | None = None,
+        max_keys: int = 10000,
+    ) -> None:
+        self.window = window
+        self.burst = burst
+        self.sample_rates = SAMPLE_RATES if sample_rates is None else sample_rates
+        self.max_keys = max_keys
+        self.sampled_out = 0
+        self.coalesced = 0
+        # key -> [window end, records passed, repeats, first repeat, last repeat time]
+        self._windows: dict = {}
+        self._closed: list = []
+
+    def admit(self, record: logging.LogRecord) -> bool:
+        """Whether *record* should be shipped as is.
+
+        Called under the handler's lock.
+        """
+        msg = record.msg
+        if not isinstance(msg, str):
+            return True
+        if self.sample_rates and record.levelno < logging.WARNING:
+            rate = self.sample_rates.get(msg)
+            if rate is not None and random.random() >= rate:
+                self.sampled_out += 1
+                return False
+        if not self.window:
+            return True
+        key = (record.levelno, msg)
+        now = record.created
+        state = self._windows.get(key)
+        if state is None or now >= state[0]:
+            if state is not None:
+                self._close(state)
+            elif len(self._windows) >= self.max_keys:
+                return True
+            self._windows[key] = [now + self.window, 1, 0, None, now]
+            return True
+        if state[1] < self.burst:
+            state[1] += 1
+            return True
+        if state[2] == 0:
+            state[3] = (record.levelname, msg, bool(record.args))
+        state[2] += 1
+        state[4] = now
+        self.coalesced += 1
+        return False
+
+    def _close(self, state: list) -> None:
+        if state[2]:
+            level, message, templated = state[3]
+            window = f"{self.window:g}s"
+            if templated:
+                summary = f"{message} ({state[2]} similar messages in {window})"
+            else:
+                summary = f"{message} (repeated {state[2]} times in {window})"
+            self._closed.append((state[4], level, summary))
+
+    def collect(self, now: float, everything: bool = False) -> list:
+        """Return summary records of windows that ended, forgetting them.
+
+        Called under the handler's lock.
+        """
+        for key, state in list(self._windows.items()):
+            if everything or now >= state[0]:
+                self._close(state)
+                del self._windows[key]
+        closed, self._closed = self._closed, []
+        return closed
+
+
+# Handlers to reset in a forked child and to flush at exit. The hooks are
+# registered once, over weak references, so discarded handlers are neither
+# kept alive nor closed again.
+_live_handlers: weakref.WeakSet = weakref.WeakSet()
+
+
+def _after_fork_in_child() -> None:
+    for handler in list(_live_handlers):
+        handler._after_fork()
+
+
+def _close_live_handlers() -> None:
+    for handler in list(_live_handlers):
+        handler.close()
+
+
+if hasattr(os, "register_at_fork"):  # not on Windows
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+atexit.register(_close_live_handlers)
+
+
 class LogIndexerHandler(logging.Handler):
+    """Ship records to log_indexer from a background thread.
+
+    ``emit`` only appends to a bounded in-memory queue, so logging never
+    waits on the network. A daemon thread posts the queue to ``/log/batch``
+    every ``flush_interval`` seconds, or sooner once ``batch_size`` records
+    are waiting, over one pooled session.
+    """
+
+    def __init__(
+        self,
+        queue_size: int = QUEUE_SIZE,
+        batch_size: int = BATCH_SIZE,
+        flush_interval: float = FLUSH_INTERVAL,
+        drop_policy: str = DROP_POLICY,
+        spool: Spool | None = None,
+        replay_rate: float = REPLAY_RATE,
+        coalescer: Coalescer | None = None,
+        wire: str = WIRE_FORMAT,
+    ) -> None:
+        super().__init__()
+        if drop_policy not in ("drop_new", "drop_oldest"):
+            raise ValueError(f"unknown drop policy: {drop_policy}")
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.drop_policy = drop_policy
+        if spool is None and SPOOL_DIR:
+            spool = Spool(Path(SPOOL_DIR) / SERVICE_NAME)
+        self.spool = spool
+        self.replay_rate = replay_rate
+        if coalescer is None and (COALESCE_SECONDS or SAMPLE_RATES):
+            coalescer = Coalescer()
+        self.coalescer = coalescer
+        self.wire = wire
+        self.dropped = 0
+        self.sent = 0
+        self.failed = 0
+        self.replayed = 0
+        self._replaying: list | None = None
+        self._queue: collections.deque = collections.deque(
+            maxlen=queue_size if drop_policy == "drop_oldest" else None
+        )
+        self._wake = threading.Event()
+        self._idle = threading.Event()
+        self._idle.set()
+        self._stopping = False
+        self._thread: threading.Thread | None = None
+        self._start_lock = threading.Lock()
+        _live_handlers.add(self)
+
     def emit(self, record: logging.LogRecord) -> None:
-        if not LOG_INDEXER_URL:
+        if not LOG_INDEXER_URL or self._stopping:
+            return
+        if self.coalescer is not None and not self.coalescer.admit(record):
             return
-        log_entry = {
-            "timestamp": datetime.utcnow().isoformat(),
-            "level": record.levelname,
-            "service": SERVICE_NAME,
-            "message": record.getMessage(),
-        }
+        queue = self._queue
+        if len(queue) >= self.queue_size:
+            self.dropped += 1
+            if self.drop_policy == "drop_new":
+                return
+        # deque.append is atomic; the message is rendered now because the
+        # record's arguments may change before the shipper runs.
+        queue.append((record.created, record.levelname, record.getMessage()))
+        if self._thread is None:
+            self._start()
+        if len(queue) >= self.batch_size:
+            self._wake.set()
+
+    def _start(self) -> None:
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="log-shipper", daemon=True)
+                self._thread.start()
+
+    def _after_fork(self) -> None:
+        # Only the calling thread survives a fork; the child starts its own
+        # shipper on its first record.
+        self._thread = None
+        self._queue.clear()
+        self._start_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._idle = threading.Event()
+        self._idle.set()
+        if self.spool is not None:
+            # The parent keeps its segment locks; drop the inherited copies.
+            if self._replaying is not None:
+                os.close(self._replaying[1])
+                self._replaying = None
+            self.spool.close()
+
+    def _run(self) -> None:
+        delay = self.flush_interval
+        while True:
+            self._wake.wait(delay)
+            self._wake.clear()
+            stopping = self._stopping
+            self._drain()
+            if stopping:
+                return
+            delay = self._replay() if self.spool is not None else self.flush_interval
+
+    def _replay(self) -> float:
+        """Ship one batch from the spool; return the delay before the next."""
+        try:
+            batch = self._replay_batch()
+            if batch is None:
+                return self.flush_interval
+            if batch and not self._post(batch):
+                # Still down; keep the segment and try again later.
+                return self.flush_interval
+            self._replayed(batch)
+            return len(batch) / self.replay_rate
+        except OSError:
+            return self.flush_interval
+
+    def _replay_batch(self) -> list | None:
+        """Next spooled batch to send, claiming a segment if needed."""
+        if self._replaying is None:
+            claimed = self.spool.claim()
+            if claimed is None:
+                return None
+            self._replaying = [*claimed, 0]
+        _, _, entries, position = self._replaying
+        return entries[position:position + self.batch_size]
+
+    def _replayed(self, batch: list) -> None:
+        self.replayed += len(batch)
+        self._replaying[3] += len(batch)
+        path, fd, entries, position = self._replaying
+        if position >= len(entries):
+            self._replaying = None
+            self.spool.release(path, fd)
+
+    def _drain(self) -> None:
+        self._collect_repeats()
+        while self._queue:
+            self._idle.clear()
+            self._ship(self._take_batch())
+        self._idle.set()
+
+    def _collect_repeats(self) -> None:
+        if self.coalescer is not None:
+            with self.lock:
+                self._queue.extend(self.coalescer.collect(time.time(), everything=self._stopping))
+
+    def _take_batch(self) -> list:
+        queue = self._queue
+        batch = []
         try:
-            headers = {}
-            if LOG_INDEXER_TOKEN:
-                headers["Authorization"] = f"Bearer {LOG_INDEXER_TOKEN}"
-            _session.post(
-                f"{LOG_INDEXER_URL}/log", json=log_entry, timeout=5, headers=headers
-            )
+            while len(batch) < self.batch_size:
+                created, level, message = queue.popleft()
+                batch.append(
+                    {
+                        "timestamp": datetime.fromtimestamp(created, timezone.utc).isoformat(),
+                        "level": level,
+                        "service": SERVICE_NAME,
+                        "message": message,
+                    }
+                )
+        except IndexError:
+            pass
+        return batch
+
+    def _ship(self, entries: list) -> None:
+        if self._post(entries):
+            self.sent += len(entries)
+        else:
+            self._spool(entries)
+
+    def _spool(self, entries: list) -> None:
+        if self.spool is not None:
+            try:
+                self.spool.append(entries)
+                return
+            except OSError:
+                pass
+        self.failed += len(entries)
+
+    def _post(self, entries: list) -> bool:
+        try:
+            body, headers = encode_batch(entries, self.wire)
+            headers.update(_auth_headers())
+            response = _session.post(f"{LOG_INDEXER_URL}/log/batch", data=body, timeout=5, headers=headers)
+            response.raise_for_status()
+            return True
         except Exception:
             # Avoid crashing on logging errors
-            pass
+            return False
+
+    def flush(self, timeout: float = SHUTDOWN_TIMEOUT) -> None:
+        """Wait up to *timeout* seconds for queued records to be shipped."""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        deadline = time.monotonic() + timeout
+        while (self._queue or not self._idle.is_set()) and time.monotonic() < deadline:
+            self._idle.clear()
+            self._wake.set()
+            self._idle.wait(max(0.0, deadline - time.monotonic()))
+
+    def close(self) -> None:
+        _live_handlers.discard(self)
+        if not self._stopping:
+            self._stopping = True
+            thread = self._thread
+            if thread is not None and thread.is_alive():
+                self._wake.set()
+                thread.join(SHUTDOWN_TIMEOUT)
+            if thread is None or not thread.is_alive():
+                self._close_spool()
+        super().close()
+
+    def _close_spool(self) -> None:
+        if self.spool is not None:
+            if self._replaying is not None:
+                os.close(self._replaying[1])
+                self._replaying = None
+            self.spool.close()
+
+
+class _LoopWake:
+    """``asyncio.Event`` that may also be set from other threads."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.event = asyncio.Event()
+        self.thread = threading.get_ident()
+
+    def set(self) -> None:
+        if threading.get_ident() == self.thread:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(self.event.set)
+
 
+class AsyncLogIndexerHandler(LogIndexerHandler):
+    """Ship records from a task on the service's event loop.
 
-def setup_logging() -> logging.Logger:
-    """Configure and return a logger for the service."""
+    For asyncio services: ``emit`` is the same queue append, and the queue
+    is posted through one shared ``httpx.AsyncClient``, so a slow indexer
+    never stalls the loop. Records queue up until :meth:`start` runs on
+    the loop; :meth:`aclose` ships what is left. Use :func:`log_shipping`
+    as the app's lifespan to do both.
+    """
+
+    def __init__(self, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self._client = None
+
+    def _start(self) -> None:
+        # The shipper task is started by start() on the event loop.
+        pass
+
+    async def start(self, client=None) -> None:
+        import httpx
+
+        self._client = client or httpx.AsyncClient(timeout=5, headers=_auth_headers())
+        self._wake = _LoopWake(asyncio.get_running_loop())
+        self._stopping = False
+        self._thread = asyncio.create_task(self._run_async(), name="log-shipper")
+
+    async def _run_async(self) -> None:
+        event = self._wake.event
+        delay = self.flush_interval
+        while True:
+            try:
+                await asyncio.wait_for(event.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+            event.clear()
+            stopping = self._stopping
+            self._collect_repeats()
+            while self._queue:
+                entries = self._take_batch()
+                if await self._apost(entries):
+                    self.sent += len(entries)
+                elif self.spool is not None:
+                    await asyncio.to_thread(self._spool, entries)
+                else:
+                    self.failed += len(entries)
+            if stopping:
+                return
+            delay = await self._areplay() if self.spool is not None else self.flush_interval
+
+    async def _areplay(self) -> float:
+        try:
+            batch = await asyncio.to_thread(self._replay_batch)
+            if batch is None:
+                return self.flush_interval
+            if batch and not await self._apost(batch):
+                return self.flush_interval
+            await asyncio.to_thread(self._replayed, batch)
+            return len(batch) / self.replay_rate
+        except OSError:
+            return self.flush_interval
+
+    async def _apost(self, entries: list) -> bool:
+        try:
+            body, headers = encode_batch(entries, self.wire)
+            response = await self._client.post(f"{LOG_INDEXER_URL}/log/batch", content=body, headers=headers)
+            response.raise_for_status()
+            return True
+        except Exception:
+            # Avoid crashing on logging errors
+            return False
+
+    async def aclose(self, timeout: float = SHUTDOWN_TIMEOUT) -> None:
+        """Ship the queued records and stop the shipper task."""
+        task = self._thread
+        if task is not None and not task.done():
+            self._stopping = True
+            self._wake.set()
+            try:
+                await asyncio.wait_for(task, timeout)
+            except asyncio.TimeoutError:
+                pass
+        self._thread = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        self._close_spool()
+
+    def flush(self, timeout: float = SHUTDOWN_TIMEOUT) -> None:
+        # Shipping happens on the event loop; see aclose().
+        pass
+
+    def close(self) -> None:
+        _live_handlers.discard(self)
+        self._stopping = True
+        logging.Handler.close(self)
+
+
+def encode_batch(entries: list, wire: str = WIRE_FORMAT) -> tuple:
+    """Return the request body and headers for *entries* in format *wire*."""
+    form, _, compression = wire.partition("+")
+    if form == "msgpack" and msgpack is not None:
+        body = msgpack.packb(entries)
+        headers = {"Content-Type": "application/msgpack"}
+    else:
+        body = json.dumps(entries, separators=(",", ":")).encode()
+        headers = {"Content-Type": "application/json"}
+    if compression == "gzip":
+        body = gzip.compress(body, compresslevel=6)
+        headers["Content-Encoding"] = "gzip"
+    return body, headers
+
+
+def _auth_headers() -> dict:
+    if LOG_INDEXER_TOKEN:
+        return {"Authorization": f"Bearer {LOG_INDEXER_TOKEN}"}
+    return {}
+
+
+def setup_logging(transport: str = "thread") -> logging.Logger:
+    """Configure and return a logger for the service.
+
+    Async services pass ``transport="asyncio"`` and use :func:`log_shipping`
+    as their lifespan.
+    """
     logger = logging.getLogger(SERVICE_NAME)
     if not logger.handlers:
         logger.setLevel(logging.INFO)
-        logger.addHandler(LogIndexerHandler())
+        if transport == "asyncio":
+            logger.addHandler(AsyncLogIndexerHandler())
+        else:
+            logger.addHandler(LogIndexerHandler())
     return logger
+
+
+@contextlib.asynccontextmanager
+async def log_shipping(app=None):
+    """Lifespan running the asyncio log shipper alongside the app."""
+    handlers = [
+        handler
+        for handler in logging.getLogger(SERVICE_NAME).handlers
+        if isinstance(handler, AsyncLogIndexerHandler)
+    ]
+    for handler in handlers:
+        await handler.start()
+    try:
+        yield
+    finally:
+        for handler in handlers:
+            await handler.aclose()
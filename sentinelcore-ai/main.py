@@ -1,10 +1,10 @@
 from fastapi import FastAPI, HTTPException
 import httpx
 import asyncio
-from logging_config import setup_logging, load_env
+from logging_config import log_shipping, setup_logging, load_env
 
-app = FastAPI()
-logger = setup_logging()
+app = FastAPI(lifespan=log_shipping)
+logger = setup_logging(transport="asyncio")
 
 INCIDENT_MANAGER_URL = load_env("INCIDENT_MANAGER_URL")
 
@@ -1,34 +1,27 @@
+import asyncio
 import importlib
+import json
 import os
 
 import httpx
 from fastapi.testclient import TestClient
 
 
-class DummyResponse:
-    def __init__(self):
-        self.status_code = 200
-    def raise_for_status(self):
-        pass
-
-
 def setup_module(module):
     os.environ.setdefault("ORCHESTRATOR_URL", "http://orchestrator/alert")
     os.environ.setdefault("LOG_INDEXER_URL", "http://indexer/log")
     os.environ.setdefault("LOG_INDEXER_TOKEN", "token")
 
 
-def test_anomaly_triggers_alert(monkeypatch):
+def test_anomaly_triggers_alert():
     calls = []
 
-    def fake_post(url, json=None, headers=None, timeout=None):
-        calls.append((url, json, headers))
-        return DummyResponse()
-
-    monkeypatch.setattr(httpx, "post", fake_post)
+    def handler(request):
+        calls.append((str(request.url), json.loads(request.content), request.headers))
+        return httpx.Response(200)
 
     mod = importlib.reload(importlib.import_module("behavior_analytics.app.main"))
-    client = TestClient(mod.app)
+    mod.outbound.transport = httpx.MockTransport(handler)
 
     event = {
         "timestamp": "2024-01-01T00:00:00Z",
@@ -36,23 +29,24 @@ def test_anomaly_triggers_alert(monkeypatch):
         "service": "auth",
         "message": "failed login"
     }
-    resp = client.post("/event", json=event)
+    with TestClient(mod.app) as client:
+        resp = client.post("/event", json=event)
     assert resp.status_code == 200
     assert resp.json()["anomalous"] is True
     alert_calls = [c for c in calls if c[0] == os.environ["ORCHESTRATOR_URL"]]
     assert alert_calls, "alert not sent"
     alert_payload = alert_calls[0][1]
     assert "risk_score" in alert_payload and "summary" in alert_payload
+    indexer_calls = [c for c in calls if c[0] == os.environ["LOG_INDEXER_URL"]]
+    assert indexer_calls[0][2]["authorization"] == "Bearer token"
 
 
-def test_health_survives_alert_failure(monkeypatch):
-    def failing_post(url, json=None, headers=None, timeout=None):
-        raise httpx.HTTPError("boom")
-
-    monkeypatch.setattr(httpx, "post", failing_post)
+def test_health_survives_alert_failure():
+    def handler(request):
+        raise httpx.ConnectError("boom")
 
     mod = importlib.reload(importlib.import_module("behavior_analytics.app.main"))
-    client = TestClient(mod.app)
+    mod.outbound.transport = httpx.MockTransport(handler)
 
     event = {
         "timestamp": "2024-01-01T00:00:00Z",
@@ -60,9 +54,169 @@ def test_health_survives_alert_failure(monkeypatch):
         "service": "auth",
         "message": "failed login"
     }
-    # Should not raise even if posting fails
-    resp = client.post("/event", json=event)
-    assert resp.status_code == 200
-    health = client.get("/health")
-    assert health.status_code == 200
-    assert health.json()["status"] == "ok"
+    with TestClient(mod.app) as client:
+        # Should not raise even if posting fails
+        resp = client.post("/event", json=event)
+        assert resp.status_code == 200
+        health = client.get("/health")
+        assert health.status_code == 200
+        assert health.json()["status"] == "ok"
+
+
+def test_outbound_bounds_concurrency_and_backlog():
+    from behavior_analytics.app.outbound import Outbound
+
+    active = []
+    peak = []
+
+    async def handler(request):
+        active.append(1)
+        peak.append(len(active))
+        await asyncio.sleep(0.01)
+        active.pop()
+        return httpx.Response(200)
+
+    async def scenario():
+        outbound = Outbound(concurrency=2, max_pending=5, transport=httpx.MockTransport(handler))
+        results = await asyncio.gather(*(outbound.post("http://downstream/") for _ in range(8)))
+        await outbound.aclose()
+        return outbound, results
+
+    outbound, results = asyncio.run(scenario())
+    assert max(peak) == 2
+    assert sum(r is None for r in results) == outbound.dropped == 3
+
+
+def test_event_batch_scores_in_order_and_groups_alerts():
+    calls = []
+
+    def handler(request):
+        calls.append((str(request.url), json.loads(request.content)))
+        return httpx.Response(200)
+
+    mod = importlib.reload(importlib.import_module("behavior_analytics.app.main"))
+    mod.outbound.transport = httpx.MockTransport(handler)
+    events = [
+        {"timestamp": "2024-01-01T00:00:00Z", "level": "INFO", "service": "auth", "message": "login ok"},
+        {"timestamp": "2024-01-01T00:00:01Z", "level": "INFO", "service": "auth", "message": "Login FAILED"},
+        {"timestamp": "2024-01-01T00:00:02Z", "level": "critical", "service": "db", "message": "disk"},
+    ]
+    with TestClient(mod.app) as client:
+        resp = client.post("/events", json=events)
+        ndjson = client.post(
+            "/events",
+            headers={"Content-Type": "application/x-ndjson"},
+            content="\n".join(json.dumps(event) for event in events[:2]),
+        )
+        invalid = client.post("/events", json=[events[0], {"level": "INFO"}])
+    assert resp.json()["anomalous"] == [False, True, True]
+    assert resp.json()["risk"][0] == 0.0 and 0 < resp.json()["risk"][1] < 0.5
+    assert ndjson.json()["anomalous"] == [False, True]
+    assert invalid.status_code == 422 and invalid.json()["detail"][0]["loc"][0] == 1
+    groups = [payload for url, payload in calls if url == os.environ["ORCHESTRATOR_URL"]]
+    assert [len(group["alerts"]) for group in groups] == [2, 1]
+    assert groups[0]["summary"] == "2 suspicious events detected"
+    assert [a["event"]["service"] for a in groups[0]["alerts"]] == ["auth", "db"]
+
+
+def test_detector_scores_bursts_against_the_baseline():
+    from behavior_analytics.app.detector import RateDetector
+
+    detector = RateDetector(bucket_seconds=10, buckets=6, alpha=0.1)
+    # Ten minutes of a steady failure every 10 seconds.
+    steady = [detector.observe("auth", t) for t in range(0, 600, 10)]
+    assert steady[-1] < 0.2
+    burst = [detector.observe("auth", 600 + i * 0.1) for i in range(30)]
+    assert burst[-1] > 0.99 and burst == sorted(burst)
+    # Other keys have their own baseline.
+    assert detector.observe("billing", 605) < 0.2
+    # After a long quiet spell the window is empty again.
+    assert detector.observe("auth", 100_000) < 0.2
+
+
+def test_detector_state_is_bounded():
+    from behavior_analytics.app.detector import RateDetector
+
+    detector = RateDetector(max_keys=100)
+    for i in range(1000):
+        detector.observe(("svc", f"user-{i}"), 0)
+    assert len(detector) == 100 and detector.evicted == 900
+    assert len(detector._states[("svc", "user-999")].counts) == detector.buckets
+
+
+def test_failed_login_burst_raises_alert_risk():
+    calls = []
+
+    def handler(request):
+        calls.append((str(request.url), json.loads(request.content)))
+        return httpx.Response(200)
+
+    mod = importlib.reload(importlib.import_module("behavior_analytics.app.main"))
+    mod.outbound.transport = httpx.MockTransport(handler)
+    events = [
+        {"timestamp": f"2024-01-01T00:00:{i:02d}Z", "level": "WARNING", "service": "auth",
+         "entity": "alice", "message": "login failed"}
+        for i in range(20)
+    ]
+    with TestClient(mod.app) as client:
+        risks = [client.post("/event", json=event).json()["risk_score"] for event in events]
+        other = client.post("/event", json={**events[-1], "entity": "bob"}).json()["risk_score"]
+    assert risks[0] < 0.2 and risks[-1] > 0.99
+    assert other < 0.2
+    alerts = [payload for url, payload in calls if url == os.environ["ORCHESTRATOR_URL"]]
+    assert alerts[-2]["risk_score"] == risks[-1]
+
+
+def test_rules_match_literals_patterns_and_predicates():
+    from behavior_analytics.app.rules import AhoCorasick, CompiledRules, Rule, literal_anchor
+
+    assert AhoCorasick(["he", "she", "hers", "his"]).search("ushers") == {0, 1, 2}
+    assert literal_anchor(r"token [a-f0-9]{8} expired") == " expired"
+    assert literal_anchor(r"(?i)DROP\s+TABLE") == "table"
+    assert literal_anchor(r"root|admin") is None
+    # Escapes with operands break a run rather than leaking their digits.
+    for pattern in (r"foo\x41bar", r"foo\101bar", r"foo\u0041bar", r"foo\N{LATIN CAPITAL LETTER A}bar"):
+        assert literal_anchor(pattern) in ("foo", "bar")
+        assert [rule.id for rule in CompiledRules([Rule(id="a", pattern=pattern)]).match("INFO", "s", "fooAbar")] == ["a"]
+    compiled = CompiledRules([
+        Rule(id="sudo", literal="SUDO", services=["auth"]),
+        Rule(id="drop", pattern=r"drop\s+table \w+"),
+        Rule(id="ip", pattern=r"\d+\.\d+\.\d+\.\d+"),
+        Rule(id="critical", levels=["critical"], score=0.9),
+    ])
+    ids = lambda *event: [rule.id for rule in compiled.match(*event)]
+    assert ids("INFO", "auth", "sudo session opened") == ["sudo"]
+    assert ids("INFO", "billing", "sudo session opened") == []
+    assert ids("INFO", "db", "DROP  TABLE users") == ["drop"]
+    assert ids("INFO", "db", "drop the table") == []
+    assert ids("CRITICAL", "net", "blocked 10.0.0.1") == ["ip", "critical"]
+    # Backreferences keep pointing at their own pattern's groups.
+    backrefs = CompiledRules([Rule(id="xx", pattern=r"(x)\1"), Rule(id="yy", pattern=r"(y)\1")])
+    assert [rule.id for rule in backrefs.match("INFO", "s", "yy")] == ["yy"]
+    assert [rule.id for rule in backrefs.match("INFO", "s", "xy")] == []
+
+
+def test_rules_hot_reload_and_raise_risk(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps([{"id": "exfil", "literal": "exfiltration", "score": 0.8}]))
+    os.environ["RULES_FILE"] = str(path)
+    try:
+        mod = importlib.reload(importlib.import_module("behavior_analytics.app.main"))
+    finally:
+        del os.environ["RULES_FILE"]
+    mod.outbound.transport = httpx.MockTransport(lambda request: httpx.Response(200))
+    event = {"timestamp": "2024-01-01T00:00:00Z", "level": "INFO", "service": "net", "message": "exfiltration suspected"}
+    with TestClient(mod.app) as client:
+        resp = client.post("/event", json=event).json()
+        assert resp["anomalous"] is True and resp["risk_score"] >= 0.8
+        assert client.post("/event", json={**event, "message": "login failed"}).json()["anomalous"] is False
+
+        path.write_text(json.dumps({"rules": [{"id": "failed", "literal": "failed"}]}))
+        os.utime(path, ns=(0, 1))
+        assert mod.rules.reload_if_changed()
+        assert client.post("/event", json={**event, "message": "login failed"}).json()["anomalous"] is True
+        # An invalid file keeps the rules in force.
+        path.write_text(json.dumps([{"id": "bad", "pattern": "("}]))
+        os.utime(path, ns=(0, 2))
+        assert not mod.rules.reload_if_changed()
+        assert [rule.id for rule in mod.rules.compiled.rules] == ["failed"]
@@ -0,0 +1,41 @@
+import importlib
+import sys
+import threading
+from pathlib import Path as _Path
+sys.path.insert(0, str(_Path(__file__).resolve().parents[1]))
+from fastapi.testclient import TestClient
+
+
+def test_ingest_over_budget_gets_429_while_health_answers(tmp_path, monkeypatch):
+    monkeypatch.setenv('LOG_INDEXER_DATA_DIR', str(tmp_path))
+    monkeypatch.setenv('LOG_INDEXER_INGEST_MAX_IN_FLIGHT', '1')
+    monkeypatch.setenv('LOG_INDEXER_RETRY_AFTER', '3')
+    for name in ('LOG_INDEXER_TOKEN', 'LOG_INDEXER_PARTITION', 'LOG_INDEXER_WRITER_SOCKET'):
+        monkeypatch.delenv(name, raising=False)
+    mod = importlib.reload(importlib.import_module('log_indexer.app.main'))
+    client = TestClient(mod.app)
+    entered, release = threading.Event(), threading.Event()
+    add_log = mod.dao.add_log
+
+    def slow_add_log(entry, wait=False):
+        entered.set()
+        release.wait(10)
+        return add_log(entry, wait=wait)
+
+    monkeypatch.setattr(mod.dao, 'add_log', slow_add_log)
+    payload = {'timestamp': '2024-01-01T00:00:00Z', 'level': 'INFO', 'service': 's', 'message': 'm'}
+    first = {}
+    thread = threading.Thread(target=lambda: first.update(r=client.post('/log', json=payload)))
+    thread.start()
+    assert entered.wait(10)
+    rejected = client.post('/log/batch', json=[payload])
+    assert rejected.status_code == 429 and rejected.headers['Retry-After'] == '3'
+    assert client.get('/health').status_code == 200
+    assert client.get('/metrics').json()['ingest_in_flight'] == 1
+    release.set()
+    thread.join(10)
+    assert first['r'].status_code == 201
+    metrics = client.get('/metrics').json()
+    assert (metrics['ingest_in_flight'], metrics['ingest_rejected'], metrics['health_rejected']) == (0, 1, 0)
+    assert client.post('/log/batch', json=[{**payload, 'message': 'n'}]).status_code == 201
+    mod.dao.close()
@@ -0,0 +1,110 @@
+import importlib
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path as _Path
+sys.path.insert(0, str(_Path(__file__).resolve().parents[1]))
+import pytest
+from fastapi.testclient import TestClient
+from log_indexer.app import manage
+from log_indexer.app.archive import Segment, SegmentArchive
+from log_indexer.app.dao import LogDAO
+from log_indexer.app.models import LogEntry
+from log_indexer.app.partitions import PartitionedLogDAO
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def make_entries(count, hours=1):
+    return [
+        LogEntry(
+            timestamp=START + timedelta(hours=hours * i / count),
+            level='ERROR' if i % 4 == 0 else 'INFO',
+            service=f'svc-{i % 3}',
+            message=f'message {i}',
+            hash=f'hash-{i}',
+        )
+        for i in range(count)
+    ]
+
+
+def read_all(store, **filters):
+    cursor, seen = None, []
+    while True:
+        page, cursor = store.query_page(limit=13, cursor=cursor, **filters)
+        seen.extend(page)
+        if cursor is None:
+            return seen
+
+
+@pytest.mark.parametrize('codec', ['zlib', 'lzma'])
+def test_archived_rows_still_answer_queries(tmp_path, codec):
+    archive = SegmentArchive(tmp_path / 'archive', codec=codec, segment_rows=40)
+    dao = LogDAO(tmp_path / 'logs.db', archive=archive, cache_bytes=1 << 20)
+    entries = make_entries(120)
+    dao.add_logs(entries)
+    filters = [{}, {'service': 'svc-1'}, {'level': 'ERROR', 'since': START + timedelta(minutes=20)}]
+    before = [read_all(dao, **f) for f in filters]
+    assert dao.archive_before(START + timedelta(minutes=30)) == 60
+    assert len(archive.segments) == 2
+    assert dao._conn.execute('SELECT COUNT(*) FROM logs').fetchone()[0] == 60
+    assert [read_all(dao, **f) for f in filters] == before
+    exported = [row for rows in dao.iter_rows() for row in rows]
+    assert sorted(row['hash'] for row in exported) == sorted(e.hash for e in entries)
+    assert dao.stats(interval='total', group_by=[]) == [{'count': 120}]
+    dao.close()
+    # Segments are immutable files and survive a restart.
+    reopened = LogDAO(tmp_path / 'logs.db', archive=SegmentArchive(tmp_path / 'archive', codec=codec))
+    assert read_all(reopened) == before[0]
+    reopened.close()
+
+
+def test_footers_skip_segments_outside_the_range(tmp_path, monkeypatch):
+    archive = SegmentArchive(tmp_path / 'archive', segment_rows=30)
+    archive.append([(i, f'2024-01-01T00:{i:02d}:00+00:00', 'INFO', 'svc', 'm', f'h{i}') for i in range(60)])
+    first, second = archive.segments
+    assert (first.min_ts, first.max_ts) == ('2024-01-01T00:00:00+00:00', '2024-01-01T00:29:00+00:00')
+    read, original = [], Segment.read
+
+    def spy(self, names):
+        read.append(self)
+        return original(self, names)
+
+    monkeypatch.setattr(Segment, 'read', spy)
+    rows = archive.fetch_rows(since='2024-01-01T00:45:00+00:00')
+    assert [row['id'] for row in rows] == list(range(45, 60))
+    assert set(read) == {second}
+    assert archive.fetch_rows(service='other') == []
+
+
+def test_interrupted_run_is_reconciled(tmp_path):
+    archive = SegmentArchive(tmp_path / 'archive')
+    dao = LogDAO(tmp_path / 'logs.db', archive=archive)
+    dao.add_logs(make_entries(10))
+    rows = dao._conn.execute(f'SELECT {dao.layout.columns} FROM logs ORDER BY id LIMIT 4').fetchall()
+    # Simulate a crash after the segment was written but before the delete.
+    archive.append([tuple(row) for row in rows])
+    assert len(dao.query_logs()) == 14
+    assert dao.archive_before(START) == 0
+    assert len(dao.query_logs()) == 10
+    dao.close()
+
+
+def test_partitioned_archive_and_manage_command(tmp_path, monkeypatch):
+    monkeypatch.setenv('LOG_INDEXER_DATA_DIR', str(tmp_path))
+    monkeypatch.setenv('LOG_INDEXER_PARTITION', 'day')
+    monkeypatch.delenv('LOG_INDEXER_TOKEN', raising=False)
+    monkeypatch.delenv('LOG_INDEXER_RETENTION_DAYS', raising=False)
+    store = PartitionedLogDAO(tmp_path, period='day')
+    store.add_logs(make_entries(48, hours=48))
+    store.close()
+    manage.main(['--data-dir', str(tmp_path), 'archive', '--older-than-days', '1'])
+    assert sorted(p.name for p in tmp_path.glob('logs-*.db')) == []
+    mod = importlib.reload(importlib.import_module('log_indexer.app.main'))
+    monkeypatch.setattr(mod, 'EXPORT_DIR', tmp_path / 'export')
+    client = TestClient(mod.app)
+    logs = client.get('/query', params={'since': '2024-01-02T00:00:00Z', 'service': 'svc-0'}).json()
+    assert len(logs) == 8
+    assert client.get('/query', params={'format': 'json', 'limit': 5}).json()[0]['message'] == 'message 0'
+    version = client.get('/export', params={'format': 'json'}).json()
+    assert len(version['logs']) == 48
+    mod.dao.close()
@@ -0,0 +1,96 @@
+import os
+import gzip
+import json
+import importlib
+import importlib.util
+import sys
+from datetime import datetime, timezone
+from pathlib import Path as _Path
+ROOT = _Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+import pytest
+from fastapi.testclient import TestClient
+
+
+def _client(tmp_path, monkeypatch):
+    monkeypatch.setenv('LOG_INDEXER_DATA_DIR', str(tmp_path))
+    monkeypatch.setenv('LOG_INDEXER_TOKEN', 'secret')
+    mod = importlib.reload(importlib.import_module('log_indexer.app.main'))
+    return mod, TestClient(mod.app)
+
+
+def test_batch_accepts_json_array_and_reports_per_entry(tmp_path, monkeypatch):
+    mod, client = _client(tmp_path, monkeypatch)
+    entries = [
+        {'timestamp': '2024-01-01T00:00:00Z', 'level': 'INFO', 'service': 'test', 'message': 'one'},
+        {'timestamp': 'not-a-date', 'level': 'INFO', 'service': 'test', 'message': 'bad'},
+        {'timestamp': '2024-01-01T00:00:01Z', 'level': 'INFO', 'service': 'test', 'message': 'two'},
+    ]
+    resp = client.post('/log/batch', json=entries)
+    assert resp.status_code == 401
+    resp = client.post('/log/batch', headers={'Authorization': 'Bearer secret'}, json=entries)
+    assert resp.status_code == 201
+    body = resp.json()
+    assert body['accepted'] == 2 and body['rejected'] == 1
+    assert [r['status'] for r in body['results']] == ['ok', 'error', 'ok']
+    assert len(body['results'][0]['hash']) == 64
+    assert [log['message'] for log in client.get('/query').json()] == ['one', 'two']
+    mod.dao._conn.close()
+
+
+def test_batch_accepts_ndjson(tmp_path, monkeypatch):
+    mod, client = _client(tmp_path, monkeypatch)
+    lines = '\n'.join(
+        json.dumps({'timestamp': '2024-01-01T00:00:00Z', 'level': 'INFO', 'service': 'test', 'message': f'm{i}'})
+        for i in range(100)
+    )
+    resp = client.post(
+        '/log/batch',
+        headers={'Authorization': 'Bearer secret', 'Content-Type': 'application/x-ndjson'},
+        content=lines,
+    )
+    assert resp.status_code == 201
+    assert resp.json()['accepted'] == 100
+    assert len(client.get('/query').json()) == 100
+    mod.dao._conn.close()
+
+
+@pytest.mark.parametrize('wire', ['json+gzip', 'msgpack', 'msgpack+gzip'])
+def test_batch_accepts_shipper_wire_formats(tmp_path, monkeypatch, wire):
+    pytest.importorskip('msgpack')
+    mod, client = _client(tmp_path, monkeypatch)
+    spec = importlib.util.spec_from_file_location('shipper_config', ROOT / 'scripts' / 'logging_config_template.py')
+    shipper = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(shipper)
+    entries = [
+        {'timestamp': f'2024-01-01T00:00:0{i}+00:00', 'level': 'INFO', 'service': 'test', 'message': f'm{i}'}
+        for i in range(3)
+    ]
+    body, headers = shipper.encode_batch(entries, wire)
+    assert ('Content-Encoding' in headers) == wire.endswith('+gzip')
+    resp = client.post('/log/batch', headers={**headers, 'Authorization': 'Bearer secret'}, content=body)
+    assert resp.status_code == 201 and resp.json()['accepted'] == 3
+    assert [log['message'] for log in client.get('/query').json()] == ['m0', 'm1', 'm2']
+    mod.dao._conn.close()
+
+
+def test_single_entry_accepts_gzip_msgpack_and_bounds_bodies(tmp_path, monkeypatch):
+    msgpack = pytest.importorskip('msgpack')
+    mod, client = _client(tmp_path, monkeypatch)
+    auth = {'Authorization': 'Bearer secret'}
+    entry = {'timestamp': datetime(2024, 1, 1, tzinfo=timezone.utc), 'level': 'INFO', 'service': 'test', 'message': 'packed'}
+    resp = client.post(
+        '/log',
+        headers={**auth, 'Content-Type': 'application/msgpack', 'Content-Encoding': 'gzip'},
+        content=gzip.compress(msgpack.packb(entry, datetime=True)),
+    )
+    assert resp.status_code == 201 and resp.json()['duplicate'] is False
+    assert client.get('/query').json()[0]['timestamp'] == '2024-01-01T00:00:00Z'
+    resp = client.post('/log', headers=auth, json={'level': 'INFO'})
+    assert resp.status_code == 422
+    monkeypatch.setattr(mod, 'MAX_BODY_BYTES', 1024)
+    bomb = gzip.compress(b'[' + b' ' * 10_000 + b']')
+    assert client.post('/log/batch', headers={**auth, 'Content-Encoding': 'gzip'}, content=bomb).status_code == 413
+    assert client.post('/log/batch', headers={**auth, 'Content-Encoding': 'br'}, content=b'[]').status_code == 415
+    assert client.post('/log', headers={**auth, 'Content-Encoding': 'gzip'}, content=b'not gzip').status_code == 400
+    mod.dao._conn.close()
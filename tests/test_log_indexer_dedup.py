@@ -0,0 +1,56 @@
+import importlib
+import sqlite3
+import sys
+from datetime import datetime
+from pathlib import Path as _Path
+sys.path.insert(0, str(_Path(__file__).resolve().parents[1]))
+from fastapi.testclient import TestClient
+from log_indexer.app.bloom import BloomFilter
+from log_indexer.app.dao import LogDAO
+from log_indexer.app.models import LogEntry
+
+
+def test_retried_entries_are_stored_once(tmp_path, monkeypatch):
+    monkeypatch.setenv('LOG_INDEXER_DATA_DIR', str(tmp_path))
+    monkeypatch.delenv('LOG_INDEXER_TOKEN', raising=False)
+    monkeypatch.delenv('LOG_INDEXER_PARTITION', raising=False)
+    mod = importlib.reload(importlib.import_module('log_indexer.app.main'))
+    client = TestClient(mod.app)
+    payload = {'timestamp': '2024-01-01T00:00:00Z', 'level': 'INFO', 'service': 'test', 'message': 'hello'}
+    assert client.post('/log', json=payload).json() == {'status': 'ok', 'duplicate': False}
+    assert client.post('/log', json=payload).json() == {'status': 'ok', 'duplicate': True}
+    other = {**payload, 'message': 'other'}
+    body = client.post('/log/batch', json=[payload, other, other]).json()
+    assert body['accepted'] == 3 and body['duplicates'] == 2
+    assert [log['message'] for log in client.get('/query').json()] == ['hello', 'other']
+    assert client.get('/metrics').json()['duplicates_dropped'] == 3
+    mod.dao.close()
+
+
+def test_existing_duplicates_are_collapsed_on_open(tmp_path):
+    db = tmp_path / 'logs.db'
+    dao = LogDAO(db)
+    dao.close()
+    conn = sqlite3.connect(db)
+    conn.execute('DROP INDEX idx_logs_hash')
+    conn.executemany(
+        'INSERT INTO logs (timestamp, level, service, message, hash) VALUES (?, ?, ?, ?, ?)',
+        [('2024-01-01T00:00:00', 'INFO', 'svc', 'retry', 'same')] * 3,
+    )
+    conn.commit()
+    conn.close()
+    dao = LogDAO(db)
+    assert len(dao.query_logs()) == 1
+    assert dao.stats(interval='total') == [{'service': 'svc', 'level': 'INFO', 'count': 1}]
+    assert dao.add_log(LogEntry(timestamp=datetime(2024, 1, 1), level='INFO', service='svc', message='retry', hash='same')) == 0
+    dao.close()
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(capacity=1000)
+    values = [f'value-{i}' for i in range(1000)]
+    for value in values:
+        bloom.add(value)
+    assert all(bloom.might_contain(v) for v in values)
+    false_positives = sum(bloom.might_contain(f'other-{i}') for i in range(10000))
+    assert false_positives < 300
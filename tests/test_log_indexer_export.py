@@ -0,0 +1,87 @@
+import csv
+import hashlib
+import importlib
+import io
+import sys
+from pathlib import Path as _Path
+sys.path.insert(0, str(_Path(__file__).resolve().parents[1]))
+from fastapi.testclient import TestClient
+
+
+def _client(tmp_path, monkeypatch):
+    monkeypatch.setenv('LOG_INDEXER_DATA_DIR', str(tmp_path))
+    monkeypatch.delenv('LOG_INDEXER_TOKEN', raising=False)
+    mod = importlib.reload(importlib.import_module('log_indexer.app.main'))
+    monkeypatch.setattr(mod, 'EXPORT_DIR', tmp_path / 'export')
+    client = TestClient(mod.app)
+    entries = [
+        {'timestamp': '2024-01-01T00:00:00', 'level': 'INFO', 'service': 'test', 'message': f'm{i}, "quoted"'}
+        for i in range(2500)
+    ]
+    assert client.post('/log/batch', json=entries).status_code == 201
+    return mod, client
+
+
+def test_json_export_streams_with_integrity_trailer(tmp_path, monkeypatch):
+    mod, client = _client(tmp_path, monkeypatch)
+    resp = client.get('/export')
+    assert resp.status_code == 200
+    body = resp.json()
+    version = resp.headers['X-Export-Version']
+    assert body['version'] == version
+    assert len(body['logs']) == 2500 and body['logs'][0]['message'] == 'm0, "quoted"'
+    saved = (tmp_path / 'export' / f'logs_{version}.json').read_bytes()
+    assert body['integrity']['hash'] == hashlib.sha256(saved).hexdigest()
+    assert client.get(f'/export/{version}/metadata').json() == body['integrity']
+    mod.dao.close()
+
+
+def test_csv_export_hash_matches_body(tmp_path, monkeypatch):
+    mod, client = _client(tmp_path, monkeypatch)
+    resp = client.get('/export', params={'format': 'csv'})
+    assert resp.status_code == 200
+    rows = list(csv.reader(io.StringIO(resp.text)))
+    assert rows[0] == ['timestamp', 'level', 'service', 'message', 'hash']
+    assert len(rows) == 2501
+    meta = client.get(f"/export/{resp.headers['X-Export-Version']}/metadata").json()
+    assert meta['hash'] == hashlib.sha256(resp.content).hexdigest()
+    assert client.get('/export/..%2Fsecret/metadata').status_code in (400, 404)
+    mod.dao.close()
+
+
+def test_exports_in_the_same_second_do_not_share_a_partial_file(tmp_path, monkeypatch):
+    mod, client = _client(tmp_path, monkeypatch)
+    version = '20240101T000000Z'
+    first, second = mod.stream_export('csv', version), mod.stream_export('csv', version)
+    bodies = [[next(first)], [next(second)]]
+    assert len(list((tmp_path / 'export').glob('*.partial'))) == 2
+    bodies[0].extend(first)
+    bodies[1].extend(second)
+    assert bodies[0] == bodies[1] and len(b''.join(bodies[0]).splitlines()) == 2501
+    saved = (tmp_path / 'export' / f'logs_{version}.csv').read_bytes()
+    assert saved == b''.join(bodies[0])
+    assert not list((tmp_path / 'export').glob('*.partial'))
+    mod.dao.close()
+
+
+def test_exports_in_the_same_second_get_distinct_versions(tmp_path, monkeypatch):
+    from datetime import datetime
+
+    mod, client = _client(tmp_path, monkeypatch)
+
+    class FrozenClock(datetime):
+        @classmethod
+        def utcnow(cls):
+            return datetime(2024, 1, 1, 12, 0, 0)
+
+    monkeypatch.setattr(mod, 'datetime', FrozenClock)
+    first = client.get('/export', params={'format': 'csv'})
+    client.post('/log', json={'timestamp': '2024-01-02T00:00:00', 'level': 'INFO', 'service': 'test', 'message': 'late'})
+    second = client.get('/export', params={'format': 'csv'})
+    versions = [first.headers['X-Export-Version'], second.headers['X-Export-Version']]
+    assert versions[0] != versions[1] and all(v.startswith('20240101T120000Z-') for v in versions)
+    for version, resp in zip(versions, (first, second)):
+        meta = client.get(f'/export/{version}/metadata').json()
+        assert meta['hash'] == hashlib.sha256(resp.content).hexdigest()
+        assert (tmp_path / 'export' / f'logs_{version}.csv').read_bytes() == resp.content
+    mod.dao.close()
@@ -0,0 +1,48 @@
+import sqlite3
+import sys
+import threading
+from datetime import datetime
+from pathlib import Path as _Path
+sys.path.insert(0, str(_Path(__file__).resolve().parents[1]))
+from log_indexer.app.dao import LogDAO
+from log_indexer.app.models import LogEntry
+
+
+def _entry(i):
+    return LogEntry(timestamp=datetime(2024, 1, 1), level='INFO', service='test', message=f'm{i}', hash=f'h{i}')
+
+
+def test_group_commit_uses_wal_and_commits_concurrent_writes(tmp_path):
+    db = tmp_path / 'logs.db'
+    dao = LogDAO(db, group_commit=True, batch_size=50, flush_interval=0.01)
+
+    def worker(start):
+        for i in range(start, start + 100):
+            dao.add_log(_entry(i))
+
+    threads = [threading.Thread(target=worker, args=(n * 100,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    dao.flush()
+
+    other = sqlite3.connect(db)
+    assert other.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    assert other.execute('SELECT COUNT(*) FROM logs').fetchone()[0] == 400
+    other.close()
+    dao.close()
+
+
+def test_wait_makes_write_visible_on_return(tmp_path):
+    db = tmp_path / 'logs.db'
+    dao = LogDAO(db, group_commit=True, flush_interval=0.2)
+    dao.add_logs([_entry(1), _entry(2)], wait=True)
+    other = sqlite3.connect(db)
+    assert other.execute('SELECT COUNT(*) FROM logs').fetchone()[0] == 2
+    other.close()
+    dao.add_log(_entry(3))
+    dao.close()
+    reopened = LogDAO(db)
+    assert reopened.query_logs()[-1].message == 'm3'
+    reopened.close()
@@ -0,0 +1,102 @@
+import importlib
+import multiprocessing
+import os
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path as _Path
+ROOT = _Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+from fastapi.testclient import TestClient
+from log_indexer.app.dao import LogDAO
+from log_indexer.app.ipc import RemoteLogStore, WriterClient, WriterServer
+from log_indexer.app.models import LogEntry
+
+
+def test_workers_forward_writes_and_read_locally(tmp_path, monkeypatch):
+    for name in ('LOG_INDEXER_TOKEN', 'LOG_INDEXER_PARTITION', 'LOG_INDEXER_WRITE_MODE'):
+        monkeypatch.delenv(name, raising=False)
+    socket_path = tmp_path / 'writer.sock'
+    store = LogDAO(tmp_path / 'logs.db')
+    server = WriterServer(store, socket_path)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setenv('LOG_INDEXER_DATA_DIR', str(tmp_path))
+    monkeypatch.setenv('LOG_INDEXER_WRITER_SOCKET', str(socket_path))
+    # Import afresh so exactly one worker store connects to the writer.
+    sys.modules.pop('log_indexer.app.main', None)
+    mod = importlib.import_module('log_indexer.app.main')
+    assert isinstance(mod.dao, RemoteLogStore)
+    client = TestClient(mod.app)
+    payload = {'timestamp': '2024-01-01T00:00:00Z', 'level': 'INFO', 'service': 'api', 'message': 'one'}
+    assert client.post('/log', json=payload).json() == {'status': 'ok', 'duplicate': False}
+    assert [log['message'] for log in client.get('/query').json()] == ['one']
+    batch = [{**payload, 'message': 'two'}, payload]
+    assert client.post('/log/batch', json=batch).json()['duplicates'] == 1
+    # The worker's query cache notices the writer's commit.
+    assert [log['message'] for log in client.get('/query').json()] == ['one', 'two']
+    assert client.get('/metrics').json()['duplicates_dropped'] == 1
+    mod.dao.close()
+    server.shutdown()
+    server.server_close()
+    store.close()
+    assert not socket_path.exists()
+
+
+def _worker(socket_path, data_dir, offset, count):
+    sys.path.insert(0, str(ROOT))
+    from log_indexer.app.store import open_store
+    store = RemoteLogStore(open_store(_Path(data_dir), read_only=True), WriterClient(_Path(socket_path)))
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    for i in range(offset, offset + count, 25):
+        store.add_logs([
+            LogEntry(timestamp=start + timedelta(seconds=j), level='INFO', service='svc', message=f'm{j}', hash=f'h{j}')
+            for j in range(i, i + 25)
+        ])
+    store.close()
+
+
+def test_separate_processes_share_one_writer(tmp_path):
+    socket_path = tmp_path / 'writer.sock'
+    env = {**os.environ, 'LOG_INDEXER_WRITE_MODE': 'group', 'PYTHONPATH': str(ROOT)}
+    env.pop('LOG_INDEXER_PARTITION', None)
+    writer = subprocess.Popen(
+        [sys.executable, '-m', 'log_indexer.app.manage', '--data-dir', str(tmp_path),
+         'serve-writer', '--socket', str(socket_path)],
+        env=env,
+    )
+    try:
+        deadline = time.monotonic() + 30
+        while not socket_path.exists() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        ctx = multiprocessing.get_context('fork')
+        workers = [ctx.Process(target=_worker, args=(socket_path, tmp_path, n * 200, 200)) for n in range(3)]
+        for proc in workers:
+            proc.start()
+        for proc in workers:
+            proc.join(60)
+            assert proc.exitcode == 0
+    finally:
+        writer.terminate()
+        assert writer.wait(30) == 0
+    dao = LogDAO(tmp_path / 'logs.db')
+    assert len(dao.query_logs()) == 600
+    dao.close()
+
+
+def test_read_only_partitions_follow_the_writer(tmp_path):
+    from log_indexer.app.partitions import PartitionedLogDAO
+    writer = PartitionedLogDAO(tmp_path, period='day', retention=timedelta(days=2))
+    reader = PartitionedLogDAO(tmp_path, period='day', read_only=True, cache_bytes=1 << 20)
+    day = datetime.now(timezone.utc) - timedelta(days=1)
+    assert reader.query_logs() == []
+    writer.add_logs([LogEntry(timestamp=day, level='INFO', service='s', message='a', hash='a')])
+    assert [e.message for e in reader.query_logs()] == ['a']
+    writer.add_logs([LogEntry(timestamp=day, level='INFO', service='s', message='b', hash='b')])
+    assert [e.message for e in reader.query_logs()] == ['a', 'b']
+    writer.drop_expired(now=datetime.now(timezone.utc) + timedelta(days=5))
+    assert reader.query_logs() == []
+    writer.close()
+    reader.close()
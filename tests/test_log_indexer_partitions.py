@@ -0,0 +1,84 @@
+import importlib
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path as _Path
+sys.path.insert(0, str(_Path(__file__).resolve().parents[1]))
+from fastapi.testclient import TestClient
+from log_indexer.app.models import LogEntry
+from log_indexer.app.partitions import PartitionedLogDAO
+
+
+def _entry(ts, message, service='auth'):
+    return LogEntry(timestamp=ts, level='INFO', service=service, message=message, hash=message)
+
+
+def test_rollover_pruned_queries_and_ordered_pages(tmp_path):
+    dao = PartitionedLogDAO(tmp_path, period='day')
+    start = datetime(2024, 1, 1, 22)
+    dao.add_logs([_entry(start + timedelta(hours=h), f'm{h:02d}') for h in range(0, 50, 2)])
+    assert sorted(p.name for p in tmp_path.glob('logs-*.db')) == [
+        'logs-20240101.db', 'logs-20240102.db', 'logs-20240103.db'
+    ]
+
+    assert [p.path.name for p in dao.partitions(since=datetime(2024, 1, 2, 5), until=datetime(2024, 1, 3))] == ['logs-20240102.db']
+    window = dao.query_logs(since=datetime(2024, 1, 2, 5), until=datetime(2024, 1, 3))
+    assert [e.message for e in window] == ['m08', 'm10', 'm12', 'm14', 'm16', 'm18', 'm20', 'm22', 'm24']
+
+    seen, cursor = [], None
+    while True:
+        page, cursor = dao.query_page(limit=4, cursor=cursor)
+        seen.extend(e.message for e in page)
+        if cursor is None:
+            break
+    assert seen == [f'm{h:02d}' for h in range(0, 50, 2)]
+    assert [e.message for e in dao.search('m10 OR m40')] and len(dao.search('m10 OR m40')) == 2
+    dao.close()
+
+
+def test_retention_drops_whole_partition_files(tmp_path):
+    dao = PartitionedLogDAO(tmp_path, period='hour', retention=timedelta(hours=2))
+    now = datetime.now(timezone.utc)
+    dao.add_logs([_entry(now - timedelta(hours=h), f'm{h}') for h in range(6)])
+    kept = {e.message for e in dao.query_logs()}
+    assert 'm0' in kept and kept <= {'m0', 'm1', 'm2'}
+    assert len(list(tmp_path.glob('logs-*.db'))) == len(kept)
+
+    old = datetime.now(timezone.utc) - timedelta(hours=1)
+    dao.add_log(_entry(old, 'aging'))
+    assert dao.drop_expired(now=old + timedelta(hours=4))
+    assert 'aging' not in {e.message for e in dao.query_logs()}
+    dao.close()
+
+
+def test_service_uses_partitions_when_configured(tmp_path, monkeypatch):
+    monkeypatch.setenv('LOG_INDEXER_DATA_DIR', str(tmp_path))
+    monkeypatch.setenv('LOG_INDEXER_PARTITION', 'day')
+    monkeypatch.delenv('LOG_INDEXER_TOKEN', raising=False)
+    mod = importlib.reload(importlib.import_module('log_indexer.app.main'))
+    client = TestClient(mod.app)
+    payload = {'timestamp': '2024-03-01T12:00:00Z', 'level': 'INFO', 'service': 'test', 'message': 'hello'}
+    assert client.post('/log', json=payload).status_code == 201
+    assert (tmp_path / 'logs-20240301.db').exists()
+    assert client.get('/query').json()[0]['message'] == 'hello'
+    mod.dao.close()
+
+
+def test_expired_entries_are_not_reported_as_duplicates(tmp_path, monkeypatch):
+    monkeypatch.setenv('LOG_INDEXER_DATA_DIR', str(tmp_path))
+    monkeypatch.setenv('LOG_INDEXER_PARTITION', 'day')
+    monkeypatch.setenv('LOG_INDEXER_RETENTION_DAYS', '7')
+    monkeypatch.delenv('LOG_INDEXER_TOKEN', raising=False)
+    mod = importlib.reload(importlib.import_module('log_indexer.app.main'))
+    client = TestClient(mod.app)
+    now = datetime.now(timezone.utc)
+    fresh = {'timestamp': now.isoformat(), 'level': 'INFO', 'service': 'test', 'message': 'fresh'}
+    stale = {**fresh, 'timestamp': (now - timedelta(days=30)).isoformat(), 'message': 'stale'}
+
+    assert client.post('/log', json=stale).json() == {'status': 'ok', 'expired': True}
+    body = client.post('/log/batch', json=[stale, fresh, fresh]).json()
+    assert (body['expired'], body['duplicates']) == (1, 1)
+    assert [r['status'] for r in body['results']] == ['expired', 'ok', 'ok']
+    metrics = client.get('/metrics').json()
+    assert (metrics['expired_dropped'], metrics['duplicates_dropped']) == (2, 1)
+    assert [log['message'] for log in client.get('/query').json()] == ['fresh']
+    mod.dao.close()
@@ -0,0 +1,61 @@
+import importlib
+import sys
+from pathlib import Path as _Path
+sys.path.insert(0, str(_Path(__file__).resolve().parents[1]))
+from fastapi.testclient import TestClient
+
+
+def test_query_time_range_and_keyset_pagination(tmp_path, monkeypatch):
+    monkeypatch.setenv('LOG_INDEXER_DATA_DIR', str(tmp_path))
+    monkeypatch.delenv('LOG_INDEXER_TOKEN', raising=False)
+    mod = importlib.reload(importlib.import_module('log_indexer.app.main'))
+    client = TestClient(mod.app)
+    entries = [
+        {'timestamp': f'2024-01-01T00:00:{i:02d}', 'level': 'ERROR' if i % 2 else 'INFO',
+         'service': 'auth' if i < 20 else 'web', 'message': f'm{i}'}
+        for i in range(30)
+    ]
+    assert client.post('/log/batch', json=entries).status_code == 201
+
+    resp = client.get('/query', params={'service': 'auth', 'since': '2024-01-01T00:00:05', 'until': '2024-01-01T00:00:15'})
+    assert [log['message'] for log in resp.json()] == [f'm{i}' for i in range(5, 15)]
+    assert 'X-Next-Cursor' not in resp.headers
+
+    seen = []
+    params = {'level': 'ERROR', 'limit': 4}
+    while True:
+        resp = client.get('/query', params=params)
+        assert resp.status_code == 200
+        page = resp.json()
+        assert len(page) <= 4
+        seen.extend(log['message'] for log in page)
+        cursor = resp.headers.get('X-Next-Cursor')
+        if not cursor:
+            break
+        params['cursor'] = cursor
+    assert seen == [f'm{i}' for i in range(1, 30, 2)]
+
+    assert client.get('/query', params={'cursor': 'garbage'}).status_code == 400
+    mod.dao.close()
+
+
+def test_query_bounds_compare_across_utc_offsets(tmp_path, monkeypatch):
+    monkeypatch.setenv('LOG_INDEXER_DATA_DIR', str(tmp_path))
+    monkeypatch.delenv('LOG_INDEXER_TOKEN', raising=False)
+    mod = importlib.reload(importlib.import_module('log_indexer.app.main'))
+    client = TestClient(mod.app)
+    entries = [
+        {'timestamp': '2024-01-01T12:00:00Z', 'level': 'INFO', 'service': 'api', 'message': 'zulu'},
+        {'timestamp': '2024-01-01T12:00:00', 'level': 'INFO', 'service': 'api', 'message': 'naive'},
+        {'timestamp': '2024-01-01T14:30:00+02:00', 'level': 'INFO', 'service': 'api', 'message': 'offset'},
+    ]
+    assert client.post('/log/batch', json=entries).status_code == 201
+
+    def messages(**params):
+        return sorted(log['message'] for log in client.get('/query', params=params).json())
+
+    assert messages(since='2024-01-01T17:00:00+05:00') == ['naive', 'offset', 'zulu']
+    assert messages(since='2024-01-01T12:00:00Z') == ['naive', 'offset', 'zulu']
+    assert messages(since='2024-01-01T12:15:00Z') == ['offset']
+    assert messages(until='2024-01-01T07:15:00-05:00') == ['naive', 'zulu']
+    mod.dao.close()
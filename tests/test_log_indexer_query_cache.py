@@ -0,0 +1,82 @@
+import importlib
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path as _Path
+sys.path.insert(0, str(_Path(__file__).resolve().parents[1]))
+from fastapi.testclient import TestClient
+from log_indexer.app.cache import QueryCache
+from log_indexer.app.dao import LogDAO
+from log_indexer.app.models import LogEntry
+from log_indexer.app.partitions import PartitionedLogDAO
+
+
+def entry(day, message):
+    return LogEntry(
+        timestamp=datetime(2024, 1, day, 12, tzinfo=timezone.utc),
+        level='INFO', service='svc', message=message, hash=f'{day}-{message}',
+    )
+
+
+def test_lru_eviction_respects_byte_cap():
+    cache = QueryCache(max_bytes=100)
+    cache.put('a', 0, 'A', 40)
+    cache.put('b', 0, 'B', 40)
+    assert cache.get('a', 0) == 'A'
+    cache.put('c', 0, 'C', 40)
+    assert cache.get('b', 0) is None
+    assert cache.get('a', 0) == 'A' and cache.get('c', 0) == 'C'
+    assert cache.get('a', 1) is None
+    cache.put('huge', 0, 'H', 101)
+    assert cache.get('huge', 0) is None and cache.bytes == 80
+    assert (cache.hits, cache.misses) == (3, 3)
+
+
+def test_writes_invalidate_cached_pages(tmp_path):
+    dao = LogDAO(tmp_path / 'logs.db', cache_bytes=1 << 20)
+    dao.add_logs([entry(1, 'a')])
+    assert [e.message for e in dao.query_logs(service='svc')] == ['a']
+    assert [e.message for e in dao.query_logs(service='svc')] == ['a']
+    assert dao.query_cache.hits == 1
+    generation = dao.generation
+    dao.add_logs([entry(1, 'a')])
+    assert dao.generation == generation  # duplicates change nothing
+    dao.add_logs([entry(1, 'b')])
+    assert [e.message for e in dao.query_logs(service='svc')] == ['a', 'b']
+    dao.close()
+
+
+def test_group_commit_bumps_generation_after_commit(tmp_path):
+    dao = LogDAO(tmp_path / 'logs.db', group_commit=True, cache_bytes=1 << 20)
+    assert dao.query_logs() == []
+    dao.add_logs([entry(1, 'a')], wait=True)
+    assert [e.message for e in dao.query_logs()] == ['a']
+    dao.close()
+
+
+def test_partitioned_cache_only_invalidates_touched_partitions(tmp_path):
+    store = PartitionedLogDAO(tmp_path, period='day', cache_bytes=1 << 20)
+    store.add_logs([entry(1, 'a'), entry(2, 'b')])
+    day1 = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    day2 = day1 + timedelta(days=1)
+    store.query_logs(until=day2)
+    store.query_logs(since=day2)
+    store.add_logs([entry(2, 'c')])
+    assert [e.message for e in store.query_logs(until=day2)] == ['a']
+    assert store.query_cache.hits == 1
+    assert [e.message for e in store.query_logs(since=day2)] == ['b', 'c']
+    assert store.query_cache.hits == 1
+    store.close()
+
+
+def test_metrics_expose_cache_counters(tmp_path, monkeypatch):
+    monkeypatch.setenv('LOG_INDEXER_DATA_DIR', str(tmp_path))
+    monkeypatch.delenv('LOG_INDEXER_TOKEN', raising=False)
+    monkeypatch.delenv('LOG_INDEXER_PARTITION', raising=False)
+    mod = importlib.reload(importlib.import_module('log_indexer.app.main'))
+    client = TestClient(mod.app)
+    client.post('/log', json={'timestamp': '2024-01-01T00:00:00Z', 'level': 'INFO', 'service': 's', 'message': 'm'})
+    for _ in range(3):
+        assert len(client.get('/query', params={'service': 's'}).json()) == 1
+    metrics = client.get('/metrics').json()
+    assert (metrics['query_cache_hits'], metrics['query_cache_misses']) == (2, 1)
+    mod.dao.close()
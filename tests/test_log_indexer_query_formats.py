@@ -0,0 +1,57 @@
+import importlib
+import json
+import sys
+from pathlib import Path as _Path
+sys.path.insert(0, str(_Path(__file__).resolve().parents[1]))
+import pytest
+from fastapi.testclient import TestClient
+
+
+def make_client(tmp_path, monkeypatch):
+    monkeypatch.setenv('LOG_INDEXER_DATA_DIR', str(tmp_path))
+    monkeypatch.delenv('LOG_INDEXER_TOKEN', raising=False)
+    monkeypatch.delenv('LOG_INDEXER_PARTITION', raising=False)
+    mod = importlib.reload(importlib.import_module('log_indexer.app.main'))
+    client = TestClient(mod.app)
+    batch = [
+        {'timestamp': '2024-01-01T00:00:00Z', 'level': 'INFO', 'service': 'api', 'message': 'plain'},
+        {'timestamp': '2024-01-01T00:00:01.250000+02:00', 'level': 'ERROR', 'service': 'api', 'message': 'ünïcode "quoted"'},
+        {'timestamp': '2024-01-01T00:00:02', 'level': 'INFO', 'service': 'api', 'message': 'naive\nline'},
+    ]
+    assert client.post('/log/batch', json=batch).status_code == 201
+    return mod, client
+
+
+def test_raw_json_matches_model_response(tmp_path, monkeypatch):
+    mod, client = make_client(tmp_path, monkeypatch)
+    default = client.get('/query', params={'limit': 2})
+    raw = client.get('/query', params={'limit': 2, 'format': 'json'})
+    assert raw.content == default.content
+    assert raw.headers['X-Next-Cursor'] == default.headers['X-Next-Cursor']
+    following = client.get('/query', params={'cursor': raw.headers['X-Next-Cursor'], 'format': 'json'})
+    assert len(following.json()) == 1
+    mod.dao.close()
+
+
+def test_ndjson_and_bad_format(tmp_path, monkeypatch):
+    mod, client = make_client(tmp_path, monkeypatch)
+    response = client.get('/query', params={'format': 'ndjson'})
+    assert response.headers['content-type'].startswith('application/x-ndjson')
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines == client.get('/query').json()
+    assert client.get('/query', params={'format': 'xml'}).status_code == 422
+    assert client.get('/query', params={'format': 'json', 'cursor': '!!'}).status_code == 400
+    mod.dao.close()
+
+
+def test_arrow_stream(tmp_path, monkeypatch):
+    pa = pytest.importorskip('pyarrow')
+    import pyarrow.ipc
+    mod, client = make_client(tmp_path, monkeypatch)
+    response = client.get('/query', params={'format': 'arrow', 'service': 'api'})
+    table = pyarrow.ipc.open_stream(response.content).read_all()
+    assert table.column_names == ['timestamp', 'level', 'service', 'message', 'hash']
+    assert table.schema.field('timestamp').type == pa.timestamp('us', tz='UTC')
+    # The +02:00 entry is 22:00Z the day before, so it sorts first.
+    assert table.column('message').to_pylist()[0] == 'ünïcode "quoted"'
+    mod.dao.close()
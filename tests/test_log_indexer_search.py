@@ -0,0 +1,54 @@
+import importlib
+import sqlite3
+import sys
+from datetime import datetime
+from pathlib import Path as _Path
+sys.path.insert(0, str(_Path(__file__).resolve().parents[1]))
+from fastapi.testclient import TestClient
+from log_indexer.app import manage
+from log_indexer.app.dao import LogDAO
+from log_indexer.app.models import LogEntry
+
+
+def test_search_phrase_prefix_and_filters(tmp_path, monkeypatch):
+    monkeypatch.setenv('LOG_INDEXER_DATA_DIR', str(tmp_path))
+    monkeypatch.delenv('LOG_INDEXER_TOKEN', raising=False)
+    mod = importlib.reload(importlib.import_module('log_indexer.app.main'))
+    client = TestClient(mod.app)
+    entries = [
+        {'timestamp': '2024-01-01T00:00:00', 'level': 'ERROR', 'service': 'auth', 'message': 'login failed for alice'},
+        {'timestamp': '2024-01-01T00:00:01', 'level': 'INFO', 'service': 'auth', 'message': 'login succeeded for bob'},
+        {'timestamp': '2024-01-01T00:00:02', 'level': 'ERROR', 'service': 'web', 'message': 'failed login attempt'},
+        {'timestamp': '2024-01-01T00:00:03', 'level': 'INFO', 'service': 'web', 'message': 'authentication token refreshed'},
+    ]
+    assert client.post('/log/batch', json=entries).status_code == 201
+
+    def messages(**params):
+        resp = client.get('/search', params=params)
+        assert resp.status_code == 200
+        return [log['message'] for log in resp.json()]
+
+    assert messages(q='"login failed"') == ['login failed for alice']
+    assert set(messages(q='failed login')) == {'login failed for alice', 'failed login attempt'}
+    assert messages(q='authent*') == ['authentication token refreshed']
+    assert messages(q='login', service='web') == ['failed login attempt']
+    assert messages(q='login', until='2024-01-01T00:00:01') == ['login failed for alice']
+    assert client.get('/search', params={'q': '"unterminated'}).status_code == 400
+    mod.dao.close()
+
+
+def test_rebuild_backfills_existing_database(tmp_path, monkeypatch, capsys):
+    monkeypatch.delenv('LOG_INDEXER_PARTITION', raising=False)
+    db = tmp_path / 'logs.db'
+    legacy = LogDAO(db, full_text=False)
+    legacy.add_log(LogEntry(timestamp=datetime(2024, 1, 1), level='INFO', service='s', message='legacy row', hash='h'))
+    legacy.close()
+
+    manage.main(['--data-dir', str(tmp_path), 'rebuild-fts'])
+    assert 'indexed 1' in capsys.readouterr().out
+    dao = LogDAO(db)
+    assert [e.message for e in dao.search('legacy')] == ['legacy row']
+    dao.close()
+    conn = sqlite3.connect(db)
+    assert conn.execute("SELECT COUNT(*) FROM logs_fts").fetchone()[0] == 1
+    conn.close()
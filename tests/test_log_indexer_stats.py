@@ -0,0 +1,62 @@
+import importlib
+import sqlite3
+import sys
+from datetime import datetime
+from pathlib import Path as _Path
+sys.path.insert(0, str(_Path(__file__).resolve().parents[1]))
+from fastapi.testclient import TestClient
+from log_indexer.app.dao import LogDAO
+from log_indexer.app.models import LogEntry
+
+
+def test_stats_from_rollups(tmp_path, monkeypatch):
+    monkeypatch.setenv('LOG_INDEXER_DATA_DIR', str(tmp_path))
+    monkeypatch.delenv('LOG_INDEXER_TOKEN', raising=False)
+    monkeypatch.delenv('LOG_INDEXER_PARTITION', raising=False)
+    mod = importlib.reload(importlib.import_module('log_indexer.app.main'))
+    client = TestClient(mod.app)
+    entries = [
+        {'timestamp': f'2024-01-01T{h:02d}:{m:02d}:00', 'level': 'ERROR' if m % 3 == 0 else 'INFO',
+         'service': 'auth' if h % 2 else 'web', 'message': 'x'}
+        for h in range(3) for m in range(0, 60, 10)
+    ]
+    assert client.post('/log/batch', json=entries).status_code == 201
+    assert client.post('/log', json={**entries[0], 'message': 'y'}).status_code == 201
+
+    hourly = client.get('/stats', params={'group_by': 'service'}).json()
+    assert hourly == [
+        {'bucket': '2024-01-01T00:00', 'service': 'web', 'count': 7},
+        {'bucket': '2024-01-01T01:00', 'service': 'auth', 'count': 6},
+        {'bucket': '2024-01-01T02:00', 'service': 'web', 'count': 6},
+    ]
+    totals = client.get('/stats', params={'interval': 'total', 'group_by': 'level'}).json()
+    assert totals == [{'level': 'ERROR', 'count': 7}, {'level': 'INFO', 'count': 12}]
+    window = client.get('/stats', params={
+        'interval': 'minute', 'since': '2024-01-01T01:15:00', 'until': '2024-01-01T01:40:00', 'level': 'INFO',
+    }).json()
+    assert window == [
+        {'bucket': '2024-01-01T01:20', 'service': 'auth', 'level': 'INFO', 'count': 1},
+    ]
+    assert client.get('/stats', params={'group_by': 'message'}).status_code == 400
+    mod.dao.close()
+
+
+def test_rollups_backfilled_for_existing_database(tmp_path):
+    db = tmp_path / 'logs.db'
+    conn = sqlite3.connect(db)
+    conn.execute(
+        'CREATE TABLE logs (id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp TEXT NOT NULL, level TEXT NOT NULL,'
+        ' service TEXT NOT NULL, message TEXT NOT NULL, hash TEXT NOT NULL)'
+    )
+    conn.executemany(
+        'INSERT INTO logs (timestamp, level, service, message, hash) VALUES (?, ?, ?, ?, ?)',
+        [('2024-01-01T00:00:05', 'INFO', 'auth', 'm', f'h{i}') for i in range(3)],
+    )
+    conn.commit()
+    conn.close()
+    dao = LogDAO(db)
+    dao.add_log(LogEntry(timestamp=datetime(2024, 1, 1, 0, 0, 30), level='INFO', service='auth', message='m', hash='h'))
+    assert dao.stats(interval='minute') == [
+        {'bucket': '2024-01-01T00:00', 'service': 'auth', 'level': 'INFO', 'count': 4}
+    ]
+    dao.close()
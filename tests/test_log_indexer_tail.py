@@ -0,0 +1,76 @@
+import asyncio
+import json
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path as _Path
+sys.path.insert(0, str(_Path(__file__).resolve().parents[1]))
+from log_indexer.app.models import LogEntry
+from log_indexer.app.tail import TailHub, sse_events
+
+
+def _entry(i, service='auth', level='INFO'):
+    return LogEntry(timestamp=datetime(2024, 1, 1), level=level, service=service, message=f'login {i}')
+
+
+def test_filters_and_drop_oldest_for_slow_subscriber():
+    async def scenario():
+        hub = TailHub(buffer_size=3)
+        sub = hub.subscribe(service='auth', contains='login')
+        began = time.perf_counter()
+        hub.publish([_entry(i) for i in range(1000)] + [_entry(5000, service='web')])
+        elapsed = time.perf_counter() - began
+        payloads, dropped = sub.drain()
+        hub.unsubscribe(sub)
+        return payloads, dropped, elapsed, hub.subscribers
+
+    payloads, dropped, elapsed, remaining = asyncio.run(scenario())
+    assert [json.loads(p)['message'] for p in payloads] == ['login 997', 'login 998', 'login 999']
+    assert dropped == 997
+    assert elapsed < 0.5
+    assert remaining == 0
+
+
+def test_sse_stream_receives_entries_published_from_ingest_thread():
+    async def scenario():
+        hub = TailHub()
+        sub = hub.subscribe(level='ERROR')
+        events = sse_events(hub, sub)
+        publisher = threading.Thread(
+            target=hub.publish, args=([_entry(1), _entry(2, level='ERROR')],)
+        )
+        publisher.start()
+        event = await asyncio.wait_for(events.__anext__(), timeout=5)
+        publisher.join()
+        await events.aclose()
+        return event, hub.subscribers
+
+    event, remaining = asyncio.run(scenario())
+    assert event.startswith('data: ')
+    assert json.loads(event[len('data: '):])['message'] == 'login 2'
+    assert remaining == 0
+
+
+def test_batch_ingest_publishes_only_newly_stored_entries(tmp_path, monkeypatch):
+    import importlib
+    import httpx
+
+    monkeypatch.setenv('LOG_INDEXER_DATA_DIR', str(tmp_path))
+    monkeypatch.delenv('LOG_INDEXER_TOKEN', raising=False)
+    mod = importlib.reload(importlib.import_module('log_indexer.app.main'))
+    entry = {'timestamp': '2024-01-01T00:00:00Z', 'level': 'INFO', 'service': 'auth', 'message': 'login'}
+
+    async def scenario():
+        sub = mod.tail_hub.subscribe()
+        transport = httpx.ASGITransport(app=mod.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+            first = await client.post('/log/batch', json=[entry, entry, entry])
+            again = await client.post('/log/batch', json=[entry, {**entry, 'message': 'logout'}])
+        payloads, _ = sub.drain()
+        return first.json(), again.json(), payloads
+
+    first, again, payloads = asyncio.run(scenario())
+    assert first['duplicates'] == 2 and again['duplicates'] == 1
+    assert [json.loads(p)['message'] for p in payloads] == ['login', 'logout']
+    mod.dao.close()
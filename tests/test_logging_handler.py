@@ -0,0 +1,224 @@
+import asyncio
+import importlib.util
+import json
+import logging
+import threading
+import time
+from pathlib import Path as _Path
+
+import httpx
+
+TEMPLATE = _Path(__file__).resolve().parents[1] / 'scripts' / 'logging_config_template.py'
+
+
+def load_template(monkeypatch):
+    monkeypatch.setenv('LOG_INDEXER_URL', 'http://log-indexer')
+    monkeypatch.delenv('LOG_INDEXER_TOKEN', raising=False)
+    spec = importlib.util.spec_from_file_location('logging_config_under_test', TEMPLATE)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class FakeSession:
+    def __init__(self, gate=None):
+        self.batches = []
+        self.gate = gate
+
+    def post(self, url, data, timeout, headers):
+        if self.gate is not None:
+            self.gate.wait(10)
+        self.batches.append((url, json.loads(data)))
+        return FakeResponse()
+
+
+class FakeResponse:
+    def raise_for_status(self):
+        pass
+
+
+def record(message):
+    return logging.LogRecord('svc', logging.INFO, __file__, 1, message, None, None)
+
+
+def test_records_are_shipped_in_batches_and_flushed_on_close(monkeypatch):
+    module = load_template(monkeypatch)
+    session = FakeSession()
+    monkeypatch.setattr(module, '_session', session)
+    handler = module.LogIndexerHandler(batch_size=4, flush_interval=60)
+    for i in range(10):
+        handler.emit(record(f'm{i}'))
+    handler.close()
+    assert [len(batch) for _, batch in session.batches] == [4, 4, 2]
+    assert {url for url, _ in session.batches} == {'http://log-indexer/log/batch'}
+    shipped = [entry['message'] for _, batch in session.batches for entry in batch]
+    assert shipped == [f'm{i}' for i in range(10)]
+    assert session.batches[0][1][0]['service'] == '__SERVICE_NAME__'
+    assert (handler.sent, handler.dropped) == (10, 0)
+    handler.emit(record('after close'))
+    assert handler.sent == 10
+
+
+def test_exit_and_fork_hooks_track_only_live_handlers(monkeypatch):
+    import gc
+
+    module = load_template(monkeypatch)
+    monkeypatch.setattr(module, '_session', FakeSession())
+    for _ in range(50):
+        module.LogIndexerHandler(flush_interval=60)
+    gc.collect()
+    assert len(module._live_handlers) == 0
+    handler = module.LogIndexerHandler(flush_interval=60)
+    handler.emit(record('queued'))
+    module._after_fork_in_child()
+    assert not handler._queue and handler._thread is None
+    handler.emit(record('in child'))
+    module._close_live_handlers()
+    assert handler.sent == 1 and len(module._live_handlers) == 0
+
+
+def test_full_queue_applies_drop_policy_without_blocking(monkeypatch):
+    module = load_template(monkeypatch)
+    gate = threading.Event()
+    session = FakeSession(gate)
+    monkeypatch.setattr(module, '_session', session)
+    handlers = {
+        policy: module.LogIndexerHandler(queue_size=3, batch_size=1, flush_interval=60, drop_policy=policy)
+        for policy in ('drop_new', 'drop_oldest')
+    }
+    for handler in handlers.values():
+        handler.emit(record('first'))
+        # Wait until the shipper is stuck posting "first".
+        deadline = time.monotonic() + 5
+        while handler._queue and time.monotonic() < deadline:
+            time.sleep(0.001)
+        assert not handler._queue, 'shipper never picked up the first record'
+        for i in range(5):
+            handler.emit(record(f'm{i}'))
+        assert handler.dropped == 2
+    assert list(m for _, _, m in handlers['drop_new']._queue) == ['m0', 'm1', 'm2']
+    assert list(m for _, _, m in handlers['drop_oldest']._queue) == ['m2', 'm3', 'm4']
+    gate.set()
+    for handler in handlers.values():
+        handler.flush()
+        assert not handler._queue and handler.sent == 4
+        handler.close()
+
+
+class FlakySession(FakeSession):
+    def __init__(self):
+        super().__init__()
+        self.down = True
+
+    def post(self, url, data, timeout, headers):
+        if self.down:
+            raise ConnectionError('indexer down')
+        return super().post(url, data, timeout, headers)
+
+
+def test_outage_is_spooled_to_disk_and_replayed(monkeypatch, tmp_path):
+    module = load_template(monkeypatch)
+    session = FlakySession()
+    monkeypatch.setattr(module, '_session', session)
+    spool = module.Spool(tmp_path, segment_bytes=200)
+    handler = module.LogIndexerHandler(batch_size=2, flush_interval=0.01, spool=spool, replay_rate=1e6)
+    for i in range(6):
+        handler.emit(record(f'm{i}'))
+    handler.flush()
+    assert (spool.spooled, handler.failed, session.batches) == (6, 0, [])
+    assert len(spool.segments()) >= 2
+    # A crash mid-write leaves a partial line behind.
+    with open(spool.segments()[-1], 'ab') as segment:
+        segment.write(b'{"timestamp": "2024')
+    session.down = False
+    deadline = time.monotonic() + 10
+    while spool.segments() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    handler.close()
+    shipped = sorted(entry['message'] for _, batch in session.batches for entry in batch)
+    assert shipped == [f'm{i}' for i in range(6)]
+    assert handler.replayed == 6
+
+
+def test_spool_is_capped_by_deleting_oldest_segments(monkeypatch, tmp_path):
+    module = load_template(monkeypatch)
+    spool = module.Spool(tmp_path, segment_bytes=100, max_bytes=300)
+    for i in range(20):
+        spool.append([{'message': f'message {i:02d}'}])
+    assert sum(p.stat().st_size for p in spool.segments()) <= 300 + 100
+    assert spool.dropped > 0
+    claimed = []
+    while (segment := spool.claim()) is not None:
+        claimed.extend(entry['message'] for entry in segment[2])
+        spool.release(segment[0], segment[1])
+    assert claimed[-1] == 'message 19' and len(claimed) == 20 - spool.dropped
+    spool.close()
+
+
+def test_async_transport_keeps_the_event_loop_responsive(monkeypatch):
+    module = load_template(monkeypatch)
+    received = []
+    latency = 0.4
+
+    async def slow_indexer(request):
+        await asyncio.sleep(latency)
+        received.extend(entry['message'] for entry in json.loads(request.content))
+        return httpx.Response(201)
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        handler = module.AsyncLogIndexerHandler(batch_size=25, flush_interval=0.05)
+        handler.emit(record('before start'))
+        await handler.start(client=httpx.AsyncClient(transport=httpx.MockTransport(slow_indexer)))
+        lags = []
+        for i in range(100):
+            started = loop.time()
+            handler.emit(record(f'm{i}'))
+            await asyncio.sleep(0.005)
+            lags.append(loop.time() - started - 0.005)
+        await handler.aclose()
+        return handler, max(lags)
+
+    handler, worst_lag = asyncio.run(scenario())
+    # A send awaited on the loop would stall it for a full indexer round trip;
+    # the bound leaves room for scheduling delays on a loaded machine.
+    assert worst_lag < latency / 2
+    assert received == ['before start'] + [f'm{i}' for i in range(100)]
+    assert handler.sent == 101
+
+
+def test_repeats_are_coalesced_and_noise_is_sampled(monkeypatch):
+    module = load_template(monkeypatch)
+    session = FakeSession()
+    monkeypatch.setattr(module, '_session', session)
+    monkeypatch.setattr(module.random, 'random', lambda: 0.5)
+    coalescer = module.Coalescer(window=60, burst=2, sample_rates={'health_check': 0.25})
+    handler = module.LogIndexerHandler(flush_interval=60, coalescer=coalescer)
+    for i in range(10):
+        handler.emit(logging.LogRecord('svc', logging.INFO, __file__, 1, 'Request: GET %s', (f'/r{i}',), None))
+        handler.emit(record('health_check'))
+    handler.emit(logging.LogRecord('svc', logging.WARNING, __file__, 1, 'Request: GET %s', ('/w',), None))
+    handler.close()
+    shipped = [entry['message'] for _, batch in session.batches for entry in batch]
+    assert shipped == [
+        'Request: GET /r0',
+        'Request: GET /r1',
+        'Request: GET /w',
+        'Request: GET %s (8 similar messages in 60s)',
+    ]
+    assert (coalescer.sampled_out, coalescer.coalesced) == (10, 8)
+
+
+def test_key_tracking_is_bounded_and_expires(monkeypatch):
+    module = load_template(monkeypatch)
+    coalescer = module.Coalescer(window=1, burst=1, max_keys=2)
+    admitted = []
+    for msg in ('a', 'a', 'b', 'c', 'c'):
+        rec = record(msg)
+        rec.created = 100.0
+        admitted.append(coalescer.admit(rec))
+    # "c" arrives once two keys are tracked and is never coalesced.
+    assert admitted == [True, False, True, True, True]
+    assert coalescer.collect(100.5) == []
+    assert coalescer.collect(101.0) == [(100.0, 'INFO', 'a (repeated 1 times in 1s)')]
+    assert coalescer._windows == {}